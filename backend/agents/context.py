@@ -0,0 +1,133 @@
+"""
+Set-based context loader for agent handlers.
+
+Walking users and touching user.checkins / user.workouts / ... issues
+several lazy-load queries per user. load_user_contexts() fetches everything
+an agent needs for a batch of users in a fixed number of queries (one per
+table, independent of the batch size) and packs it into one UserContext per
+user. Rows are plain dicts, not ORM objects, so nothing is lazy-loaded later.
+
+Usage with the event fan-out (one load per chunk):
+    handler = fan_out_handler(agent.process_user, prepare_chunk=chunk_context_loader())
+    # per_user(user_id, event, db, chunk_context) → chunk_context[user_id]
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.database import run_sync_db
+from backend.events.event_types import WellnessEvent
+from backend.models.agent_output import AgentOutput
+from backend.models.checkin import CheckIn
+from backend.models.meal import Meal
+from backend.models.user import User
+from backend.models.workout import Workout
+
+HISTORY_DAYS = 7
+
+_CHECKIN_COLUMNS = (
+    CheckIn.user_id, CheckIn.date, CheckIn.sleep_hours, CheckIn.sleep_quality,
+    CheckIn.mood, CheckIn.energy, CheckIn.stress, CheckIn.readiness_score,
+)
+_WORKOUT_COLUMNS = (Workout.user_id, Workout.date, Workout.type, Workout.duration_min, Workout.rpe)
+_MEAL_COLUMNS = (Meal.user_id, Meal.date, Meal.meal_type, Meal.quality)
+_OUTPUT_COLUMNS = (
+    AgentOutput.user_id, AgentOutput.date, AgentOutput.event_type, AgentOutput.readiness_score,
+    AgentOutput.intensity, AgentOutput.llm_text, AgentOutput.model_used,
+)
+
+
+@dataclass
+class UserContext:
+    user_id: int
+    name: str
+    # Check-in for the target day, if any
+    today_checkin: dict[str, Any] | None = None
+    # Previous HISTORY_DAYS days, newest first (today excluded)
+    recent_checkins: list[dict[str, Any]] = field(default_factory=list)
+    # Target day and the HISTORY_DAYS before it, newest first
+    workouts: list[dict[str, Any]] = field(default_factory=list)
+    meals: list[dict[str, Any]] = field(default_factory=list)
+    # Most recent output within the same window
+    latest_output: dict[str, Any] | None = None
+
+
+def load_user_contexts(
+    db: Session, user_ids: Sequence[int], day: date, days: int = HISTORY_DAYS
+) -> dict[int, UserContext]:
+    """
+    Context for every existing user in user_ids, in five queries. Users that
+    do not exist are left out of the result.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    since = day - timedelta(days=days)
+
+    contexts = {
+        row.id: UserContext(user_id=row.id, name=row.name)
+        for row in db.execute(select(User.id, User.name).where(User.id.in_(user_ids)))
+    }
+
+    for row in db.execute(
+        select(*_CHECKIN_COLUMNS)
+        .where(CheckIn.user_id.in_(user_ids), CheckIn.date >= since, CheckIn.date <= day)
+        .order_by(CheckIn.user_id, CheckIn.date.desc(), CheckIn.id.desc())
+    ).mappings():
+        context = contexts.get(row["user_id"])
+        if context is None:
+            continue
+        if row["date"] == day:
+            if context.today_checkin is None:
+                context.today_checkin = dict(row)
+        else:
+            context.recent_checkins.append(dict(row))
+
+    for model, columns, attr in ((Workout, _WORKOUT_COLUMNS, "workouts"), (Meal, _MEAL_COLUMNS, "meals")):
+        for row in db.execute(
+            select(*columns)
+            .where(model.user_id.in_(user_ids), model.date >= since, model.date <= day)
+            .order_by(model.user_id, model.date.desc(), model.id.desc())
+        ).mappings():
+            context = contexts.get(row["user_id"])
+            if context is not None:
+                getattr(context, attr).append(dict(row))
+
+    # Latest output per user in one query: row_number() over each user's outputs in the window
+    ranked = (
+        select(
+            *_OUTPUT_COLUMNS,
+            func.row_number().over(
+                partition_by=AgentOutput.user_id,
+                order_by=(AgentOutput.date.desc(), AgentOutput.id.desc()),
+            ).label("rank"),
+        )
+        # The date bounds let a partitioned agent_outputs prune to the window's months
+        .where(AgentOutput.user_id.in_(user_ids), AgentOutput.date >= since, AgentOutput.date <= day)
+        .subquery()
+    )
+    for row in db.execute(
+        select(*(ranked.c[c.key] for c in _OUTPUT_COLUMNS)).where(ranked.c.rank == 1)
+    ).mappings():
+        context = contexts.get(row["user_id"])
+        if context is not None:
+            context.latest_output = dict(row)
+
+    return contexts
+
+
+def chunk_context_loader(days: int = HISTORY_DAYS) -> Callable[..., Awaitable[dict[int, UserContext]]]:
+    """fan_out prepare_chunk hook: load_user_contexts() for the chunk on the event's day."""
+    async def prepare_chunk(
+        chunk: Sequence[int], event: WellnessEvent, db: Session | AsyncSession, **kwargs
+    ) -> dict[int, UserContext]:
+        return await run_sync_db(db, load_user_contexts, chunk, event.fired_at.date(), days)
+
+    return prepare_chunk
@@ -0,0 +1,84 @@
+"""
+Idempotent agent output generation.
+
+An AgentOutput is unique per (user_id, date, event_type). Agents check the
+whole user batch with one query before calling the model, and write with
+INSERT ... ON CONFLICT DO NOTHING, so a retried or duplicated event only
+pays for the users that are still missing.
+
+Usage with the event fan-out:
+    handler = fan_out_handler(agent.process_user, filter_chunk=skip_existing_outputs)
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date
+from typing import Any, Iterable, Mapping, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.database import on_conflict_insert, run_sync_db
+from backend.events.event_types import WellnessEvent
+from backend.models.agent_output import AgentOutput
+
+logger = logging.getLogger(__name__)
+
+CONFLICT_COLUMNS = ("user_id", "date", "event_type")
+
+
+def existing_output_user_ids(
+    db: Session, user_ids: Iterable[int], day: date, event_type: str
+) -> set[int]:
+    """Users among user_ids that already have an output for (day, event_type) — one query."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return set()
+    rows = db.execute(
+        select(AgentOutput.user_id).where(
+            AgentOutput.user_id.in_(user_ids),
+            AgentOutput.date == day,
+            AgentOutput.event_type == event_type,
+        )
+    )
+    return {row[0] for row in rows}
+
+
+def missing_output_user_ids(
+    db: Session, user_ids: Sequence[int], day: date, event_type: str
+) -> list[int]:
+    """user_ids (in order) that still need an output for (day, event_type)."""
+    existing = existing_output_user_ids(db, user_ids, day, event_type)
+    return [user_id for user_id in user_ids if user_id not in existing]
+
+
+async def skip_existing_outputs(
+    chunk: Sequence[int], event: WellnessEvent, db: Session | AsyncSession, **kwargs
+) -> list[int]:
+    """fan_out filter_chunk hook: drop users that already have today's output for this event."""
+    return await run_sync_db(db, missing_output_user_ids, chunk, event.fired_at.date(), event.type.value)
+
+
+def save_outputs(db: Session, rows: Sequence[Mapping[str, Any]]) -> int:
+    """
+    Insert AgentOutput rows in one statement, ignoring any (user_id, date,
+    event_type) that already exists. Returns the number of rows inserted. Commits.
+    """
+    if not rows:
+        return 0
+    result = db.execute(
+        on_conflict_insert(db, AgentOutput)
+        .on_conflict_do_nothing(index_elements=list(CONFLICT_COLUMNS))
+        .values(list(rows))
+    )
+    db.commit()
+    inserted = result.rowcount
+    if inserted < len(rows):
+        logger.info("save_outputs: %d of %d outputs already existed", len(rows) - inserted, len(rows))
+    return inserted
+
+
+def save_output(db: Session, **row: Any) -> bool:
+    """Single-row save_outputs(); False if the output already existed."""
+    return save_outputs(db, [row]) == 1
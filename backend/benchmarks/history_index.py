@@ -0,0 +1,134 @@
+"""
+Benchmark: per-user "last N days" check-in query on a synthetic table,
+without and with the composite covering (user_id, date) index.
+
+Builds bench_checkins (same columns as checkins) with --rows rows spread over
+--users users, then runs the history query from backend/history.py for random
+users with EXPLAIN (ANALYZE, BUFFERS) and reports the plan node, latency and
+heap fetches. With the index the plan should be an Index Only Scan with
+"Heap Fetches: 0" (the table is vacuumed so the visibility map is set).
+
+Usage:
+    python -m backend.benchmarks.history_index --rows 10000000 --users 100000
+    python -m backend.benchmarks.history_index --rows 1000000 --keep     # keep the table
+
+Requirements:
+    - DATABASE_URL pointing at a Postgres database (11+ for INCLUDE); the
+      10M-row build takes a few minutes and ~1.5 GB of disk
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from backend.config import settings
+
+TABLE = "bench_checkins"
+INDEX = "bench_checkins_user_date_key"
+LAST_DAY = date(2026, 1, 1)
+
+QUERY = f"""
+SELECT id, date, sleep_hours, sleep_quality, mood, energy, stress, readiness_score
+FROM {TABLE}
+WHERE user_id = :user_id AND date >= :since
+ORDER BY date DESC
+LIMIT :limit
+"""
+
+
+def _build(conn, rows: int, users: int) -> None:
+    days = -(-rows // users)
+    conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    conn.execute(text(f"""
+        CREATE TABLE {TABLE} (
+            id              BIGSERIAL PRIMARY KEY,
+            user_id         INTEGER NOT NULL,
+            date            DATE NOT NULL,
+            sleep_hours     DOUBLE PRECISION NOT NULL,
+            sleep_quality   INTEGER NOT NULL,
+            mood            INTEGER NOT NULL,
+            energy          INTEGER NOT NULL,
+            stress          INTEGER NOT NULL,
+            readiness_score DOUBLE PRECISION,
+            created_at      TIMESTAMP DEFAULT now()
+        )
+    """))
+    # Day-major insert order, like real daily check-ins: one user's rows are spread over the heap
+    conn.execute(text(f"""
+        INSERT INTO {TABLE} (user_id, date, sleep_hours, sleep_quality, mood, energy, stress, readiness_score)
+        SELECT u, DATE '2026-01-01' - d,
+               5 + random() * 4, 1 + (random() * 4)::int, 1 + (random() * 4)::int,
+               1 + (random() * 4)::int, 1 + (random() * 4)::int, random() * 100
+        FROM generate_series(0, :days - 1) AS d, generate_series(1, :users) AS u
+        LIMIT :rows
+    """), {"days": days, "users": users, "rows": rows})
+
+
+def _explain(conn, user_ids: list[int], since_days: int, limit: int) -> dict:
+    latencies, nodes, heap_fetches = [], set(), 0
+    for user_id in user_ids:
+        params = {"user_id": user_id, "since": LAST_DAY - timedelta(days=since_days), "limit": limit}
+        plan = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + QUERY), params).scalar()
+        plan = plan if isinstance(plan, list) else json.loads(plan)
+        top = plan[0]
+        latencies.append(top["Execution Time"])
+        node = top["Plan"]
+        while node.get("Plans") and node["Node Type"] == "Limit":
+            node = node["Plans"][0]
+        nodes.add(node["Node Type"])
+        heap_fetches += node.get("Heap Fetches", 0)
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return {"nodes": sorted(nodes), "p50_ms": p50, "p99_ms": p99, "heap_fetches": heap_fetches}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 30])
+    parser.add_argument("--keep", action="store_true", help="keep bench_checkins afterwards")
+    args = parser.parse_args()
+
+    engine = create_engine(settings.database_url)
+    rng = random.Random(0)
+    user_ids = [rng.randint(1, args.users) for _ in range(args.queries)]
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        start = time.perf_counter()
+        _build(conn, args.rows, args.users)
+        conn.execute(text(f"VACUUM ANALYZE {TABLE}"))
+        print(f"built {TABLE}: {args.rows:,} rows, {args.users:,} users in {time.perf_counter() - start:.1f}s")
+
+        try:
+            for label in ("no index", "covering (user_id, date) index"):
+                if label != "no index":
+                    start = time.perf_counter()
+                    conn.execute(text(f"""
+                        CREATE UNIQUE INDEX {INDEX} ON {TABLE} (user_id, date)
+                        INCLUDE (id, sleep_hours, sleep_quality, mood, energy, stress, readiness_score)
+                    """))
+                    # Sets the visibility map so index-only scans skip the heap
+                    conn.execute(text(f"VACUUM ANALYZE {TABLE}"))
+                    print(f"index built in {time.perf_counter() - start:.1f}s")
+                # The sequential-scan baseline gets a handful of queries; it is O(table) per query
+                sample = user_ids if label != "no index" else user_ids[:5]
+                for days in args.days:
+                    r = _explain(conn, sample, days, limit=days)
+                    print(
+                        f"  {label:<32} last {days:>2}d  plan={'/'.join(r['nodes']):<22} "
+                        f"p50={r['p50_ms']:9.3f}ms p99={r['p99_ms']:9.3f}ms heap_fetches={r['heap_fetches']}"
+                    )
+        finally:
+            if not args.keep:
+                conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: morning LLM burst through LLMClient — serial calls vs. the pooled,
+rate-limited client — against the local mock server.
+
+Usage:
+    python -m backend.benchmarks.llm_throughput --users 200 --latency-ms 300 --rate-429 0.05
+    python -m backend.benchmarks.llm_throughput --base-url http://localhost:8089   # running mock_server
+
+Without --base-url the mock runs in-process (httpx ASGI transport), so no
+network or API key is needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+from backend.llm.client import LLMClient, LLMError
+from backend.llm.mock_server import create_app
+
+
+def _prompt(i: int) -> str:
+    return f"User {i}: sleep 6.5h quality 3/5 mood 4/5 energy 3/5 stress 2/5 readiness 61. Suggest today's plan."
+
+
+async def _run(client: LLMClient, users: int, parallel: bool) -> tuple[float, list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        try:
+            response = await client.complete(_prompt(i), max_tokens=200)
+            latencies.append(response.latency_s)
+        except LLMError:
+            errors += 1
+
+    start = time.perf_counter()
+    if parallel:
+        await asyncio.gather(*(one(i) for i in range(users)))
+    else:
+        for i in range(users):
+            await one(i)
+    return time.perf_counter() - start, latencies, errors
+
+
+async def _bench(args: argparse.Namespace) -> None:
+    def make_client(concurrency: int) -> LLMClient:
+        transport = None
+        if not args.base_url:
+            transport = httpx.ASGITransport(
+                app=create_app(args.latency_ms, args.jitter_ms, args.rate_429, retry_after=args.retry_after, seed=0)
+            )
+        return LLMClient(
+            api_key=None if args.base_url else "mock",
+            base_url=args.base_url or "http://mock",
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            max_concurrency=concurrency,
+            retry_backoff=0.05,
+            hedge_after=args.hedge_after,
+            transport=transport,
+        )
+
+    print(f"users={args.users} latency={args.latency_ms}ms rate_429={args.rate_429} rpm={args.rpm} tpm={args.tpm}")
+    for label, concurrency, parallel in (("serial", 1, False), ("pooled", args.concurrency, True)):
+        async with make_client(concurrency) as client:
+            elapsed, latencies, errors = await _run(client, args.users, parallel)
+            p50, p99 = np.percentile(latencies, [50, 99]) if latencies else (0.0, 0.0)
+            print(
+                f"  {label:<7} c={concurrency:<3} {elapsed:8.2f}s  {args.users / elapsed:7.1f} req/s  "
+                f"p50={p50 * 1000:6.0f}ms p99={p99 * 1000:6.0f}ms  errors={errors}  "
+                f"retries={client.stats['retries']} 429s={client.stats['rate_limited']} "
+                f"hedged={client.stats['hedged']}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rpm", type=int, default=6000)
+    parser.add_argument("--tpm", type=int, default=2_000_000)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--rate-429", type=float, default=0.02)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--hedge-after", type=float, default=0.0)
+    parser.add_argument("--base-url", default=None, help="use a running mock/real API instead of the in-process mock")
+    asyncio.run(_bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Benchmark: RAG retrieval latency vs. recall across backends and corpus sizes.
+
+Generates synthetic corpora (clustered unit vectors, 384 dims, like
+all-MiniLM-L6-v2 output) of 1k–100k chunks in a scratch table next to the real
+knowledge_chunks, runs a fixed query set through each backend and reports
+p50/p99 latency, QPS and recall@k against exact search.
+
+Backends:
+    numpy-exact      InMemoryVectorIndex (exact, in-process)
+    pgvector-scan    Current pgvector query with no usable index (sequential scan)
+    ivfflat p=N      IVFFlat index, ivfflat.probes = N
+    hnsw ef=N        HNSW index, hnsw.ef_search = N
+    *-halfvec        float16 storage (NumPy reference / halfvec HNSW index)
+    *-binary c=N     1-bit Hamming pre-filter to N candidates + exact re-rank
+
+The numpy-halfvec/-binary rows check recall only; their latency is not
+representative (pure NumPy upcasts and popcounts per query).
+
+Usage:
+    python -m backend.benchmarks.rag_latency_recall --sizes 1000 10000 100000
+    python -m backend.benchmarks.rag_latency_recall --no-db          # NumPy only
+
+The scratch table (knowledge_chunks_bench) is dropped when the run finishes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from backend.config import settings
+from backend.knowledge.memory_index import InMemoryVectorIndex, normalize_rows
+from backend.knowledge.quantize import binary_quantize, binary_rerank_top_k, halfvec_top_k, to_halfvec
+from backend.knowledge.vector_ops import binary_prefilter_expr, distance_expr, index_ddl
+
+DIM = 384
+BENCH_TABLE = "knowledge_chunks_bench"
+BENCH_INDEX = "knowledge_chunks_bench_idx"
+
+
+@dataclass
+class Result:
+    size: int
+    backend: str
+    p50_ms: float
+    p99_ms: float
+    qps: float
+    recall: float
+
+
+def synthetic_corpus(n: int, dim: int = DIM, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """Unit vectors grouped around topic centers, roughly like a real corpus."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    assignment = rng.integers(0, clusters, size=n)
+    points = centers[assignment] + 0.6 * rng.normal(size=(n, dim))
+    return normalize_rows(points)
+
+
+def synthetic_queries(corpus: np.ndarray, n: int, seed: int = 1) -> np.ndarray:
+    """Queries near (but not equal to) random corpus points."""
+    rng = np.random.default_rng(seed)
+    picks = corpus[rng.integers(0, len(corpus), size=n)]
+    return normalize_rows(picks + 0.3 * rng.normal(size=picks.shape))
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> list[set[int]]:
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+
+def summarize(size: int, backend: str, latencies: list[float], found: list[list[int]],
+              truth: list[set[int]], k: int) -> Result:
+    lat_ms = np.asarray(latencies) * 1000
+    recall = float(np.mean([len(set(f) & t) / k for f, t in zip(found, truth)]))
+    return Result(
+        size=size,
+        backend=backend,
+        p50_ms=float(np.percentile(lat_ms, 50)),
+        p99_ms=float(np.percentile(lat_ms, 99)),
+        qps=len(latencies) / float(np.sum(latencies)),
+        recall=recall,
+    )
+
+
+def bench_numpy(corpus: np.ndarray, queries: np.ndarray, truth, k: int) -> Result:
+    index = InMemoryVectorIndex()
+    index.load(list(range(len(corpus))), [""] * len(corpus), [""] * len(corpus), corpus)
+    latencies, found = [], []
+    for q in queries:
+        start = time.perf_counter()
+        found.append(index.top_k(q, k))
+        latencies.append(time.perf_counter() - start)
+    return summarize(len(corpus), "numpy-exact", latencies, found, truth, k)
+
+
+def bench_numpy_compact(corpus: np.ndarray, queries: np.ndarray, truth, k: int,
+                        rerank_candidates: list[int]) -> list[Result]:
+    results = []
+    half = to_halfvec(corpus)
+    latencies, found = [], []
+    for q in queries:
+        start = time.perf_counter()
+        found.append(halfvec_top_k(half, q, k))
+        latencies.append(time.perf_counter() - start)
+    results.append(summarize(len(corpus), "numpy-halfvec", latencies, found, truth, k))
+
+    codes = binary_quantize(corpus)
+    for c in rerank_candidates:
+        latencies, found = [], []
+        for q in queries:
+            start = time.perf_counter()
+            found.append(binary_rerank_top_k(corpus, codes, q, k, c))
+            latencies.append(time.perf_counter() - start)
+        results.append(summarize(len(corpus), f"numpy-binary c={c}", latencies, found, truth, k))
+    return results
+
+
+def _load_table(engine, corpus: np.ndarray) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+        conn.execute(text(f"CREATE TABLE {BENCH_TABLE} (id INTEGER PRIMARY KEY, embedding vector({DIM}))"))
+    buffer = io.StringIO()
+    for i, row in enumerate(corpus):
+        buffer.write(f"{i}\t[{','.join(f'{x:.6f}' for x in row)}]\n")
+    buffer.seek(0)
+    raw = engine.raw_connection()
+    try:
+        raw.cursor().copy_expert(f"COPY {BENCH_TABLE} (id, embedding) FROM STDIN", buffer)
+        raw.commit()
+    finally:
+        raw.close()
+    with engine.begin() as conn:
+        conn.execute(text(f"ANALYZE {BENCH_TABLE}"))
+
+
+def _bench_sql(engine, label: str, setup: list[str], queries, truth, k: int, size: int,
+               storage: str = "vector", candidates: int = 0) -> Result:
+    source = BENCH_TABLE
+    if storage == "binary":
+        source = (f"(SELECT id, embedding FROM {BENCH_TABLE} ORDER BY {binary_prefilter_expr()} "
+                  f"LIMIT :candidates) AS c")
+    sql = text(f"SELECT id FROM {source} ORDER BY {distance_expr('cosine', storage=storage)} LIMIT :k")
+    latencies, found = [], []
+    with engine.connect() as conn:
+        for statement in setup:
+            conn.execute(text(statement))
+        params = [
+            {"emb": "[" + ",".join(f"{x:.6f}" for x in q) + "]", "k": k, "candidates": candidates}
+            for q in queries
+        ]
+        conn.execute(sql, params[0])  # warm cache
+        for p in params:
+            start = time.perf_counter()
+            rows = conn.execute(sql, p).fetchall()
+            latencies.append(time.perf_counter() - start)
+            found.append([r[0] for r in rows])
+        conn.rollback()
+    return summarize(size, label, latencies, found, truth, k)
+
+
+def bench_postgres(engine, corpus, queries, truth, k, probes, ef_searches, lists=None,
+                   rerank_candidates=(40,)) -> list[Result]:
+    size = len(corpus)
+    _load_table(engine, corpus)
+    results = [
+        # No index exists yet: this is what the <-> query always did before
+        _bench_sql(engine, "pgvector-scan", [], queries, truth, k, size)
+    ]
+
+    # pgvector guidance: lists ≈ rows / 1000 (min 10) up to 1M rows
+    lists = lists or max(10, size // 1000)
+    with engine.begin() as conn:
+        conn.execute(text(index_ddl("cosine", "ivfflat", table=BENCH_TABLE, name=BENCH_INDEX, lists=lists)))
+    for p in probes:
+        results.append(_bench_sql(engine, f"ivfflat l={lists} p={p}",
+                                  [f"SET ivfflat.probes = {p}"], queries, truth, k, size))
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP INDEX {BENCH_INDEX}"))
+        conn.execute(text(index_ddl("cosine", "hnsw", table=BENCH_TABLE, name=BENCH_INDEX)))
+    for ef in ef_searches:
+        results.append(_bench_sql(engine, f"hnsw ef={ef}",
+                                  [f"SET hnsw.ef_search = {ef}"], queries, truth, k, size))
+
+    for storage in ("halfvec", "binary"):
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP INDEX {BENCH_INDEX}"))
+            conn.execute(text(index_ddl("cosine", "hnsw", table=BENCH_TABLE, name=BENCH_INDEX, storage=storage)))
+        if storage == "halfvec":
+            results.append(_bench_sql(engine, "hnsw-halfvec ef=40", ["SET hnsw.ef_search = 40"],
+                                      queries, truth, k, size, storage="halfvec"))
+            continue
+        for c in rerank_candidates:
+            # ef_search bounds how many rows the HNSW scan can return
+            results.append(_bench_sql(engine, f"hnsw-binary c={c}", [f"SET hnsw.ef_search = {max(40, c)}"],
+                                      queries, truth, k, size, storage="binary", candidates=c))
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE {BENCH_TABLE}"))
+    return results
+
+
+def print_results(results: list[Result], k: int) -> None:
+    print(f"\n{'size':>8}  {'backend':<22} {'p50 ms':>8} {'p99 ms':>8} {'QPS':>9} {f'recall@{k}':>9}")
+    for r in results:
+        print(f"{r.size:>8}  {r.backend:<22} {r.p50_ms:>8.3f} {r.p99_ms:>8.3f} {r.qps:>9.1f} {r.recall:>9.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 3, 10, 30])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[20, 40, 100])
+    parser.add_argument("--lists", type=int, default=None, help="IVFFlat lists (default rows/1000)")
+    parser.add_argument("--rerank-candidates", type=int, nargs="+", default=[40, 100])
+    parser.add_argument("--dsn", default=settings.database_url)
+    parser.add_argument("--no-db", action="store_true", help="only run the in-memory NumPy backend")
+    args = parser.parse_args()
+
+    engine = None if args.no_db else create_engine(args.dsn)
+    results: list[Result] = []
+    for size in args.sizes:
+        corpus = synthetic_corpus(size)
+        queries = synthetic_queries(corpus, args.queries)
+        truth = exact_top_k(corpus, queries, args.k)
+        print(f"corpus={size} queries={args.queries} k={args.k} …", flush=True)
+        results.append(bench_numpy(corpus, queries, truth, args.k))
+        results.extend(bench_numpy_compact(corpus, queries, truth, args.k, args.rerank_candidates))
+        if engine is not None:
+            results.extend(bench_postgres(engine, corpus, queries, truth, args.k, args.probes,
+                                          args.ef_search, args.lists, args.rerank_candidates))
+    print_results(results, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: WellnessRetriever.retrieve() in a loop vs. one retrieve_many() call.
+
+Simulates the morning fan-out: one check-in style query per user, k=2.
+
+Usage:
+    python -m backend.benchmarks.retrieve_many --users 1000 --backend pgvector
+
+Requirements:
+    - DATABASE_URL pointing at a database with knowledge_chunks ingested
+    - sentence-transformers installed
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from backend.database import SessionLocal
+from backend.knowledge.retriever import BACKENDS, WellnessRetriever
+
+
+def synthetic_queries(n: int, seed: int = 0) -> list[str]:
+    """Check-in style queries drawn from the same discrete space as real users."""
+    rng = random.Random(seed)
+    return [
+        f"sleep {rng.choice([5, 5.5, 6, 6.5, 7, 7.5, 8, 9])}h "
+        f"quality {rng.randint(1, 5)}/5 stress {rng.randint(1, 5)}/5 "
+        f"readiness {rng.randint(30, 95)}"
+        for _ in range(n)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="pgvector")
+    args = parser.parse_args()
+
+    queries = synthetic_queries(args.users)
+    db = SessionLocal()
+    try:
+        retriever = WellnessRetriever(db, backend=args.backend)
+        retriever.retrieve(queries[0], k=args.k)  # warm model + index
+
+        start = time.perf_counter()
+        looped = [retriever.retrieve(q, k=args.k) for q in queries]
+        loop_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = retriever.retrieve_many(queries, k=args.k)
+        many_s = time.perf_counter() - start
+    finally:
+        db.close()
+
+    mismatches = sum(a != b for a, b in zip(looped, batched))
+    print(f"backend={args.backend} users={args.users} k={args.k}")
+    print(f"  retrieve() loop : {loop_s:8.3f}s  ({args.users / loop_s:8.1f} queries/s)")
+    print(f"  retrieve_many() : {many_s:8.3f}s  ({args.users / many_s:8.1f} queries/s)")
+    print(f"  speedup         : {loop_s / many_s:8.1f}x")
+    print(f"  result mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
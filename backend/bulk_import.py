@@ -0,0 +1,374 @@
+"""
+Streaming bulk import of check-ins, workouts and meals from CSV or NDJSON.
+
+Input is consumed in batches of import_batch_size rows, so memory stays flat
+however long the file is. Each batch is validated column by column with NumPy
+masks against the model constraints, check-ins get their readiness_score for
+the whole batch in one vectorized call, and the valid rows are loaded with
+COPY (psycopg2) or a single executemany INSERT (other drivers). Check-ins
+upsert on (user_id, date); workouts and meals are appended. Every batch
+commits on its own; rejected rows are counted and reported, never loaded.
+The daily rollups of the imported range are refreshed once at the end.
+If the table is partitioned by month (migrations/partition_*.sql), the
+partitions for the months in each batch are created before it is loaded.
+
+Usage:
+    python -m backend.bulk_import checkins history.csv
+    python -m backend.bulk_import workouts export.ndjson --batch-size 50000
+    cat meals.csv | python -m backend.bulk_import meals - --format csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import logging
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from backend.config import settings
+from backend.database import on_conflict_insert
+from backend.ml.readiness import readiness_scores
+from backend.models.checkin import CheckIn
+from backend.models.meal import Meal
+from backend.models.workout import Workout
+from backend.partitions import ensure_partitions, is_partitioned
+from backend.rollups import refresh_range
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+
+
+@dataclass(frozen=True)
+class ImportSpec:
+    model: Any
+    # Required numeric columns and their inclusive bounds
+    ranges: dict[str, tuple[float, float]]
+    integers: tuple[str, ...]
+    # Required non-empty strings / strings that may be missing
+    texts: tuple[str, ...] = ()
+    optional_texts: tuple[str, ...] = ()
+    # Upsert key; empty means rows are appended
+    conflict: tuple[str, ...] = ()
+
+    @property
+    def columns(self) -> tuple[str, ...]:
+        computed = ("readiness_score",) if self.model is CheckIn else ()
+        return ("user_id", "date", *self.ranges, *self.texts, *self.optional_texts, *computed, "created_at")
+
+
+SPECS = {
+    "checkins": ImportSpec(
+        CheckIn,
+        ranges={"sleep_hours": (0, 12), "sleep_quality": (1, 5), "mood": (1, 5), "energy": (1, 5), "stress": (1, 5)},
+        integers=("sleep_quality", "mood", "energy", "stress"),
+        conflict=("user_id", "date"),
+    ),
+    "workouts": ImportSpec(
+        Workout,
+        ranges={"duration_min": (1, 1440), "rpe": (1, 10)},
+        integers=("duration_min", "rpe"),
+        texts=("type",),
+    ),
+    "meals": ImportSpec(
+        Meal,
+        ranges={"quality": (1, 5)},
+        integers=("quality",),
+        texts=("meal_type",),
+        optional_texts=("notes",),
+    ),
+}
+
+
+@dataclass
+class ImportReport:
+    kind: str
+    rows_read: int = 0
+    rows_loaded: int = 0
+    rows_rejected: int = 0
+    # Earlier check-ins for the same (user_id, date) in one batch; the last one wins
+    rows_superseded: int = 0
+    # First import_max_errors problems, e.g. "row 12: mood must be an integer in [1, 5]"
+    errors: list[str] = field(default_factory=list)
+    elapsed_s: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.elapsed_s if self.elapsed_s else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "rows_per_second": round(self.rows_per_second, 1)}
+
+
+def read_records(lines: Iterable[str], fmt: str) -> Iterator[dict[str, Any] | None]:
+    """Records from CSV (header row first) or NDJSON lines; None for a line that is not a JSON object."""
+    if fmt == "csv":
+        yield from csv.DictReader(lines)
+    elif fmt == "ndjson":
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield record if isinstance(record, dict) else None
+    else:
+        raise ValueError(f"Unknown import format: {fmt!r} (expected one of {FORMATS})")
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _numbers(values: list[Any]) -> np.ndarray:
+    """Float array, NaN where a value is missing or not a number."""
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.array([_number(v) for v in values], dtype=float)
+
+
+def _day(value: Any) -> np.datetime64:
+    try:
+        return np.datetime64(value, "D") if isinstance(value, str) else np.datetime64("NaT")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def _dates(values: list[Any]) -> np.ndarray:
+    """datetime64[D] array of ISO dates, NaT where a value is missing or malformed."""
+    # NumPy would read integers as days since the epoch, so only all-string columns take the fast path
+    if all(isinstance(v, str) for v in values):
+        try:
+            return np.array(values, dtype="datetime64[D]")
+        except ValueError:
+            pass
+    return np.array([_day(v) for v in values], dtype="datetime64[D]")
+
+
+def validate_batch(
+    spec: ImportSpec, records: list[dict[str, Any] | None], user_id: int | None = None
+) -> tuple[dict[str, np.ndarray], np.ndarray, list[tuple[int, str]]]:
+    """
+    Column arrays of the batch, the mask of valid rows, and (index, reason)
+    for each invalid one. A fixed user_id overrides whatever the rows say.
+    """
+    malformed = np.array([record is None for record in records], dtype=bool)
+    records = [record or {} for record in records]
+
+    def column(name: str) -> list[Any]:
+        return [record.get(name) for record in records]
+
+    columns: dict[str, np.ndarray] = {}
+    problems: list[tuple[np.ndarray, str]] = [(malformed, "not a JSON object")]
+
+    if user_id is None:
+        columns["user_id"] = _numbers(column("user_id"))
+        problems.append((~(columns["user_id"] >= 1) | (columns["user_id"] % 1 != 0),
+                         "user_id must be a positive integer"))
+    else:
+        columns["user_id"] = np.full(len(records), user_id, dtype=float)
+    columns["date"] = _dates(column("date"))
+    problems.append((np.isnat(columns["date"]), "date must be an ISO date (YYYY-MM-DD)"))
+
+    for name, (low, high) in spec.ranges.items():
+        values = _numbers(column(name))
+        columns[name] = values
+        bad = ~((values >= low) & (values <= high))  # also catches NaN
+        if name in spec.integers:
+            problems.append((bad | (values % 1 != 0), f"{name} must be an integer in [{low}, {high}]"))
+        else:
+            problems.append((bad, f"{name} must be a number in [{low}, {high}]"))
+
+    for name in spec.texts + spec.optional_texts:
+        values = np.array([v.strip() if isinstance(v, str) and v.strip() else None for v in column(name)],
+                          dtype=object)
+        columns[name] = values
+        if name in spec.texts:
+            problems.append((np.array([v is None for v in values], dtype=bool), f"{name} is required"))
+
+    invalid = np.zeros(len(records), dtype=bool)
+    for bad, _ in problems:
+        invalid |= bad
+    errors = [
+        (int(i), next(reason for bad, reason in problems if bad[i]))
+        for i in np.flatnonzero(invalid)
+    ]
+    return columns, ~invalid, errors
+
+
+def _last_per_key(user_ids: np.ndarray, dates: np.ndarray) -> np.ndarray:
+    """Indices of the last row of each (user_id, date), in input order."""
+    keys = np.stack([user_ids.astype(np.int64), dates.astype(np.int64)], axis=1)[::-1]
+    _, first_from_end = np.unique(keys, axis=0, return_index=True)
+    return np.sort(len(keys) - 1 - first_from_end)
+
+
+def prepare_rows(spec: ImportSpec, columns: dict[str, np.ndarray], valid: np.ndarray) -> dict[str, list[Any]]:
+    """Valid rows as DB-ready column lists, with readiness_score and created_at filled in."""
+    keep = np.flatnonzero(valid)
+    if spec.conflict and len(keep):
+        keep = keep[_last_per_key(columns["user_id"][keep], columns["date"][keep])]
+    rows: dict[str, list[Any]] = {
+        "user_id": columns["user_id"][keep].astype(np.int64).tolist(),
+        "date": columns["date"][keep].astype(object).tolist(),
+    }
+    for name in spec.ranges:
+        values = columns[name][keep]
+        rows[name] = (values.astype(np.int64) if name in spec.integers else values).tolist()
+    for name in spec.texts + spec.optional_texts:
+        rows[name] = columns[name][keep].tolist()
+    if spec.model is CheckIn:
+        rows["readiness_score"] = readiness_scores(
+            *(columns[name][keep] for name in ("sleep_hours", "sleep_quality", "mood", "energy", "stress"))
+        ).tolist()
+    rows["created_at"] = [datetime.utcnow()] * len(keep)
+    return rows
+
+
+def _insert(conn: Connection, spec: ImportSpec):
+    stmt = on_conflict_insert(conn, spec.model)
+    if spec.conflict:
+        updates = [c for c in spec.columns if c not in spec.conflict and c != "created_at"]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(spec.conflict), set_={c: stmt.excluded[c] for c in updates}
+        )
+    return stmt
+
+
+def _copy(conn: Connection, spec: ImportSpec, rows: dict[str, list[Any]]) -> None:
+    """COPY the rows in (through a temp staging table when they upsert)."""
+    buffer = io.StringIO()
+    # None is written as an empty unquoted field, which COPY ... CSV reads as NULL
+    csv.writer(buffer).writerows(zip(*rows.values()))
+    buffer.seek(0)
+    table, columns = spec.model.__tablename__, ", ".join(rows)
+    with conn.connection.cursor() as cursor:
+        if not spec.conflict:
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+            return
+        staging = f"import_{table}"
+        updates = ", ".join(f"{c} = excluded.{c}" for c in rows if c not in spec.conflict and c != "created_at")
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DELETE ROWS AS "
+            f"SELECT {columns} FROM {table} WITH NO DATA"
+        )
+        cursor.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+            f"ON CONFLICT ({', '.join(spec.conflict)}) DO UPDATE SET {updates}"
+        )
+
+
+def load_rows(db: Session, spec: ImportSpec, rows: dict[str, list[Any]], partitioned: bool = False) -> None:
+    if not rows["user_id"]:
+        return
+    conn = db.connection()
+    if partitioned:
+        # Historical months are older than anything the maintenance job pre-creates
+        created = ensure_partitions(conn, spec.model.__tablename__, min(rows["date"]), max(rows["date"]))
+        if created:
+            logger.info("Created partitions %s", ", ".join(created))
+    if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2":
+        _copy(conn, spec, rows)
+    else:
+        names = list(rows)
+        conn.execute(_insert(conn, spec), [dict(zip(names, values)) for values in zip(*rows.values())])
+
+
+def import_records(
+    db: Session,
+    kind: str,
+    lines: Iterable[str],
+    fmt: str = "csv",
+    user_id: int | None = None,
+    batch_size: int | None = None,
+    max_errors: int | None = None,
+) -> ImportReport:
+    """
+    Import `kind` ("checkins", "workouts" or "meals") from CSV/NDJSON lines.
+    With user_id every row is stored for that user (the user_id column is
+    ignored). Commits after every batch and once more for the rollups.
+    """
+    if kind not in SPECS:
+        raise ValueError(f"Unknown import kind: {kind!r} (expected one of {tuple(SPECS)})")
+    spec = SPECS[kind]
+    batch_size = batch_size or settings.import_batch_size
+    max_errors = settings.import_max_errors if max_errors is None else max_errors
+    report = ImportReport(kind=kind)
+    start = time.perf_counter()
+    # Bounding box of everything loaded, for the rollup refresh
+    users: list[int] = []
+    days: list[date] = []
+
+    partitioned = is_partitioned(db.connection(), spec.model.__tablename__)
+    records = read_records(lines, fmt)
+    while batch := list(islice(records, batch_size)):
+        columns, valid, errors = validate_batch(spec, batch, user_id)
+        rows = prepare_rows(spec, columns, valid)
+        try:
+            load_rows(db, spec, rows, partitioned)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Import of %s failed at rows %d-%d", kind, report.rows_read + 1,
+                             report.rows_read + len(batch))
+            raise
+
+        for index, reason in errors[:max(0, max_errors - len(report.errors))]:
+            report.errors.append(f"row {report.rows_read + index + 1}: {reason}")
+        report.rows_read += len(batch)
+        report.rows_rejected += len(errors)
+        report.rows_loaded += len(rows["user_id"])
+        report.rows_superseded += int(valid.sum()) - len(rows["user_id"])
+        if rows["user_id"]:
+            users += [min(rows["user_id"]), max(rows["user_id"])]
+            days += [min(rows["date"]), max(rows["date"])]
+
+    if users:
+        refresh_range(db.connection(), min(days), max(days), min(users), max(users))
+        db.commit()
+    report.elapsed_s = time.perf_counter() - start
+    logger.info("Imported %d/%d %s (%d rejected) in %.1fs", report.rows_loaded, report.rows_read, kind,
+                report.rows_rejected, report.elapsed_s)
+    return report
+
+
+def main() -> None:
+    from backend.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Bulk import check-ins, workouts or meals from CSV/NDJSON.")
+    parser.add_argument("kind", choices=sorted(SPECS))
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="default: from the file extension")
+    parser.add_argument("--user-id", type=int, default=None, help="store every row for this user")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    logging.basicConfig(level=logging.INFO)
+    source = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    with source, SessionLocal() as db:
+        report = import_records(db, args.kind, source, fmt, user_id=args.user_id, batch_size=args.batch_size)
+    for error in report.errors:
+        print(error, file=sys.stderr)
+    print(json.dumps({k: v for k, v in report.as_dict().items() if k != "errors"}))
+
+
+if __name__ == "__main__":
+    main()
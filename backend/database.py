@@ -1,10 +1,50 @@
 from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
 from backend.config import settings
 
-engine = create_engine(settings.database_url)
+_ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    """Same database through an asyncio driver: postgresql:// → postgresql+asyncpg://."""
+    parsed = make_url(url)
+    drivername = _ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)
+    if parsed.get_driver_name() in ("asyncpg", "aiosqlite"):
+        drivername = parsed.drivername
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """
+    Pool settings shared by the sync and async engines. The statement timeout
+    only goes on the async engine, which serves requests and agent handlers;
+    the sync engine also runs the maintenance CLIs (backfills, imports, index
+    builds, partition archiving), whose statements legitimately run for minutes.
+    """
+    if make_url(url).get_backend_name() != "postgresql":
+        return {}
+    options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_pre_ping": True,
+    }
+    if is_async and settings.db_statement_timeout_ms:
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}}
+    return options
+
+
+engine = create_engine(settings.database_url, **engine_options(settings.database_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_async_url = async_database_url(settings.database_url)
+async_engine = create_async_engine(_async_url, **engine_options(_async_url, is_async=True))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 class Base(DeclarativeBase):
     pass
@@ -16,3 +56,32 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """FastAPI dependency for routers: an AsyncSession that does not block the event loop."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def run_sync_db(db, fn, *args, **kwargs):
+    """
+    Call fn(session, *args, **kwargs) with a sync Session, or — for an
+    AsyncSession — through run_sync(), so Session-based helpers also work
+    in async handlers without blocking the loop.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return fn(db, *args, **kwargs)
+
+
+def on_conflict_insert(bind, table):
+    """
+    insert(table) that supports on_conflict_do_nothing()/on_conflict_do_update()
+    on the bind's dialect: Postgres in production, SQLite in tests. bind is a
+    Session, Connection or Engine.
+    """
+    if isinstance(bind, Session):
+        bind = bind.get_bind()
+    dialect_insert = postgresql.insert if bind.dialect.name == "postgresql" else sqlite.insert
+    return dialect_insert(table)
@@ -0,0 +1,200 @@
+import asyncio
+import inspect
+import logging
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from backend.config import settings
+from backend.events.event_types import EventType, WellnessEvent
+from backend.events.gateway import EventGateway
+from backend.events.queue import CoalescingPriorityQueue, get_event_queue, merge_events
+
+logger = logging.getLogger(__name__)
+
+
+class EventConsumerPool:
+    """
+    N worker tasks draining the event queue through an EventGateway.
+
+    Each EventType can have its own concurrency limit. When a type is at its
+    limit, a worker parks the event and keeps draining the queue, so a slow
+    morning run does not block evening or retraining events behind it; the
+    parked event runs as soon as a handler of the same type finishes. With a
+    CoalescingPriorityQueue, an event of a type that already has one parked
+    is merged into it, as the queue would have done had it still been queued.
+
+    Queues with acknowledgements (DurableEventQueue) are never parked: a
+    parked claim would outlive its visibility timeout and be delivered again.
+    Workers do not claim events of a type at its limit, and one claimed in a
+    race for the last slot is released back to the queue. While a handler
+    runs, its claim's lease is extended every third of the visibility timeout
+    so a slow handler is not re-delivered to another consumer.
+
+    Usage:
+        pool = EventConsumerPool(gateway, db_factory=AsyncSessionLocal)
+        await pool.start()
+        ...
+        await pool.stop(drain=True)
+    """
+
+    def __init__(
+        self,
+        gateway: EventGateway,
+        queue: Optional[asyncio.Queue] = None,
+        workers: Optional[int] = None,
+        type_limits: Optional[Dict[EventType, int]] = None,
+        max_parked: Optional[int] = None,
+        db_factory: Optional[Callable] = None,
+        **handler_kwargs,
+    ) -> None:
+        self._gateway = gateway
+        self._queue = queue if queue is not None else get_event_queue()
+        self.workers = workers or settings.event_consumer_workers
+        if type_limits is None:
+            type_limits = {EventType(t): n for t, n in settings.event_type_concurrency.items()}
+        self._limits = {t: asyncio.Semaphore(n) for t, n in type_limits.items()}
+        self._max_parked = max_parked if max_parked is not None else settings.event_queue_maxsize
+        self._parked: Dict[EventType, Deque[WellnessEvent]] = defaultdict(deque)
+        self._parked_count = 0
+        # When set, each event gets its own session (sync or async), passed to the handler as db=
+        self._db_factory = db_factory
+        self._handler_kwargs = handler_kwargs
+        self._tasks: List[asyncio.Task] = []
+        self._acks = hasattr(self._queue, "ack")
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"event-consumer-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("EventConsumerPool: started %d workers", self.workers)
+
+    async def stop(self, drain: bool = True, timeout: Optional[float] = None) -> None:
+        if drain:
+            timeout = settings.event_drain_timeout_seconds if timeout is None else timeout
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("EventConsumerPool: drain timed out after %.1fs", timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._parked_count:
+            logger.warning("EventConsumerPool: %d parked events discarded", self._parked_count)
+
+    async def _worker(self) -> None:
+        while True:
+            if self._acks:
+                event = await self._queue.get(skip_types=self._saturated_types)
+            else:
+                event = await self._queue.get()
+            await self._process(event)
+
+    def _saturated_types(self) -> List[str]:
+        return [t.value for t, limit in self._limits.items() if limit.locked()]
+
+    async def _process(self, event: WellnessEvent) -> None:
+        limit = self._limits.get(event.type)
+        if limit is not None and limit.locked():
+            if self._acks:
+                await self._release(event)
+                return
+            if self._coalesce_parked(event):
+                return
+            if self._parked_count < self._max_parked:
+                self._parked[event.type].append(event)
+                self._parked_count += 1
+                return
+        while event is not None:
+            if limit is not None:
+                await limit.acquire()
+            try:
+                await self._dispatch(event)
+            finally:
+                if limit is not None:
+                    limit.release()
+            event = self._pop_parked(event.type)
+
+    def _coalesce_parked(self, event: WellnessEvent) -> bool:
+        parked = self._parked.get(event.type)
+        if not parked or not isinstance(self._queue, CoalescingPriorityQueue):
+            return False
+        merge_events(parked[-1], event)
+        self._queue.coalesced += 1
+        # The merged event is never dispatched, so its queue item is finished here
+        self._queue.task_done()
+        return True
+
+    async def _release(self, event: WellnessEvent) -> None:
+        try:
+            await self._queue.release(event)
+        except Exception:
+            # The claim then expires after the visibility timeout and the event is retried
+            logger.exception("EventConsumerPool: could not release %s event", event.type.value)
+        finally:
+            self._queue.task_done()
+
+    def _pop_parked(self, event_type: EventType) -> Optional[WellnessEvent]:
+        parked = self._parked.get(event_type)
+        if not parked:
+            return None
+        self._parked_count -= 1
+        return parked.popleft()
+
+    async def _dispatch(self, event: WellnessEvent) -> None:
+        db = self._db_factory() if self._db_factory is not None else None
+        kwargs = dict(self._handler_kwargs)
+        if db is not None:
+            kwargs["db"] = db
+            # For handlers that run concurrent work (fan_out): one session per task
+            kwargs["db_factory"] = self._db_factory
+        error = None
+        lease = asyncio.create_task(self._keep_lease(event)) if self._acks else None
+        try:
+            await self._gateway.dispatch(event, **kwargs)
+        except Exception as e:
+            error = e
+            logger.exception("EventConsumerPool: %s handler failed", event.type.value)
+        finally:
+            if lease is not None:
+                lease.cancel()
+                await asyncio.gather(lease, return_exceptions=True)
+            if db is not None:
+                closed = db.close()
+                if inspect.isawaitable(closed):
+                    await closed
+            await self._settle(event, error)
+            self._queue.task_done()
+
+    async def _keep_lease(self, event: WellnessEvent) -> None:
+        interval = self._queue.visibility_timeout / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self._queue.extend_lease(event):
+                    logger.warning(
+                        "EventConsumerPool: lost the claim on %s event %s", event.type.value, event.event_id
+                    )
+                    return
+            except Exception:
+                logger.exception("EventConsumerPool: could not extend the claim on %s event", event.type.value)
+
+    async def _settle(self, event: WellnessEvent, error: Optional[Exception]) -> None:
+        # Queues with acknowledgements (DurableEventQueue) retry failed events
+        ack = getattr(self._queue, "ack", None)
+        if ack is None:
+            return
+        try:
+            if error is None:
+                await ack(event)
+            else:
+                await self._queue.nack(event, error)
+        except Exception:
+            logger.exception("EventConsumerPool: could not settle %s event", event.type.value)
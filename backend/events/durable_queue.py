@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Collection, Dict, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from backend.config import settings
+from backend.events.event_types import EventType, WellnessEvent
+from backend.models.event_record import EventRecord
+
+logger = logging.getLogger(__name__)
+
+
+class DurableEventQueue:
+    """
+    Event queue stored in the event_queue table and shared by every process
+    that uses the database.
+
+    Same interface as the asyncio.Queue returned by get_event_queue(), plus
+    ack()/nack(): a consumer claims a row with SELECT ... FOR UPDATE SKIP
+    LOCKED, which hides it for visibility_timeout seconds. ack() marks it
+    done; nack() makes it visible again after an exponential backoff, or
+    marks it dead after max_attempts. extend_lease() pushes the timeout out
+    while a handler is still running (EventConsumerPool does this). A claim
+    that is never settled (worker crash) is picked up again once its
+    visibility timeout expires, unless it has used up max_attempts; then it
+    is marked dead.
+    get(skip_types=...) leaves events of busy types unclaimed, and release()
+    hands back a claim that cannot be worked on yet.
+
+    put(event, dedup_key=...) inserts at most one row per key, so a schedule
+    firing in every uvicorn worker only queues the event once.
+
+    SQLite works as a stand-in: it ignores FOR UPDATE, but a claim only
+    succeeds if the row is unchanged since it was read.
+    """
+
+    maxsize = 0
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        visibility_timeout: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+    ) -> None:
+        if session_factory is None:
+            from backend.database import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+        self.visibility_timeout = (
+            settings.event_queue_visibility_timeout_seconds if visibility_timeout is None else visibility_timeout
+        )
+        self.max_attempts = max_attempts or settings.event_queue_max_attempts
+        self.retry_backoff = settings.event_queue_retry_backoff_seconds if retry_backoff is None else retry_backoff
+        self.poll_interval = settings.event_queue_poll_interval_seconds if poll_interval is None else poll_interval
+        # event_id → claim token, for events claimed by this process
+        self._claims: Dict[int, str] = {}
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    # ── Producer side ────────────────────────────────────────────────────────
+
+    def put_nowait(self, event: WellnessEvent, dedup_key: Optional[str] = None) -> bool:
+        """Insert the event; returns False if dedup_key was already queued."""
+        now = datetime.utcnow()
+        record = EventRecord(
+            event_type=event.type.value,
+            user_ids=list(event.user_ids),
+            fired_at=event.fired_at,
+            priority=settings.event_priorities.get(event.type.value, len(settings.event_priorities)),
+            status="pending",
+            available_at=now,
+            attempts=0,
+            dedup_key=dedup_key,
+            created_at=now,
+        )
+        with self._session_factory() as db:
+            db.add(record)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                logger.debug("DurableEventQueue: %s already queued", dedup_key)
+                return False
+        return True
+
+    async def put(self, event: WellnessEvent, dedup_key: Optional[str] = None) -> bool:
+        return await asyncio.to_thread(self.put_nowait, event, dedup_key)
+
+    # ── Consumer side ────────────────────────────────────────────────────────
+
+    def _claim(self, skip_types: Collection[str] = ()) -> Optional[WellnessEvent]:
+        now = datetime.utcnow()
+        claimable = [EventRecord.status == "pending", EventRecord.available_at <= now]
+        if skip_types:
+            claimable.append(EventRecord.event_type.notin_(list(skip_types)))
+        with self._session_factory() as db:
+            while True:
+                record = db.execute(
+                    select(EventRecord)
+                    .where(*claimable)
+                    .order_by(EventRecord.priority, EventRecord.available_at, EventRecord.id)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                ).scalar_one_or_none()
+                if record is None:
+                    db.rollback()
+                    return None
+                # A claim left to expire that has used up its attempts is not delivered again
+                if record.claim_token is None or record.attempts < self.max_attempts:
+                    break
+                self._expire(db, record, now)
+            token = uuid.uuid4().hex
+            # Compare-and-set on the row as read: without FOR UPDATE (SQLite) another
+            # consumer may have claimed it since, and then this claim matches nothing
+            claimed = db.execute(
+                update(EventRecord)
+                .where(
+                    EventRecord.id == record.id,
+                    EventRecord.attempts == record.attempts,
+                    EventRecord.available_at == record.available_at,
+                )
+                .values(
+                    attempts=record.attempts + 1,
+                    claim_token=token,
+                    available_at=now + timedelta(seconds=self.visibility_timeout),
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if claimed != 1:
+                db.rollback()
+                return None
+            event = WellnessEvent(
+                type=EventType(record.event_type),
+                user_ids=list(record.user_ids or []),
+                fired_at=record.fired_at,
+                event_id=record.id,
+            )
+            db.commit()
+        self._claims[event.event_id] = token
+        self._unfinished += 1
+        self._finished.clear()
+        return event
+
+    def _expire(self, db, record: EventRecord, now: datetime) -> None:
+        db.execute(
+            update(EventRecord)
+            .where(EventRecord.id == record.id, EventRecord.claim_token == record.claim_token)
+            .values(
+                status="dead",
+                claim_token=None,
+                finished_at=now,
+                last_error=f"visibility timeout expired after {record.attempts} attempts",
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        logger.error(
+            "DurableEventQueue: %s event %s dead after %d expired claims",
+            record.event_type, record.id, record.attempts,
+        )
+
+    def get_nowait(self) -> WellnessEvent:
+        event = self._claim()
+        if event is None:
+            raise asyncio.QueueEmpty
+        return event
+
+    async def get(self, skip_types: Optional[Callable[[], Collection[str]]] = None) -> WellnessEvent:
+        """Claim the next event; skip_types() (re-read on every poll) lists event types not to claim."""
+        while True:
+            event = await asyncio.to_thread(self._claim, skip_types() if skip_types else ())
+            if event is not None:
+                return event
+            await asyncio.sleep(self.poll_interval)
+
+    def _release(self, event: WellnessEvent) -> None:
+        token = self._claims.pop(event.event_id, None)
+        if token is None:
+            return
+        with self._session_factory() as db:
+            record = db.execute(
+                select(EventRecord)
+                .where(EventRecord.id == event.event_id, EventRecord.claim_token == token)
+                .with_for_update()
+            ).scalar_one_or_none()
+            if record is not None:
+                # Not an attempt: the event never reached a handler
+                record.attempts -= 1
+                record.claim_token = None
+                record.available_at = datetime.utcnow()
+            db.commit()
+
+    def _extend_lease(self, event: WellnessEvent) -> bool:
+        token = self._claims.get(event.event_id)
+        if token is None:
+            return False
+        with self._session_factory() as db:
+            extended = db.execute(
+                update(EventRecord)
+                .where(EventRecord.id == event.event_id, EventRecord.claim_token == token)
+                .values(available_at=datetime.utcnow() + timedelta(seconds=self.visibility_timeout))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+        return extended == 1
+
+    async def extend_lease(self, event: WellnessEvent) -> bool:
+        """
+        Keep a claim hidden for another visibility_timeout; call this while the
+        handler runs. Returns False once the claim has expired and been lost.
+        """
+        return await asyncio.to_thread(self._extend_lease, event)
+
+    async def release(self, event: WellnessEvent) -> None:
+        """Undo a claim so any consumer can take the event now (call task_done() as well)."""
+        await asyncio.to_thread(self._release, event)
+
+    def _settle(self, event: WellnessEvent, error: Optional[BaseException]) -> None:
+        token = self._claims.pop(event.event_id, None)
+        if token is None:
+            return
+        now = datetime.utcnow()
+        with self._session_factory() as db:
+            record = db.execute(
+                select(EventRecord)
+                .where(EventRecord.id == event.event_id, EventRecord.claim_token == token)
+                .with_for_update()
+            ).scalar_one_or_none()
+            if record is None:
+                # Visibility timeout expired and another consumer re-claimed it
+                logger.warning("DurableEventQueue: claim on event %s expired", event.event_id)
+                db.rollback()
+                return
+            record.claim_token = None
+            if error is None:
+                record.status = "done"
+                record.finished_at = now
+            else:
+                record.last_error = f"{type(error).__name__}: {error}"[:2000]
+                if record.attempts >= self.max_attempts:
+                    record.status = "dead"
+                    record.finished_at = now
+                    logger.error(
+                        "DurableEventQueue: %s event %s dead after %d attempts",
+                        record.event_type, record.id, record.attempts,
+                    )
+                else:
+                    delay = self.retry_backoff * 2 ** (record.attempts - 1)
+                    record.available_at = now + timedelta(seconds=delay)
+            db.commit()
+
+    async def ack(self, event: WellnessEvent) -> None:
+        await asyncio.to_thread(self._settle, event, None)
+
+    async def nack(self, event: WellnessEvent, error: BaseException) -> None:
+        await asyncio.to_thread(self._settle, event, error)
+
+    def task_done(self) -> None:
+        if self._unfinished <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._finished.set()
+
+    async def join(self) -> None:
+        """Wait until every event claimed by this process has been marked done."""
+        await self._finished.wait()
+
+    # ── Introspection / maintenance ──────────────────────────────────────────
+
+    def qsize(self) -> int:
+        """Events claimable right now (pending and visible), across all processes."""
+        with self._session_factory() as db:
+            return db.execute(
+                select(func.count())
+                .select_from(EventRecord)
+                .where(EventRecord.status == "pending", EventRecord.available_at <= datetime.utcnow())
+            ).scalar_one()
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def full(self) -> bool:
+        return False
+
+    def purge(self, older_than: timedelta) -> int:
+        """Delete done rows finished before now - older_than; returns the row count."""
+        cutoff = datetime.utcnow() - older_than
+        with self._session_factory() as db:
+            result = db.execute(
+                delete(EventRecord).where(EventRecord.status == "done", EventRecord.finished_at < cutoff)
+            )
+            db.commit()
+            return result.rowcount
@@ -1,7 +1,7 @@
 from dataclasses import dataclass, field
 from enum import Enum
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 class EventType(str, Enum):
     MORNING_RECOMMENDATION = "morning_recommendation"
@@ -13,3 +13,5 @@ class WellnessEvent:
     type: EventType
     user_ids: List[int] = field(default_factory=list)
     fired_at: datetime = field(default_factory=datetime.utcnow)
+    # Row id when the event came from the durable queue
+    event_id: Optional[int] = None
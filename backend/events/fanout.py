@@ -0,0 +1,187 @@
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config import settings
+from backend.events.event_types import EventType, WellnessEvent
+
+logger = logging.getLogger(__name__)
+
+# per_user(user_id, event, **kwargs) — one user's share of an event
+PerUserHandler = Callable[..., Awaitable[None]]
+
+
+@dataclass
+class ChunkProgress:
+    event_type: EventType
+    chunk_index: int
+    chunk_count: int
+    size: int
+    succeeded: int
+    failed: int
+    elapsed_s: float
+    skipped: int = 0
+
+
+@dataclass
+class FanOutReport:
+    event_type: EventType
+    total: int = 0
+    succeeded: int = 0
+    # Users dropped by filter_chunk (e.g. output already stored)
+    skipped: int = 0
+    # user_id → error message
+    failed: Dict[int, str] = field(default_factory=dict)
+    elapsed_s: float = 0.0
+
+
+def chunked(user_ids: Sequence[int], size: int) -> Iterator[List[int]]:
+    if size <= 0:
+        raise ValueError("chunk size must be positive")
+    for start in range(0, len(user_ids), size):
+        yield list(user_ids[start:start + size])
+
+
+async def _maybe_await(value: Any) -> Any:
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+async def fan_out(
+    event: WellnessEvent,
+    per_user: PerUserHandler,
+    user_ids: Sequence[int],
+    chunk_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    on_progress: Optional[Callable[[ChunkProgress], Any]] = None,
+    prepare_chunk: Optional[Callable[..., Any]] = None,
+    filter_chunk: Optional[Callable[..., Any]] = None,
+    **kwargs,
+) -> FanOutReport:
+    """
+    Run per_user for every user id, chunk by chunk, at most `concurrency` at a time.
+
+    A failing user is recorded in the report and does not affect the others.
+    filter_chunk(chunk, event, **kwargs), if given, returns the users of the
+    chunk that still need work; the rest count as skipped.
+    prepare_chunk(chunk, event, **kwargs), if given, runs once per chunk (e.g. a
+    bulk load) and its result is passed to per_user as chunk_context=.
+
+    A Session/AsyncSession must not be used by concurrent tasks: with
+    db_factory= (passed by EventConsumerPool) every per_user call gets its own
+    db= session; without one, a shared AsyncSession runs users one at a time.
+    """
+    chunk_size = chunk_size or settings.fanout_chunk_size
+    concurrency = concurrency or settings.fanout_concurrency
+    db_factory = kwargs.get("db_factory")
+    if db_factory is None and isinstance(kwargs.get("db"), AsyncSession) and concurrency > 1:
+        logger.warning("fan-out %s: shared AsyncSession and no db_factory, running users serially",
+                       event.type.value)
+        concurrency = 1
+    semaphore = asyncio.Semaphore(concurrency)
+    report = FanOutReport(event_type=event.type, total=len(user_ids))
+    chunks = list(chunked(user_ids, chunk_size))
+    started = time.perf_counter()
+
+    for index, chunk in enumerate(chunks):
+        chunk_started = time.perf_counter()
+        skipped = 0
+        if filter_chunk is not None:
+            remaining = list(await _maybe_await(filter_chunk(chunk, event, **kwargs)))
+            skipped = len(chunk) - len(remaining)
+            report.skipped += skipped
+            chunk = remaining
+        user_kwargs = dict(kwargs)
+        if prepare_chunk is not None and chunk:
+            user_kwargs["chunk_context"] = await _maybe_await(prepare_chunk(chunk, event, **kwargs))
+
+        async def run(user_id: int) -> Optional[str]:
+            async with semaphore:
+                db = db_factory() if db_factory is not None else None
+                try:
+                    await per_user(user_id, event, **(user_kwargs if db is None else {**user_kwargs, "db": db}))
+                    return None
+                except Exception as e:
+                    logger.warning("fan-out %s: user %s failed: %s", event.type.value, user_id, e)
+                    return f"{type(e).__name__}: {e}"
+                finally:
+                    if db is not None:
+                        await _maybe_await(db.close())
+
+        errors = await asyncio.gather(*(run(user_id) for user_id in chunk))
+        failed = {uid: err for uid, err in zip(chunk, errors) if err is not None}
+        report.failed.update(failed)
+        report.succeeded += len(chunk) - len(failed)
+
+        progress = ChunkProgress(
+            event_type=event.type,
+            chunk_index=index,
+            chunk_count=len(chunks),
+            size=len(chunk),
+            succeeded=len(chunk) - len(failed),
+            failed=len(failed),
+            elapsed_s=time.perf_counter() - chunk_started,
+            skipped=skipped,
+        )
+        logger.info(
+            "fan-out %s: chunk %d/%d done (%d ok, %d failed, %d skipped, %.2fs)",
+            event.type.value, index + 1, len(chunks), progress.succeeded, progress.failed, skipped,
+            progress.elapsed_s,
+        )
+        if on_progress is not None:
+            await _maybe_await(on_progress(progress))
+
+    report.elapsed_s = time.perf_counter() - started
+    return report
+
+
+def all_user_ids(db) -> List[int]:
+    """Default "all active users" resolver: every registered user."""
+    from backend.models.user import User
+
+    return [row[0] for row in db.query(User.id).order_by(User.id).all()]
+
+
+def fan_out_handler(
+    per_user: PerUserHandler,
+    resolve_user_ids: Optional[Callable[..., Any]] = None,
+    chunk_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    on_progress: Optional[Callable[[ChunkProgress], Any]] = None,
+    prepare_chunk: Optional[Callable[..., Any]] = None,
+    filter_chunk: Optional[Callable[..., Any]] = None,
+) -> Callable[..., Awaitable[FanOutReport]]:
+    """
+    Wrap a per-user coroutine as an EventGateway handler.
+
+    Usage:
+        gateway.register(EventType.MORNING_RECOMMENDATION, fan_out_handler(agent.process_user))
+
+    event.user_ids selects the users; an empty list means all users, as given
+    by resolve_user_ids(**kwargs) (default: all_user_ids(db)).
+    """
+    async def handler(event: WellnessEvent, **kwargs) -> FanOutReport:
+        user_ids = list(event.user_ids)
+        if not user_ids:
+            if resolve_user_ids is not None:
+                user_ids = list(await _maybe_await(resolve_user_ids(**kwargs)))
+            else:
+                from backend.database import run_sync_db
+                user_ids = await run_sync_db(kwargs["db"], all_user_ids)
+        return await fan_out(
+            event, per_user, user_ids,
+            chunk_size=chunk_size,
+            concurrency=concurrency,
+            on_progress=on_progress,
+            prepare_chunk=prepare_chunk,
+            filter_chunk=filter_chunk,
+            **kwargs,
+        )
+
+    return handler
@@ -1,11 +1,144 @@
 import asyncio
-from typing import Optional
+import dataclasses
+import heapq
+import itertools
+import logging
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+from backend.config import settings
+from backend.events.event_types import EventType, WellnessEvent
+
+logger = logging.getLogger(__name__)
 
 _event_queue: Optional[asyncio.Queue] = None
 
 
+class QueueFullPolicy(str, Enum):
+    WAIT = "wait"                # block the producer until there is room
+    DROP_OLDEST = "drop_oldest"  # evict the oldest (priority mode: lowest-priority) pending event
+    REJECT = "reject"            # raise EventQueueFull
+
+
+class EventQueueFull(Exception):
+    pass
+
+
+def merge_events(pending: WellnessEvent, event: WellnessEvent) -> None:
+    """Merge `event` into `pending` (same type): union of user_ids, earlier fired_at."""
+    if not pending.user_ids or not event.user_ids:
+        pending.user_ids = []
+    else:
+        seen = set(pending.user_ids)
+        for user_id in event.user_ids:
+            if user_id not in seen:
+                seen.add(user_id)
+                pending.user_ids.append(user_id)
+    pending.fired_at = min(pending.fired_at, event.fired_at)
+
+
+class CoalescingPriorityQueue(asyncio.Queue):
+    """
+    asyncio.Queue that hands out events by type priority (lower first, FIFO
+    within a priority) and merges a new event into a pending one of the same
+    type instead of queueing it twice.
+
+    Merged user_ids are the union of both lists; an empty list means all users
+    and absorbs the other. The merged event keeps the earlier fired_at.
+    """
+
+    def __init__(self, maxsize: int = 0, priorities: Optional[Dict[str, int]] = None) -> None:
+        priorities = priorities if priorities is not None else settings.event_priorities
+        self._priorities = {EventType(t): p for t, p in priorities.items()}
+        self.coalesced = 0
+        super().__init__(maxsize)
+
+    def _init(self, maxsize: int) -> None:
+        self._queue: List[Tuple[float, int, WellnessEvent]] = []
+        self._pending: Dict[EventType, WellnessEvent] = {}
+        self._seq = itertools.count()
+
+    def _qsize(self) -> int:
+        return len(self._queue)
+
+    def _put(self, event: WellnessEvent) -> None:
+        # Copy so that coalescing never mutates the producer's event
+        event = dataclasses.replace(event, user_ids=list(event.user_ids))
+        priority = self._priorities.get(event.type, float("inf"))
+        heapq.heappush(self._queue, (priority, next(self._seq), event))
+        self._pending[event.type] = event
+
+    def _get(self) -> WellnessEvent:
+        _, _, event = heapq.heappop(self._queue)
+        del self._pending[event.type]
+        return event
+
+    def _coalesce(self, event: WellnessEvent) -> bool:
+        pending = self._pending.get(event.type)
+        if pending is None:
+            return False
+        merge_events(pending, event)
+        self.coalesced += 1
+        logger.debug("Coalesced %s event into pending one", event.type.value)
+        return True
+
+    def put_nowait(self, event: WellnessEvent) -> None:
+        # A coalesced event adds no queue item, so it must not count as an unfinished task
+        if self._coalesce(event):
+            return
+        super().put_nowait(event)
+
+    async def put(self, event: WellnessEvent) -> None:
+        if self._coalesce(event):
+            return
+        await super().put(event)
+
+    def drop_lowest(self) -> WellnessEvent:
+        if not self._queue:
+            raise asyncio.QueueEmpty
+        entry = max(self._queue)
+        self._queue.remove(entry)
+        heapq.heapify(self._queue)
+        event = entry[2]
+        del self._pending[event.type]
+        return event
+
+
 def get_event_queue() -> asyncio.Queue:
     global _event_queue
     if _event_queue is None:
-        _event_queue = asyncio.Queue(maxsize=100)
+        if settings.event_queue_mode == "durable":
+            # Imported lazily: pulls in the ORM models
+            from backend.events.durable_queue import DurableEventQueue
+            _event_queue = DurableEventQueue()
+        elif settings.event_queue_mode == "priority":
+            _event_queue = CoalescingPriorityQueue(maxsize=settings.event_queue_maxsize)
+        else:
+            _event_queue = asyncio.Queue(maxsize=settings.event_queue_maxsize)
     return _event_queue
+
+
+async def put_event(
+    event: WellnessEvent,
+    queue: Optional[asyncio.Queue] = None,
+    policy: Optional[QueueFullPolicy] = None,
+) -> None:
+    queue = queue if queue is not None else get_event_queue()
+    policy = QueueFullPolicy(policy or settings.event_queue_full_policy)
+
+    # A DurableEventQueue is never full, and its put_nowait() would block the loop on a DB round trip
+    if policy is QueueFullPolicy.WAIT or hasattr(queue, "ack"):
+        await queue.put(event)
+        return
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        if policy is QueueFullPolicy.REJECT:
+            raise EventQueueFull(f"Event queue full, rejected {event.type.value}")
+        if isinstance(queue, CoalescingPriorityQueue):
+            dropped = queue.drop_lowest()
+        else:
+            dropped = queue.get_nowait()
+        queue.task_done()
+        logger.warning("Event queue full, dropped %s event", dropped.type.value)
+        queue.put_nowait(event)
@@ -0,0 +1,115 @@
+"""
+Streaming export of a user's full history as NDJSON or CSV.
+
+Each table is read with a server-side cursor (yield_per) in index order, and
+every fetched partition is serialized and yielded as one chunk right away, so
+memory stays at one partition however long the user's history is, and the
+first bytes go out as soon as the first partition arrives.
+
+Usage:
+    StreamingResponse(stream_export(user_id, ["checkins", "workouts"], "ndjson"),
+                      media_type=MEDIA_TYPES["ndjson"])
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Callable, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config import settings
+from backend.database import AsyncSessionLocal
+from backend.models.agent_output import AgentOutput
+from backend.models.checkin import CheckIn
+from backend.models.meal import Meal
+from backend.models.workout import Workout
+
+# Exported columns per kind, and the index order they are read in
+_TABLES = {
+    "checkins": (CheckIn, (CheckIn.id, CheckIn.date, CheckIn.sleep_hours, CheckIn.sleep_quality, CheckIn.mood,
+                           CheckIn.energy, CheckIn.stress, CheckIn.readiness_score, CheckIn.created_at),
+                 (CheckIn.date,)),
+    "workouts": (Workout, (Workout.id, Workout.date, Workout.type, Workout.duration_min, Workout.rpe,
+                           Workout.created_at),
+                 (Workout.date, Workout.id)),
+    "meals": (Meal, (Meal.id, Meal.date, Meal.meal_type, Meal.quality, Meal.notes, Meal.created_at),
+              (Meal.date, Meal.id)),
+    "outputs": (AgentOutput, (AgentOutput.id, AgentOutput.date, AgentOutput.event_type,
+                              AgentOutput.readiness_score, AgentOutput.intensity, AgentOutput.llm_text,
+                              AgentOutput.model_used, AgentOutput.created_at),
+                (AgentOutput.date, AgentOutput.event_type)),
+}
+
+KINDS = tuple(_TABLES)
+FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def csv_columns(kinds: Sequence[str]) -> list[str]:
+    """CSV header: "kind", then the union of the kinds' columns in first-seen order."""
+    columns = ["kind"]
+    for kind in kinds:
+        columns += [c.key for c in _TABLES[kind][1] if c.key not in columns]
+    return columns
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _ndjson(kind: str, rows: Sequence[Any]) -> bytes:
+    return "".join(
+        json.dumps({"kind": kind, **row}, default=_json_default) + "\n" for row in rows
+    ).encode()
+
+
+def _csv_header(columns: Sequence[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue().encode()
+
+
+def _csv(kind: str, rows: Sequence[Any], columns: Sequence[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, columns, extrasaction="ignore").writerows({"kind": kind, **row} for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def stream_export(
+    user_id: int,
+    kinds: Sequence[str] = KINDS,
+    fmt: str = "ndjson",
+    session_factory: Callable[[], AsyncSession] | None = None,
+    yield_per: int | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Chunks of the export, one per fetched partition. Opens its own session:
+    the request's dependencies are closed before a streaming body is sent.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt!r} (expected one of {FORMATS})")
+    session_factory = session_factory or AsyncSessionLocal
+    yield_per = yield_per or settings.export_yield_per
+
+    columns = csv_columns(kinds)
+    if fmt == "csv":
+        yield _csv_header(columns)
+    async with session_factory() as db:
+        for kind in kinds:
+            model, selected, order = _TABLES[kind]
+            stmt = (
+                select(*selected)
+                .where(model.user_id == user_id)
+                .order_by(*order)
+                .execution_options(yield_per=yield_per)
+            )
+            result = await db.stream(stmt)
+            async for partition in result.mappings().partitions():
+                yield _ndjson(kind, partition) if fmt == "ndjson" else _csv(kind, partition, columns)
@@ -0,0 +1,116 @@
+"""
+Per-user history queries on the composite (user_id, date) indexes.
+
+Every query is a single range scan of one user's slice of the index, newest
+first, and pages with a keyset cursor instead of OFFSET: the next page starts
+strictly after the last (date, id) seen, so page 100 costs the same as page 1
+and rows inserted meanwhile do not shift the pages.
+
+Usage:
+    page = checkin_history(db, user_id, since=today - timedelta(days=30))
+    page.items, page.next_cursor   # pass next_cursor back to get the next page
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from backend.models.agent_output import AgentOutput
+from backend.models.checkin import CheckIn
+from backend.models.meal import Meal
+from backend.models.workout import Workout
+
+DEFAULT_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 500
+
+# Check-in, workout and meal columns are all in their index (key or INCLUDE),
+# so Postgres answers those queries from the index alone
+_COLUMNS = {
+    CheckIn: (CheckIn.id, CheckIn.date, CheckIn.sleep_hours, CheckIn.sleep_quality, CheckIn.mood,
+              CheckIn.energy, CheckIn.stress, CheckIn.readiness_score),
+    Workout: (Workout.id, Workout.date, Workout.type, Workout.duration_min, Workout.rpe),
+    Meal: (Meal.id, Meal.date, Meal.meal_type, Meal.quality),
+    AgentOutput: (AgentOutput.id, AgentOutput.date, AgentOutput.event_type, AgentOutput.readiness_score,
+                  AgentOutput.intensity, AgentOutput.llm_text, AgentOutput.model_used),
+}
+
+# Keyset order; check-ins are unique per (user_id, date), so the date alone is a total order
+_KEYS = {CheckIn: ("date",), Workout: ("date", "id"), Meal: ("date", "id"), AgentOutput: ("date", "id")}
+
+
+@dataclass
+class Page:
+    items: list[dict[str, Any]]
+    # Opaque cursor for the next (older) page; None on the last page
+    next_cursor: str | None = None
+
+
+def encode_cursor(day: date, row_id: int) -> str:
+    return f"{day.isoformat()}:{row_id}"
+
+
+def decode_cursor(cursor: str) -> tuple[date, int]:
+    try:
+        day, row_id = cursor.split(":")
+        return date.fromisoformat(day), int(row_id)
+    except ValueError as e:
+        raise ValueError(f"Invalid history cursor: {cursor!r}") from e
+
+
+def _history(
+    db: Session,
+    model: Any,
+    user_id: int,
+    since: date | None,
+    until: date | None,
+    limit: int,
+    cursor: str | None,
+) -> Page:
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    stmt = select(*_COLUMNS[model]).where(model.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(model.date >= since)
+    if until is not None:
+        stmt = stmt.where(model.date <= until)
+    keys = [getattr(model, key) for key in _KEYS[model]]
+    if cursor is not None:
+        after = decode_cursor(cursor)[:len(keys)]
+        stmt = stmt.where(tuple_(*keys) < after if len(keys) > 1 else keys[0] < after[0])
+    # One extra row tells whether another page exists
+    rows = db.execute(stmt.order_by(*(key.desc() for key in keys)).limit(limit + 1)).mappings().all()
+
+    items = [dict(row) for row in rows[:limit]]
+    next_cursor = encode_cursor(items[-1]["date"], items[-1]["id"]) if len(rows) > limit else None
+    return Page(items=items, next_cursor=next_cursor)
+
+
+def checkin_history(db: Session, user_id: int, since: date | None = None, until: date | None = None,
+                    limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> Page:
+    return _history(db, CheckIn, user_id, since, until, limit, cursor)
+
+
+def workout_history(db: Session, user_id: int, since: date | None = None, until: date | None = None,
+                    limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> Page:
+    return _history(db, Workout, user_id, since, until, limit, cursor)
+
+
+def meal_history(db: Session, user_id: int, since: date | None = None, until: date | None = None,
+                 limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> Page:
+    return _history(db, Meal, user_id, since, until, limit, cursor)
+
+
+def output_history(db: Session, user_id: int, since: date | None = None, until: date | None = None,
+                   limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> Page:
+    return _history(db, AgentOutput, user_id, since, until, limit, cursor)
+
+
+def recent_checkins(db: Session, user_id: int, day: date, days: int = 7) -> list[dict[str, Any]]:
+    """Check-ins of the `days` days before `day` (excluded), newest first."""
+    return checkin_history(
+        db, user_id, since=day - timedelta(days=days), until=day - timedelta(days=1), limit=days
+    ).items
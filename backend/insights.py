@@ -0,0 +1,90 @@
+"""
+Insights dashboard trends from daily_rollups (backend/rollups.py).
+
+One primary-key range read of at most MAX_DAYS rows per user, independent of
+how many raw check-ins, workouts and meals the user has.
+
+Usage:
+    trends = weekly_insights(db, user_id, date.today(), days=7)
+    trends["averages"]["sleep_hours"], trends["correlations"]["sleep_energy_next_day"]
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.models.daily_rollup import DailyRollup
+
+MAX_DAYS = 30
+
+_CHECKIN_FIELDS = ("readiness_score", "sleep_hours", "sleep_quality", "mood", "energy", "stress")
+
+
+def load_rollups(db: Session, user_id: int, day: date, days: int = 7) -> list[DailyRollup]:
+    """The user's rollups for the `days` days up to and including `day`, oldest first."""
+    days = max(1, min(days, MAX_DAYS))
+    return list(db.scalars(
+        select(DailyRollup)
+        .where(DailyRollup.user_id == user_id, DailyRollup.date > day - timedelta(days=days),
+               DailyRollup.date <= day)
+        .order_by(DailyRollup.date)
+    ))
+
+
+def _mean(values: Sequence[float | None]) -> float | None:
+    values = [v for v in values if v is not None]
+    return round(float(np.mean(values)), 2) if values else None
+
+
+def _pearson(pairs: Sequence[tuple[float | None, float | None]]) -> float | None:
+    """Pearson r over the pairs where both sides are present; None below 3 pairs or without variance."""
+    pairs = [(x, y) for x, y in pairs if x is not None and y is not None]
+    if len(pairs) < 3:
+        return None
+    x, y = np.array(pairs, dtype=float).T
+    if x.std() == 0 or y.std() == 0:
+        return None
+    return round(float(np.corrcoef(x, y)[0, 1]), 3)
+
+
+def summarize(rollups: Sequence[DailyRollup]) -> dict[str, Any]:
+    """Averages, totals and correlations over daily rollups (oldest first, days may be missing)."""
+    by_date = {r.date: r for r in rollups}
+    workout_days = [r for r in rollups if r.workout_count]
+    averages = {name: _mean([getattr(r, name) for r in rollups]) for name in _CHECKIN_FIELDS}
+    averages["workout_rpe"] = _mean([r.workout_rpe_avg for r in workout_days])
+    averages["meal_quality"] = _mean([r.meal_quality_avg for r in rollups])
+    return {
+        "days_with_data": len(rollups),
+        "averages": averages,
+        "totals": {
+            "workouts": sum(r.workout_count for r in rollups),
+            "workout_minutes": sum(r.workout_minutes for r in rollups),
+            "meals": sum(r.meal_count for r in rollups),
+        },
+        "correlations": {
+            # Does a night's sleep show up in the next day's energy?
+            "sleep_energy_next_day": _pearson([
+                (r.sleep_hours, by_date[r.date + timedelta(days=1)].energy)
+                for r in rollups if r.date + timedelta(days=1) in by_date
+            ]),
+            "stress_workout_rpe": _pearson([(r.stress, r.workout_rpe_avg) for r in workout_days]),
+            "mood_workout_minutes": _pearson([(r.mood, r.workout_minutes) for r in rollups]),
+        },
+        "daily": [
+            {"date": r.date, **{name: getattr(r, name) for name in _CHECKIN_FIELDS},
+             "workout_minutes": r.workout_minutes, "workout_rpe": r.workout_rpe_avg,
+             "meal_quality": r.meal_quality_avg}
+            for r in rollups
+        ],
+    }
+
+
+def weekly_insights(db: Session, user_id: int, day: date, days: int = 7) -> dict[str, Any]:
+    """Trend data for /insights/weekly: the last `days` days (at most MAX_DAYS) up to `day`."""
+    return summarize(load_rollups(db, user_id, day, days))
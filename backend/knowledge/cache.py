@@ -0,0 +1,98 @@
+"""
+Bounded LRU caches for the RAG hot path.
+
+Retriever queries come from a small discrete space ("sleep 6h quality 3/5
+stress 4/5 readiness 58"), so many users send the same string every morning.
+Two process-wide caches sit in front of WellnessRetriever:
+
+    embedding_cache — canonical query → embedding (skips SentenceTransformer.encode)
+    result_cache    — (search settings, corpus version, canonical query, k) → top-k
+                      contents, with TTL
+
+Result keys include the knowledge_chunks version (row count, max id, digest
+of content hashes), re-read at most every rag_index_refresh_seconds, so every
+process stops serving old results within that interval after an ingest.
+Embeddings depend only on the model and are never stale. invalidate() clears
+both caches at once; the ingestion script calls it for its own process.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from backend.config import settings
+
+_MISSING = object()
+
+
+def canonical_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used as the cache key."""
+    return " ".join(query.lower().split())
+
+
+class LRUCache:
+    """Thread-safe LRU cache with optional per-entry TTL and hit/miss counters."""
+
+    def __init__(self, maxsize: int, ttl_seconds: float | None = None) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                stored_at, value = entry
+                if self.ttl_seconds is None or time.monotonic() - stored_at < self.ttl_seconds:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+embedding_cache = LRUCache(settings.rag_embedding_cache_size)
+result_cache = LRUCache(settings.rag_result_cache_size, ttl_seconds=settings.rag_result_cache_ttl_seconds)
+
+
+def invalidate() -> None:
+    """Drop all cached embeddings and results (call after the corpus changes)."""
+    embedding_cache.clear()
+    result_cache.clear()
+
+
+def stats() -> dict:
+    return {"embeddings": embedding_cache.stats(), "results": result_cache.stats()}
@@ -1,8 +1,14 @@
 """
-One-time ingestion script: loads corpus/*.txt → embeds → inserts into knowledge_chunks.
+Ingestion script: loads corpus/*.txt → embeds → upserts into knowledge_chunks.
 
-Run once after DB migration:
-    python -m backend.knowledge.ingest
+Run after DB migration, and again whenever the corpus changes:
+    python -m backend.knowledge.ingest          # incremental (default)
+    python -m backend.knowledge.ingest --full   # re-embed every file
+
+Incremental mode compares a per-file content hash with the stored one, embeds
+only new or changed files (one batched encode call), bulk-upserts them and
+deletes chunks whose source file no longer exists. Unchanged rows are never
+touched, so re-ingestion cost is proportional to what changed.
 
 Requirements:
     - DATABASE_URL env variable (or .env file)
@@ -12,77 +18,182 @@ Requirements:
 
 from __future__ import annotations
 
+import argparse
+import hashlib
 import os
+from dataclasses import dataclass
 from pathlib import Path
 
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
 from sqlalchemy import create_engine, text
 
+from backend.knowledge import cache
+
 load_dotenv()
 
 CORPUS_DIR = Path(__file__).parent / "corpus"
-DATABASE_URL = os.environ["DATABASE_URL"]
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 
 # Category is inferred from filename prefix: sleep_01.txt → 'sleep'
 VALID_CATEGORIES = {"sleep", "exercise", "nutrition", "stress"}
 
-
-def ingest() -> None:
-    """Load all corpus/*.txt files, embed them, and insert into knowledge_chunks."""
-    engine = create_engine(DATABASE_URL)
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-
-    corpus_files = sorted(CORPUS_DIR.glob("*.txt"))
-    if not corpus_files:
+# Rows per upsert statement
+UPSERT_BATCH_SIZE = 500
+
+_UPSERT_SQL = text(
+    """
+    INSERT INTO knowledge_chunks (source_file, category, content, embedding, source, content_hash)
+    SELECT u.source_file, u.category, u.content, CAST(u.embedding AS vector), u.source, u.content_hash
+    FROM unnest(
+        CAST(:source_files AS text[]), CAST(:categories AS text[]), CAST(:contents AS text[]),
+        CAST(:embeddings AS text[]), CAST(:sources AS text[]), CAST(:content_hashes AS text[])
+    ) AS u(source_file, category, content, embedding, source, content_hash)
+    ON CONFLICT (source_file) DO UPDATE SET
+        category = EXCLUDED.category,
+        content = EXCLUDED.content,
+        embedding = EXCLUDED.embedding,
+        source = EXCLUDED.source,
+        content_hash = EXCLUDED.content_hash
+    """
+)
+
+
+@dataclass
+class CorpusChunk:
+    source_file: str
+    category: str
+    content: str
+    source: str
+    content_hash: str
+
+
+def content_hash(category: str, content: str, source: str) -> str:
+    """Stable hash of everything that ends up in a row (model name included)."""
+    payload = "\n".join([EMBEDDING_MODEL, category, source, content])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_corpus(corpus_dir: Path = CORPUS_DIR) -> list[CorpusChunk]:
+    """Read and parse every valid corpus file (one chunk per file)."""
+    chunks: list[CorpusChunk] = []
+    for filepath in sorted(corpus_dir.glob("*.txt")):
+        # Infer category from filename (e.g. sleep_03.txt → 'sleep')
+        category = filepath.stem.split("_")[0]
+        if category not in VALID_CATEGORIES:
+            print(f"  SKIP {filepath.name} — unknown category '{category}'")
+            continue
+
+        content = filepath.read_text(encoding="utf-8").strip()
+        if not content:
+            print(f"  SKIP {filepath.name} — empty file")
+            continue
+
+        # Source is stored in last line if it starts with "Source:"
+        lines = content.splitlines()
+        source = ""
+        if lines[-1].startswith("Source:"):
+            source = lines[-1].removeprefix("Source:").strip()
+            content = "\n".join(lines[:-1]).strip()
+
+        chunks.append(
+            CorpusChunk(
+                source_file=filepath.name,
+                category=category,
+                content=content,
+                source=source,
+                content_hash=content_hash(category, content, source),
+            )
+        )
+    return chunks
+
+
+def plan_changes(
+    chunks: list[CorpusChunk], existing: dict[str, str]
+) -> tuple[list[CorpusChunk], list[str]]:
+    """
+    Compare the corpus with stored {source_file: content_hash}.
+
+    Returns (chunks to embed and upsert, source files to delete).
+    """
+    changed = [c for c in chunks if existing.get(c.source_file) != c.content_hash]
+    current = {c.source_file for c in chunks}
+    removed = sorted(f for f in existing if f not in current)
+    return changed, removed
+
+
+def _upsert(conn, chunks: list[CorpusChunk], embeddings) -> None:
+    for start in range(0, len(chunks), UPSERT_BATCH_SIZE):
+        batch = chunks[start:start + UPSERT_BATCH_SIZE]
+        vectors = embeddings[start:start + UPSERT_BATCH_SIZE]
+        conn.execute(
+            _UPSERT_SQL,
+            {
+                "source_files": [c.source_file for c in batch],
+                "categories": [c.category for c in batch],
+                "contents": [c.content for c in batch],
+                "embeddings": [str(v.tolist()) for v in vectors],
+                "sources": [c.source for c in batch],
+                "content_hashes": [c.content_hash for c in batch],
+            },
+        )
+
+
+def ingest(full: bool = False) -> None:
+    """Sync knowledge_chunks with corpus/*.txt, embedding only what changed."""
+    chunks = load_corpus()
+    if not chunks:
         print(f"No .txt files found in {CORPUS_DIR}")
         return
 
-    print(f"Found {len(corpus_files)} corpus files — embedding and inserting...")
-
+    engine = create_engine(os.environ["DATABASE_URL"])
     with engine.begin() as conn:
-        # Clear existing data to allow safe re-ingestion
-        conn.execute(text("DELETE FROM knowledge_chunks"))
-
-        for filepath in corpus_files:
-            # Infer category from filename (e.g. sleep_03.txt → 'sleep')
-            category = filepath.stem.split("_")[0]
-            if category not in VALID_CATEGORIES:
-                print(f"  SKIP {filepath.name} — unknown category '{category}'")
-                continue
-
-            content = filepath.read_text(encoding="utf-8").strip()
-            if not content:
-                print(f"  SKIP {filepath.name} — empty file")
-                continue
-
-            # Source is stored in last line if it starts with "Source:"
-            lines = content.splitlines()
-            source = ""
-            if lines[-1].startswith("Source:"):
-                source = lines[-1].removeprefix("Source:").strip()
-                content = "\n".join(lines[:-1]).strip()
-
-            embedding: list[float] = model.encode(content).tolist()
-
-            conn.execute(
-                text(
-                    """
-                    INSERT INTO knowledge_chunks (category, content, embedding, source)
-                    VALUES (:category, :content, CAST(:embedding AS vector), :source)
-                    """
-                ),
-                {
-                    "category": category,
-                    "content": content,
-                    "embedding": str(embedding),
-                    "source": source,
-                },
+        rows = conn.execute(
+            text("SELECT source_file, content_hash FROM knowledge_chunks WHERE source_file IS NOT NULL")
+        ).fetchall()
+        existing = {row[0]: row[1] for row in rows}
+        if full:
+            existing = {f: "" for f in existing}
+        changed, removed = plan_changes(chunks, existing)
+
+        print(
+            f"Found {len(chunks)} corpus files — {len(changed)} new/changed, "
+            f"{len(chunks) - len(changed)} unchanged, {len(removed)} removed"
+        )
+
+        if changed:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(EMBEDDING_MODEL)
+            # Unit-length vectors: cosine, L2 and inner product then rank identically
+            embeddings = model.encode(
+                [c.content for c in changed], normalize_embeddings=True, batch_size=64
             )
-            print(f"  OK  {filepath.name} [{category}]")
+            _upsert(conn, changed, embeddings)
+            for chunk in changed:
+                print(f"  OK  {chunk.source_file} [{chunk.category}]")
+
+        # Rows without source_file predate content hashing and are replaced above
+        conn.execute(
+            text(
+                "DELETE FROM knowledge_chunks "
+                "WHERE source_file IS NULL OR NOT (source_file = ANY(CAST(:current AS text[])))"
+            ),
+            {"current": [c.source_file for c in chunks]},
+        )
+        for source_file in removed:
+            print(f"  DEL {source_file}")
+
+    # Same-process retrievers must not serve results from the old corpus
+    cache.invalidate()
+    print(f"\nIngestion complete — {len(changed)} files embedded, {len(removed)} removed.")
+
 
-    print(f"\nIngestion complete — {len(corpus_files)} files processed.")
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest corpus/*.txt into knowledge_chunks")
+    parser.add_argument("--full", action="store_true", help="re-embed every file, ignoring stored hashes")
+    args = parser.parse_args()
+    ingest(full=args.full)
 
 
 if __name__ == "__main__":
-    ingest()
+    main()
@@ -0,0 +1,211 @@
+"""
+InMemoryVectorIndex — process-local copy of knowledge_chunks for RAG.
+
+The corpus is small (~30 chunks of 384 dims), so all embeddings are held in one
+contiguous, L2-normalized float32 matrix and top-k is answered with a single
+matrix-vector product instead of a Postgres round trip per query.
+
+The index polls a cheap version query (row count, max id and a digest of the
+per-row content hashes) and reloads itself when knowledge_chunks changes, e.g.
+after re-running the ingestion script.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from backend.knowledge.packing import Candidate
+
+# Ingest upserts changed rows in place, so row count + max id alone would miss edits
+_VERSION_SQL = text(
+    "SELECT count(*), coalesce(max(id), 0), md5(coalesce(string_agg(content_hash, '' ORDER BY id), '')) "
+    "FROM knowledge_chunks"
+)
+_LOAD_SQL = text(
+    "SELECT id, category, content, CAST(embedding AS text) FROM knowledge_chunks ORDER BY id"
+)
+
+
+def corpus_version(db: Session) -> tuple:
+    """(row count, max id, digest of content hashes) of knowledge_chunks; changes with any ingest."""
+    return tuple(db.execute(_VERSION_SQL).one())
+
+
+class CorpusVersion:
+    """
+    corpus_version() re-read at most once per refresh_seconds; the pgvector
+    backend keys its result cache on it, so every process notices an ingest.
+    """
+
+    def __init__(self, refresh_seconds: float = 30.0) -> None:
+        self.refresh_seconds = refresh_seconds
+        self._version: tuple | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> tuple:
+        with self._lock:
+            if self._version is None or time.monotonic() - self._checked_at >= self.refresh_seconds:
+                self._version = corpus_version(db)
+                self._checked_at = time.monotonic()
+            return self._version
+
+
+def parse_vector(value) -> np.ndarray:
+    """Convert a pgvector value ('[0.1,0.2,...]' text or a sequence) to float32."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Return a C-contiguous float32 copy of matrix with unit-length rows."""
+    matrix = np.array(matrix, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms)
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    ids: np.ndarray
+    categories: list[str]
+    contents: list[str]
+    matrix: np.ndarray
+
+
+_EMPTY = _Snapshot(
+    ids=np.empty(0, dtype=np.int64),
+    categories=[],
+    contents=[],
+    matrix=np.empty((0, 0), dtype=np.float32),
+)
+
+
+class InMemoryVectorIndex:
+    """
+    Exact cosine top-k over an in-memory copy of knowledge_chunks.
+
+    Usage:
+        index = InMemoryVectorIndex(refresh_seconds=30)
+        index.maybe_refresh(db)
+        docs = index.search(query_embedding, k=2)
+    """
+
+    def __init__(self, refresh_seconds: float = 30.0) -> None:
+        self.refresh_seconds = refresh_seconds
+        self.version: tuple | None = None
+        self._snapshot = _EMPTY
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._snapshot.contents)
+
+    def load(
+        self,
+        ids: list[int],
+        categories: list[str],
+        contents: list[str],
+        embeddings: list | np.ndarray,
+    ) -> None:
+        """Replace the indexed rows. Searches in flight keep the old snapshot."""
+        matrix = normalize_rows(embeddings) if len(contents) else _EMPTY.matrix
+        self._snapshot = _Snapshot(
+            ids=np.asarray(ids, dtype=np.int64),
+            categories=list(categories),
+            contents=list(contents),
+            matrix=matrix,
+        )
+
+    def refresh(self, db: Session) -> bool:
+        """Reload from knowledge_chunks if its version changed. Returns True on reload."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            version = corpus_version(db)
+            if version == self.version:
+                return False
+            rows = db.execute(_LOAD_SQL).fetchall()
+            self.load(
+                ids=[row[0] for row in rows],
+                categories=[row[1] for row in rows],
+                contents=[row[2] for row in rows],
+                embeddings=[parse_vector(row[3]) for row in rows],
+            )
+            self.version = version
+            return True
+
+    def maybe_refresh(self, db: Session) -> bool:
+        """Run refresh() at most once per refresh_seconds (always on first use)."""
+        if self.version is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return False
+        return self.refresh(db)
+
+    def top_k(self, query_embedding, k: int) -> list[int]:
+        """Row positions of the k most similar chunks, most similar first."""
+        return self._top_k(self._snapshot, query_embedding, k)
+
+    @staticmethod
+    def _top_k(snapshot: _Snapshot, query_embedding, k: int) -> list[int]:
+        n = len(snapshot.contents)
+        if n == 0 or k <= 0:
+            return []
+        query = normalize_rows(query_embedding)[0]
+        scores = snapshot.matrix @ query
+        k = min(k, n)
+        if k < n:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(n)
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return order.tolist()
+
+    def search(self, query_embedding, k: int = 2) -> list[str]:
+        """Return the content of the k most similar chunks, most similar first."""
+        snapshot = self._snapshot
+        return [snapshot.contents[i] for i in self._top_k(snapshot, query_embedding, k)]
+
+    def search_many(self, query_embeddings, k: int = 2) -> list[list[str]]:
+        """search() for a batch of queries with one matrix-matrix product."""
+        snapshot = self._snapshot
+        queries = normalize_rows(query_embeddings)
+        n = len(snapshot.contents)
+        if n == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+        scores = queries @ snapshot.matrix.T
+        k = min(k, n)
+        if k < n:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(n), scores.shape)
+        ranked = np.take_along_axis(scores, candidates, axis=1)
+        order = np.take_along_axis(candidates, np.argsort(-ranked, axis=1, kind="stable"), axis=1)
+        return [[snapshot.contents[i] for i in row] for row in order.tolist()]
+
+    def candidates(self, query_embedding, n: int, category: str | None = None) -> list[Candidate]:
+        """Top-n chunks with their embeddings and scores, optionally within one category."""
+        snapshot = self._snapshot
+        if not snapshot.contents or n <= 0:
+            return []
+        query = normalize_rows(query_embedding)[0]
+        scores = snapshot.matrix @ query
+        if category is not None:
+            scores = np.where(np.asarray(snapshot.categories) == category, scores, -np.inf)
+        order = np.argsort(-scores, kind="stable")[:n]
+        return [
+            Candidate(
+                content=snapshot.contents[i],
+                category=snapshot.categories[i],
+                embedding=snapshot.matrix[i],
+                score=float(scores[i]),
+            )
+            for i in order
+            if np.isfinite(scores[i])
+        ]
@@ -0,0 +1,57 @@
+"""
+Token-budget-aware packing of retrieved guidelines into the agent prompt.
+
+The agent prompt is capped at ~600 tokens, so instead of a fixed k the
+retriever can fill a token budget: take candidates in relevance order, skip
+any that no longer fit, and skip near-duplicates of chunks already chosen
+(cosine similarity of the unit-length embeddings fetched with the candidates).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from backend.tokens import estimate_tokens
+
+# Chunks at least this similar to an already-packed chunk add no new evidence
+DEDUP_THRESHOLD = 0.92
+
+
+@dataclass
+class Candidate:
+    content: str
+    category: str
+    embedding: np.ndarray  # unit length
+    score: float           # cosine similarity to the query
+
+
+def pack_within_budget(
+    candidates: list[Candidate],
+    token_budget: int,
+    dedup_threshold: float = DEDUP_THRESHOLD,
+) -> list[Candidate]:
+    """
+    Greedily pick the most relevant candidates that fit token_budget.
+
+    Args:
+        candidates:      Ordered by relevance, most relevant first.
+        token_budget:    Maximum estimated tokens across all returned chunks.
+        dedup_threshold: Skip a candidate whose cosine similarity to a picked
+                         chunk is >= this value.
+
+    Returns:
+        Picked candidates, still in relevance order.
+    """
+    picked: list[Candidate] = []
+    remaining = token_budget
+    for candidate in candidates:
+        cost = estimate_tokens(candidate.content)
+        if cost > remaining:
+            continue
+        if any(float(candidate.embedding @ p.embedding) >= dedup_threshold for p in picked):
+            continue
+        picked.append(candidate)
+        remaining -= cost
+    return picked
@@ -0,0 +1,57 @@
+"""
+NumPy reference for the compact storage modes in vector_ops.py.
+
+Mirrors what pgvector does for halfvec (float16) and binary_quantize (one
+bit per dimension, set when the value is > 0) so recall against the
+full-precision path can be checked offline, without a database.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from backend.knowledge.memory_index import normalize_rows
+
+# Popcount of every byte value, for Hamming distance over packed bit codes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def to_halfvec(matrix: np.ndarray) -> np.ndarray:
+    """float16 copy of matrix (pgvector halfvec)."""
+    return np.asarray(matrix, dtype=np.float16)
+
+
+def binary_quantize(matrix: np.ndarray) -> np.ndarray:
+    """Packed sign bits, dim/8 bytes per row (pgvector binary_quantize)."""
+    return np.packbits(np.atleast_2d(matrix) > 0, axis=1)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Hamming distance from every packed row code to one packed query code."""
+    return _POPCOUNT[np.bitwise_xor(codes, query_code)].sum(axis=1)
+
+
+def exact_top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> list[int]:
+    scores = normalize_rows(matrix) @ normalize_rows(query)[0]
+    return np.argsort(-scores, kind="stable")[:k].tolist()
+
+
+def halfvec_top_k(half_matrix: np.ndarray, query: np.ndarray, k: int) -> list[int]:
+    """Top-k computed from float16-stored rows (upcast per query like pgvector)."""
+    scores = half_matrix.astype(np.float32) @ normalize_rows(query)[0].astype(np.float16).astype(np.float32)
+    return np.argsort(-scores, kind="stable")[:k].tolist()
+
+
+def binary_rerank_top_k(
+    matrix: np.ndarray, codes: np.ndarray, query: np.ndarray, k: int, candidates: int
+) -> list[int]:
+    """Hamming pre-filter to `candidates` rows, then exact cosine re-rank to k."""
+    distances = hamming_distances(codes, binary_quantize(query)[0])
+    shortlist = np.argsort(distances, kind="stable")[:max(k, candidates)]
+    scores = normalize_rows(matrix[shortlist]) @ normalize_rows(query)[0]
+    return shortlist[np.argsort(-scores, kind="stable")[:k]].tolist()
+
+
+def recall_at_k(found: list[list[int]], truth: list[list[int]]) -> float:
+    """Mean fraction of the exact top-k that each approximate result recovered."""
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
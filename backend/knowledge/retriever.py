@@ -2,7 +2,14 @@
 WellnessRetriever — RAG layer for evidence-based recommendations.
 
 Retrieves relevant wellness guidelines from the knowledge_chunks table
-using pgvector cosine similarity search.
+using pgvector similarity search (metric from settings.rag_distance_metric,
+cosine by default), or from an in-process copy of the table when
+settings.rag_backend == "memory".
+
+sentence-transformers (and torch) are imported on first use, not at module
+import; the FastAPI lifespan calls start_warm_up() so the model is loaded in a
+background thread and is_ready() reports when RAG is hot. A failed warm-up is
+retried with backoff, and any successful retrieval also marks RAG ready.
 
 Dependencies:
     pip install sentence-transformers pgvector
@@ -10,22 +17,118 @@ Dependencies:
 
 from __future__ import annotations
 
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from sentence_transformers import SentenceTransformer
 
+from backend.config import settings
+from backend.knowledge.cache import canonical_query, embedding_cache, result_cache
+from backend.knowledge.memory_index import CorpusVersion, InMemoryVectorIndex, normalize_rows, parse_vector
+from backend.knowledge.packing import DEDUP_THRESHOLD, Candidate, pack_within_budget
+from backend.knowledge.vector_ops import (
+    STORAGE_MODES,
+    apply_search_settings,
+    binary_prefilter_expr,
+    distance_expr,
+)
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
 
-# Loaded once at module import — model is ~90MB, cached on disk after first download
+BACKENDS = {"pgvector", "memory"}
+# Query vectors sent per SQL statement by retrieve_many (keeps bind payloads ~2MB)
+MANY_BATCH_SIZE = 256
+# Delay before retrying a failed warm-up, doubled per failure up to the maximum
+WARM_UP_RETRY_SECONDS = 5.0
+WARM_UP_MAX_RETRY_SECONDS = 300.0
+
+# Loaded once per process — model is ~90MB, cached on disk after first download
 _model: SentenceTransformer | None = None
+_model_lock = threading.Lock()
+_memory_index: InMemoryVectorIndex | None = None
+_corpus_version: CorpusVersion | None = None
+_ready = threading.Event()
 
 
 def _get_model() -> SentenceTransformer:
     """Lazy-load the embedding model (singleton per process)."""
     global _model
     if _model is None:
-        _model = SentenceTransformer("all-MiniLM-L6-v2")
+        with _model_lock:
+            if _model is None:
+                # Deferred: importing sentence_transformers pulls in torch (seconds)
+                from sentence_transformers import SentenceTransformer
+
+                _model = SentenceTransformer("all-MiniLM-L6-v2")
     return _model
 
 
+def warm_up() -> None:
+    """
+    Load the model, run a test encode and (memory backend) load the index.
+    Retries with backoff until it succeeds, e.g. once the database is up; a
+    missing sentence-transformers install is not retried.
+    """
+    delay = WARM_UP_RETRY_SECONDS
+    while True:
+        try:
+            _get_model().encode(["warm-up"], normalize_embeddings=True)
+            if settings.rag_backend == "memory":
+                from backend.database import SessionLocal
+
+                db = SessionLocal()
+                try:
+                    _get_memory_index().refresh(db)
+                finally:
+                    db.close()
+            _ready.set()
+            logger.info("RAG warm-up complete")
+            return
+        except ImportError:
+            logger.exception("RAG warm-up failed: sentence-transformers is not installed")
+            return
+        except Exception:
+            # Requests still work meanwhile; the first one pays the model load instead
+            logger.exception("RAG warm-up failed; retrying in %.0fs", delay)
+        time.sleep(delay)
+        delay = min(delay * 2, WARM_UP_MAX_RETRY_SECONDS)
+
+
+def start_warm_up() -> threading.Thread:
+    """Run warm_up() in a daemon thread so startup is not blocked."""
+    thread = threading.Thread(target=warm_up, name="rag-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready() -> bool:
+    """True once the embedding model is loaded and has encoded a query."""
+    return _ready.is_set()
+
+
+def _get_corpus_version() -> CorpusVersion:
+    """Process-wide knowledge_chunks version poll for the pgvector backend's result cache."""
+    global _corpus_version
+    if _corpus_version is None:
+        _corpus_version = CorpusVersion(refresh_seconds=settings.rag_index_refresh_seconds)
+    return _corpus_version
+
+
+def _get_memory_index() -> InMemoryVectorIndex:
+    """Process-wide in-memory index, shared by all retrievers (singleton per process)."""
+    global _memory_index
+    if _memory_index is None:
+        _memory_index = InMemoryVectorIndex(refresh_seconds=settings.rag_index_refresh_seconds)
+    return _memory_index
+
+
 class WellnessRetriever:
     """
     Retrieves top-k relevant wellness knowledge chunks for a given query.
@@ -34,10 +137,52 @@ class WellnessRetriever:
         retriever = WellnessRetriever(db)
         docs = retriever.retrieve("sleep 6h quality 3/5 stress 4/5 readiness 58", k=2)
         # docs → list of 2 wellness guideline strings
+
+    backend="memory" answers from an in-process copy of knowledge_chunks that is
+    reloaded when the table changes (polled every rag_index_refresh_seconds).
+    metric / index_type / storage / probes / ef_search default to the rag_*
+    settings and must match the index built by the migrations (see vector_ops.py).
+    With storage="binary" the index returns rerank_candidates rows by Hamming
+    distance, which are then re-ranked exactly on the float32 embeddings.
     """
 
-    def __init__(self, db: Session) -> None:
+    def __init__(
+        self,
+        db: Session,
+        backend: str | None = None,
+        metric: str | None = None,
+        index_type: str | None = None,
+        probes: int | None = None,
+        ef_search: int | None = None,
+        storage: str | None = None,
+        rerank_candidates: int | None = None,
+    ) -> None:
         self.db = db
+        self.backend = backend or settings.rag_backend
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown RAG backend: {self.backend!r} (expected one of {sorted(BACKENDS)})")
+        self.metric = metric or settings.rag_distance_metric
+        self.index_type = index_type or settings.rag_index_type
+        self.probes = probes
+        self.ef_search = ef_search
+        self.storage = storage or settings.rag_storage
+        if self.storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode: {self.storage!r} (expected one of {sorted(STORAGE_MODES)})")
+        if self.backend == "pgvector" and self.storage != "vector" and self.index_type != "hnsw":
+            # The compact indexes are HNSW only; ivfflat.probes would tune nothing
+            raise ValueError(f"storage={self.storage!r} needs index_type='hnsw' (set RAG_INDEX_TYPE=hnsw)")
+        self.rerank_candidates = rerank_candidates or settings.rag_rerank_candidates
+        # Built once; raises ValueError for an unknown metric
+        self._distance = distance_expr(self.metric, storage=self.storage)
+        self._distance_many = distance_expr(self.metric, param="q.emb", storage=self.storage)
+        # Everything that changes the top-k; the corpus version is added per call
+        self._cache_scope = (
+            self.backend, self.metric, self.index_type, self.storage,
+            self.probes or settings.rag_ivfflat_probes, self.ef_search or settings.rag_hnsw_ef_search,
+            self.rerank_candidates,
+        )
+        self._tuned_transaction = None
+        self._tuned_ef_search = 0
         self.model = _get_model()
 
     def retrieve(self, query: str, k: int = 2) -> list[str]:
@@ -53,19 +198,194 @@ class WellnessRetriever:
             List of guideline strings, ordered by relevance (most relevant first).
             Returns [] if the knowledge_chunks table is empty or an error occurs.
         """
+        return self.retrieve_many([query], k)[0]
+
+    def retrieve_many(self, queries: list[str], k: int = 2) -> list[list[str]]:
+        """
+        Batched retrieve(): one encode() call and one search for all queries.
+
+        Queries are canonicalized (case/whitespace) and de-duplicated first;
+        cached results and embeddings are reused (see backend/knowledge/cache.py).
+
+        Args:
+            queries: One state description per user (see retrieve()).
+            k:       Number of chunks to retrieve per query.
+
+        Returns:
+            One list of guideline strings per query, in the same order as queries.
+            Every list is [] if an error occurs.
+        """
+        if not queries:
+            return []
         try:
-            embedding: list[float] = self.model.encode(query).tolist()
-            # pgvector <-> operator = cosine distance (lower = more similar)
-            rows = self.db.execute(
-                """
-                SELECT content
-                FROM knowledge_chunks
-                ORDER BY embedding <-> CAST(:emb AS vector)
-                LIMIT :k
-                """,
-                {"emb": str(embedding), "k": k},
-            ).fetchall()
-            return [row[0] for row in rows]
+            index = None
+            if self.backend == "memory":
+                index = _get_memory_index()
+                if index.maybe_refresh(self.db):
+                    result_cache.clear()
+                version = index.version
+            else:
+                version = _get_corpus_version().get(self.db)
+            # Results from an older corpus are never served, in any process
+            scope = (*self._cache_scope, version)
+
+            results: list[list[str] | None] = [None] * len(queries)
+            pending: dict[str, list[int]] = {}
+            for i, query in enumerate(queries):
+                canonical = canonical_query(query)
+                cached = result_cache.get((*scope, canonical, k))
+                if cached is not None:
+                    results[i] = list(cached)
+                else:
+                    pending.setdefault(canonical, []).append(i)
+
+            if pending:
+                unique = list(pending)
+                embeddings = self._encode(unique)
+                if index is not None:
+                    found = index.search_many(embeddings, k)
+                else:
+                    vectors = [emb.tolist() for emb in embeddings]
+                    found = []
+                    for start in range(0, len(vectors), MANY_BATCH_SIZE):
+                        found.extend(self._search_pgvector_many(vectors[start:start + MANY_BATCH_SIZE], k))
+                for canonical, docs in zip(unique, found):
+                    if docs:
+                        result_cache.put((*scope, canonical, k), tuple(docs))
+                    for i in pending[canonical]:
+                        results[i] = list(docs)
+            # The model and index work, whatever happened to the warm-up
+            _ready.set()
+            return results
         except Exception:
             # Graceful degradation: if RAG fails, agent proceeds without guidelines
+            return [[] for _ in queries]
+
+    def retrieve_within_budget(
+        self,
+        query: str,
+        token_budget: int,
+        category: str | None = None,
+        max_candidates: int = 8,
+        dedup_threshold: float = DEDUP_THRESHOLD,
+    ) -> list[str]:
+        """
+        Return the most relevant chunks that together fit token_budget.
+
+        Args:
+            query:           Free-text description of user's current state.
+            token_budget:    Token allowance for guidelines in the agent prompt.
+            category:        Only consider chunks of this category (e.g. 'sleep').
+            max_candidates:  How many nearest chunks to consider before packing.
+            dedup_threshold: Drop chunks this similar to one already packed.
+
+        Returns:
+            Guideline strings in relevance order; [] if nothing fits or on error.
+        """
+        try:
+            embedding = self._encode([canonical_query(query)])[0]
+            if self.backend == "memory":
+                index = _get_memory_index()
+                if index.maybe_refresh(self.db):
+                    result_cache.clear()
+                candidates = index.candidates(embedding, max_candidates, category)
+            else:
+                candidates = self._candidates_pgvector(embedding.tolist(), max_candidates, category)
+            return [c.content for c in pack_within_budget(candidates, token_budget, dedup_threshold)]
+        except Exception:
             return []
+
+    def _encode(self, canonical_queries: list[str]) -> np.ndarray:
+        """Unit-length embeddings, encoding only queries missing from the cache."""
+        vectors = [embedding_cache.get(q) for q in canonical_queries]
+        todo = [q for q, v in zip(canonical_queries, vectors) if v is None]
+        if todo:
+            encoded = dict(zip(todo, self.model.encode(todo, normalize_embeddings=True)))
+            for q, vector in encoded.items():
+                embedding_cache.put(q, vector)
+            vectors = [v if v is not None else encoded[q] for q, v in zip(canonical_queries, vectors)]
+        return np.vstack(vectors)
+
+    def _tune_search(self, candidates: int = 0) -> None:
+        """
+        Apply probes / ef_search once per transaction (SET LOCAL semantics).
+        An HNSW scan returns at most ef_search rows, so for the binary
+        pre-filter ef_search is raised to the number of candidates it must return.
+        """
+        ef_search = self.ef_search or settings.rag_hnsw_ef_search
+        if self.storage == "binary":
+            ef_search = max(ef_search, candidates)
+        transaction = self.db.get_transaction()
+        if (transaction is None or transaction is not self._tuned_transaction
+                or ef_search > self._tuned_ef_search):
+            apply_search_settings(self.db, self.index_type, self.probes, ef_search)
+            self._tuned_transaction = self.db.get_transaction()
+            self._tuned_ef_search = ef_search
+
+    def _source(self, param: str, where: str = "") -> str:
+        """FROM clause; for binary storage, a Hamming pre-filter subquery on the bit index."""
+        if self.storage != "binary":
+            return f"knowledge_chunks {where}"
+        return (
+            f"(SELECT content, category, embedding FROM knowledge_chunks {where} "
+            f"ORDER BY {binary_prefilter_expr(param=param)} "
+            f"LIMIT :candidates) AS knowledge_chunks"
+        )
+
+    def _search_pgvector_many(self, embeddings: list[list[float]], k: int) -> list[list[str]]:
+        # One statement for the whole batch: unnest the query vectors and run the
+        # per-query top-k as a LATERAL subquery (uses the index once per query: the
+        # ordering operator matches the index operator class).
+        self._tune_search(max(k, self.rerank_candidates))
+        rows = self.db.execute(
+            text(
+                f"""
+                SELECT q.ord, c.content
+                FROM unnest(CAST(:embs AS text[])) WITH ORDINALITY AS q(emb, ord)
+                CROSS JOIN LATERAL (
+                    SELECT content, {self._distance_many} AS distance
+                    FROM {self._source("q.emb")}
+                    ORDER BY distance
+                    LIMIT :k
+                ) AS c
+                ORDER BY q.ord, c.distance
+                """
+            ),
+            {
+                "embs": [str(emb) for emb in embeddings],
+                "k": k,
+                "candidates": max(k, self.rerank_candidates),
+            },
+        ).fetchall()
+        results: list[list[str]] = [[] for _ in embeddings]
+        for ord_, content in rows:
+            results[ord_ - 1].append(content)
+        return results
+
+    def _candidates_pgvector(
+        self, embedding: list[float], n: int, category: str | None
+    ) -> list[Candidate]:
+        self._tune_search(max(n, self.rerank_candidates))
+        where = "WHERE category = :category" if category is not None else ""
+        rows = self.db.execute(
+            text(
+                f"""
+                SELECT content, category, CAST(embedding AS text)
+                FROM {self._source(":emb", where)}
+                ORDER BY {self._distance}
+                LIMIT :n
+                """
+            ),
+            {
+                "emb": str(embedding),
+                "n": n,
+                "category": category,
+                "candidates": max(n, self.rerank_candidates),
+            },
+        ).fetchall()
+        query = np.asarray(embedding, dtype=np.float32)
+        candidates = []
+        for content, chunk_category, raw in rows:
+            vector = normalize_rows(parse_vector(raw))[0]
+            candidates.append(Candidate(content, chunk_category, vector, float(vector @ query)))
+        return candidates
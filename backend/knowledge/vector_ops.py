@@ -0,0 +1,165 @@
+"""
+Distance metric and index helpers for the knowledge_chunks vector search.
+
+pgvector only uses an index when the ORDER BY operator matches the index
+operator class (e.g. <=> with vector_cosine_ops). Both are derived from
+settings.rag_distance_metric here so migration, ingest and retriever agree.
+
+settings.rag_storage selects how the index stores embeddings:
+    vector   full float32 (4 bytes/dim)
+    halfvec  float16 expression index (2 bytes/dim, ~2x smaller)
+    binary   1 bit/dim expression index (~32x smaller) used as a Hamming-distance
+             pre-filter; candidates are re-ranked exactly on the float32 column
+
+Only the index is compact: the table keeps the float32 column (the halfvec and
+bit keys are expressions over it, and binary re-ranks on it). The compact
+indexes are HNSW only, and they add to the float32 index until that one is
+dropped (--drop-unused).
+
+Rebuild the index to match the current settings:
+    python -m backend.knowledge.vector_ops                          # print DDL
+    python -m backend.knowledge.vector_ops --apply                  # drop + create index
+    python -m backend.knowledge.vector_ops --apply --drop-unused    # also drop the other storage modes' indexes
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from backend.config import settings
+
+# metric → (pgvector distance operator, operator class suffix)
+METRICS: dict[str, tuple[str, str]] = {
+    "cosine": ("<=>", "cosine_ops"),
+    "l2": ("<->", "l2_ops"),
+    "inner_product": ("<#>", "ip_ops"),
+}
+INDEX_TYPES = {"ivfflat", "hnsw"}
+INDEX_NAME = "knowledge_chunks_embedding_idx"
+# all-MiniLM-L6-v2 output dimension (knowledge_chunks.embedding is vector(384))
+DIM = 384
+STORAGE_INDEX_NAMES = {
+    "vector": INDEX_NAME,
+    "halfvec": "knowledge_chunks_embedding_half_idx",
+    "binary": "knowledge_chunks_embedding_bq_idx",
+}
+STORAGE_MODES = set(STORAGE_INDEX_NAMES)
+
+
+def _check(metric: str | None = None, index_type: str | None = None, storage: str | None = None) -> None:
+    if storage is not None and storage not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage mode: {storage!r} (expected one of {sorted(STORAGE_MODES)})")
+    if metric is not None and metric not in METRICS:
+        raise ValueError(f"Unknown distance metric: {metric!r} (expected one of {sorted(METRICS)})")
+    if index_type is not None and index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type!r} (expected one of {sorted(INDEX_TYPES)})")
+    if storage not in (None, "vector") and index_type == "ivfflat":
+        raise ValueError(f"storage={storage!r} needs index_type='hnsw' (the compact indexes are HNSW only)")
+
+
+def distance_operator(metric: str) -> str:
+    """pgvector operator for metric; lower values always mean more similar."""
+    _check(metric)
+    return METRICS[metric][0]
+
+
+def operator_class(metric: str, vector_type: str = "vector") -> str:
+    """Index operator class for metric, e.g. vector_cosine_ops."""
+    _check(metric)
+    return f"{vector_type}_{METRICS[metric][1]}"
+
+
+def distance_expr(
+    metric: str, column: str = "embedding", param: str = ":emb", storage: str = "vector"
+) -> str:
+    """
+    SQL expression ordering rows by distance to a bound query vector.
+
+    For storage="halfvec" both sides are cast so the halfvec expression index
+    matches; "binary" re-ranks on the full-precision column (see binary_prefilter_expr).
+    """
+    _check(storage=storage)
+    operator = distance_operator(metric)
+    if storage == "halfvec":
+        return f"CAST({column} AS halfvec({DIM})) {operator} CAST({param} AS halfvec({DIM}))"
+    return f"{column} {operator} CAST({param} AS vector)"
+
+
+def binary_prefilter_expr(column: str = "embedding", param: str = ":emb") -> str:
+    """Hamming distance between sign-quantized row and query (matches the binary index)."""
+    return f"CAST(binary_quantize({column}) AS bit({DIM})) <~> binary_quantize(CAST({param} AS vector))"
+
+
+def index_ddl(
+    metric: str,
+    index_type: str,
+    table: str = "knowledge_chunks",
+    name: str | None = None,
+    lists: int = 10,
+    m: int = 16,
+    ef_construction: int = 64,
+    storage: str = "vector",
+) -> str:
+    """CREATE INDEX statement for the embedding column matching metric and storage."""
+    _check(metric, index_type, storage)
+    if index_type == "ivfflat":
+        options = f"lists = {lists}"
+    else:
+        options = f"m = {m}, ef_construction = {ef_construction}"
+    if storage == "halfvec":
+        key = f"(CAST(embedding AS halfvec({DIM}))) {operator_class(metric, 'halfvec')}"
+    elif storage == "binary":
+        key = f"(CAST(binary_quantize(embedding) AS bit({DIM}))) bit_hamming_ops"
+    else:
+        key = f"embedding {operator_class(metric)}"
+    return (
+        f"CREATE INDEX IF NOT EXISTS {name or STORAGE_INDEX_NAMES[storage]} ON {table} "
+        f"USING {index_type} ({key}) WITH ({options})"
+    )
+
+
+def apply_search_settings(
+    db: Session,
+    index_type: str,
+    probes: int | None = None,
+    ef_search: int | None = None,
+) -> None:
+    """Set ivfflat.probes / hnsw.ef_search for the current transaction only."""
+    _check(index_type=index_type)
+    if index_type == "ivfflat":
+        name, value = "ivfflat.probes", probes or settings.rag_ivfflat_probes
+    else:
+        name, value = "hnsw.ef_search", ef_search or settings.rag_hnsw_ef_search
+    db.execute(text("SELECT set_config(:name, :value, true)"), {"name": name, "value": str(value)})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the knowledge_chunks embedding index")
+    parser.add_argument("--metric", default=settings.rag_distance_metric, choices=sorted(METRICS))
+    parser.add_argument("--index-type", default=settings.rag_index_type, choices=sorted(INDEX_TYPES))
+    parser.add_argument("--storage", default=settings.rag_storage, choices=sorted(STORAGE_MODES))
+    parser.add_argument("--lists", type=int, default=settings.rag_ivfflat_lists)
+    parser.add_argument("--apply", action="store_true", help="drop and recreate the index")
+    parser.add_argument("--drop-unused", action="store_true",
+                        help="also drop the indexes of the other storage modes (the compact saving needs this)")
+    args = parser.parse_args()
+
+    name = STORAGE_INDEX_NAMES[args.storage]
+    ddl = index_ddl(args.metric, args.index_type, lists=args.lists, storage=args.storage)
+    drops = [name] + ([n for n in STORAGE_INDEX_NAMES.values() if n != name] if args.drop_unused else [])
+    statements = [f"DROP INDEX IF EXISTS {n}" for n in drops] + [ddl]
+    print("".join(f"{statement};\n" for statement in statements), end="")
+    if args.apply:
+        from backend.database import engine
+
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+        print("Index rebuilt.")
+
+
+if __name__ == "__main__":
+    main()
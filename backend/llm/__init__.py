@@ -0,0 +1,2 @@
+# backend/llm/__init__.py
+# Shared, rate-limited async client for the Anthropic Messages API
@@ -0,0 +1,362 @@
+"""
+Offline batch generation for EVENING_SUMMARY.
+
+Evening summaries are not latency-sensitive, so instead of one real-time
+call per user (which competes with morning traffic for the rate limit) all
+prompts go into one batch job. A job can take hours, so the event handler
+only submits it, records it in llm_batch_jobs and returns (the event is
+acked); collect_batches() — run by poll_batches() in the API process — later
+writes every AgentOutput of each finished job in one bulk insert.
+
+    AnthropicBatchBackend — Message Batches API (/v1/messages/batches)
+    LocalBatchBackend     — in-process stand-in for tests and offline runs
+
+Usage:
+    handler = evening_batch_handler(build_prompt)     # build_prompt(db, user_id, day) -> str | None
+    gateway.register(EventType.EVENING_SUMMARY, handler)
+    asyncio.create_task(poll_batches(AsyncSessionLocal))   # started by backend/main.py
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Protocol, Sequence
+
+import httpx
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from backend.agents.idempotency import missing_output_user_ids, save_outputs
+from backend.config import settings
+from backend.database import run_sync_db
+from backend.events.event_types import WellnessEvent
+from backend.events.fanout import all_user_ids
+from backend.llm.client import ANTHROPIC_VERSION
+from backend.models.llm_batch_job import LLMBatchJob
+
+logger = logging.getLogger(__name__)
+
+# Message Batches API limit is 100k requests; smaller jobs finish (and fail) independently
+MAX_BATCH_REQUESTS = 10_000
+
+
+@dataclass
+class BatchRequest:
+    custom_id: str
+    prompt: str
+    system: str | None = None
+    max_tokens: int | None = None
+
+
+@dataclass
+class BatchResult:
+    custom_id: str
+    text: str | None = None
+    model: str | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BatchBackend(Protocol):
+    async def submit(self, requests: Sequence[BatchRequest], model: str) -> str: ...
+
+    async def is_done(self, batch_id: str) -> bool: ...
+
+    async def results(self, batch_id: str) -> list[BatchResult]: ...
+
+
+class AnthropicBatchBackend:
+    def __init__(self, api_key: str | None = None, base_url: str | None = None,
+                 transport: httpx.AsyncBaseTransport | None = None) -> None:
+        self._http = httpx.AsyncClient(
+            base_url=base_url or settings.llm_base_url,
+            headers={
+                "x-api-key": api_key if api_key is not None else settings.anthropic_api_key,
+                "anthropic-version": ANTHROPIC_VERSION,
+                "content-type": "application/json",
+            },
+            timeout=settings.llm_timeout_seconds,
+            transport=transport,
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def submit(self, requests: Sequence[BatchRequest], model: str) -> str:
+        body = {"requests": [
+            {
+                "custom_id": r.custom_id,
+                "params": {
+                    "model": model,
+                    "max_tokens": r.max_tokens or settings.llm_max_tokens,
+                    "messages": [{"role": "user", "content": r.prompt}],
+                    **({"system": r.system} if r.system else {}),
+                },
+            }
+            for r in requests
+        ]}
+        response = await self._http.post("/v1/messages/batches", json=body)
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def is_done(self, batch_id: str) -> bool:
+        response = await self._http.get(f"/v1/messages/batches/{batch_id}")
+        response.raise_for_status()
+        return response.json()["processing_status"] == "ended"
+
+    async def results(self, batch_id: str) -> list[BatchResult]:
+        response = await self._http.get(f"/v1/messages/batches/{batch_id}/results")
+        response.raise_for_status()
+        results = []
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            result = item["result"]
+            if result["type"] == "succeeded":
+                message = result["message"]
+                text = "".join(b.get("text", "") for b in message.get("content", []) if b.get("type") == "text")
+                results.append(BatchResult(item["custom_id"], text=text, model=message.get("model")))
+            else:
+                error = result.get("error", {}).get("message") or result["type"]
+                results.append(BatchResult(item["custom_id"], error=error))
+        return results
+
+
+class LocalBatchBackend:
+    """
+    In-process batch backend: a job ends after `polls_until_done` is_done()
+    calls; generate(request, model) produces each text (default: an echo).
+    """
+
+    def __init__(self, generate: Callable[[BatchRequest, str], Any] | None = None,
+                 polls_until_done: int = 1) -> None:
+        self._generate = generate or (lambda request, model: f"Summary for {request.custom_id}")
+        self._polls_until_done = polls_until_done
+        self._jobs: dict[str, dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self.submitted: list[int] = []  # request count per submitted job
+
+    async def submit(self, requests: Sequence[BatchRequest], model: str) -> str:
+        batch_id = f"local_batch_{next(self._ids)}"
+        self._jobs[batch_id] = {"requests": list(requests), "model": model, "polls": 0}
+        self.submitted.append(len(requests))
+        return batch_id
+
+    async def is_done(self, batch_id: str) -> bool:
+        job = self._jobs[batch_id]
+        job["polls"] += 1
+        return job["polls"] >= self._polls_until_done
+
+    async def results(self, batch_id: str) -> list[BatchResult]:
+        job = self._jobs.pop(batch_id)
+        results = []
+        for request in job["requests"]:
+            try:
+                text = self._generate(request, job["model"])
+                if asyncio.iscoroutine(text):
+                    text = await text
+                results.append(BatchResult(request.custom_id, text=text, model=job["model"]))
+            except Exception as e:
+                results.append(BatchResult(request.custom_id, error=f"{type(e).__name__}: {e}"))
+        return results
+
+
+_backend: BatchBackend | None = None
+
+
+def get_batch_backend() -> BatchBackend:
+    """Process-wide backend, shared by the handler and the poller (one connection pool)."""
+    global _backend
+    if _backend is None:
+        _backend = LocalBatchBackend() if settings.llm_batch_backend == "local" else AnthropicBatchBackend()
+    return _backend
+
+
+async def close_batch_backend() -> None:
+    global _backend
+    if _backend is not None and hasattr(_backend, "aclose"):
+        await _backend.aclose()
+    _backend = None
+
+
+async def submit_batches(
+    backend: BatchBackend, requests: Sequence[BatchRequest], model: str
+) -> list[tuple[str, Sequence[BatchRequest]]]:
+    """Submit requests in jobs of MAX_BATCH_REQUESTS; returns (batch_id, requests) per job."""
+    jobs = []
+    for i in range(0, len(requests), MAX_BATCH_REQUESTS):
+        chunk = requests[i:i + MAX_BATCH_REQUESTS]
+        jobs.append((await backend.submit(chunk, model), chunk))
+    return jobs
+
+
+async def run_batch(
+    backend: BatchBackend,
+    requests: Sequence[BatchRequest],
+    model: str | None = None,
+    poll_interval: float | None = None,
+    timeout: float | None = None,
+) -> list[BatchResult]:
+    """
+    Submit requests, poll until all jobs end, return all results. Blocks for
+    as long as the jobs run — for scripts; event handlers use
+    evening_batch_handler + collect_batches instead.
+    """
+    model = model or settings.llm_model
+    poll_interval = settings.llm_batch_poll_interval_seconds if poll_interval is None else poll_interval
+    timeout = settings.llm_batch_timeout_seconds if timeout is None else timeout
+    if not requests:
+        return []
+
+    batch_ids = [batch_id for batch_id, _ in await submit_batches(backend, requests, model)]
+    logger.info("run_batch: submitted %d requests in %d job(s)", len(requests), len(batch_ids))
+
+    deadline = time.monotonic() + timeout
+    pending = list(batch_ids)
+    results: list[BatchResult] = []
+    while pending:
+        still_running = []
+        for batch_id in pending:
+            if await backend.is_done(batch_id):
+                results.extend(await backend.results(batch_id))
+            else:
+                still_running.append(batch_id)
+        pending = still_running
+        if pending:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"batch jobs {pending} did not finish within {timeout:.0f}s")
+            await asyncio.sleep(poll_interval)
+    return results
+
+
+def _user_ids_in_pending_jobs(db: Session, day: date, event_type: str) -> set[int]:
+    jobs = db.scalars(select(LLMBatchJob.user_ids).where(
+        LLMBatchJob.date == day, LLMBatchJob.event_type == event_type, LLMBatchJob.status == "pending"))
+    return {user_id for user_ids in jobs for user_id in user_ids}
+
+
+def _record_job(db: Session, **values: Any) -> None:
+    db.add(LLMBatchJob(**values))
+    db.commit()
+
+
+def evening_batch_handler(
+    build_prompt: Callable[..., Any],
+    backend: BatchBackend | None = None,
+    system: str | None = None,
+    model: str | None = None,
+) -> Callable[..., Awaitable[int]]:
+    """
+    Gateway handler for EVENING_SUMMARY in batch mode.
+
+    build_prompt(db, user_id, day) returns the user's prompt, or None to skip
+    the user (e.g. no data today). Users that already have today's summary,
+    or are in a job that is still pending (a redelivered event), are skipped
+    up front. Each submitted job is recorded in llm_batch_jobs before the next
+    one is sent, and the handler returns without waiting for results. Returns
+    the number of requests submitted.
+    """
+
+    async def handler(event: WellnessEvent, db, **kwargs) -> int:
+        job_backend = backend or get_batch_backend()
+        job_model = model or settings.llm_model
+        day: date = event.fired_at.date()
+        event_type = event.type.value
+        user_ids = list(event.user_ids) or await run_sync_db(db, all_user_ids)
+        user_ids = await run_sync_db(db, missing_output_user_ids, user_ids, day, event_type)
+        submitted = await run_sync_db(db, _user_ids_in_pending_jobs, day, event_type)
+
+        requests = []
+        for user_id in user_ids:
+            if user_id in submitted:
+                continue
+            prompt = build_prompt(db, user_id, day)
+            if asyncio.iscoroutine(prompt):
+                prompt = await prompt
+            if prompt:
+                requests.append(BatchRequest(custom_id=f"user-{user_id}", prompt=prompt, system=system))
+
+        for i in range(0, len(requests), MAX_BATCH_REQUESTS):
+            chunk = requests[i:i + MAX_BATCH_REQUESTS]
+            batch_id = await job_backend.submit(chunk, job_model)
+            await run_sync_db(
+                db, _record_job, batch_id=batch_id, event_type=event_type, date=day, model=job_model,
+                user_ids=[int(r.custom_id.removeprefix("user-")) for r in chunk],
+            )
+            logger.info("evening batch: submitted %s with %d requests", batch_id, len(chunk))
+        return len(requests)
+
+    return handler
+
+
+def _pending_jobs(db: Session) -> list:
+    return db.execute(
+        select(LLMBatchJob.id, LLMBatchJob.batch_id, LLMBatchJob.event_type, LLMBatchJob.date,
+               LLMBatchJob.model, LLMBatchJob.submitted_at)
+        .where(LLMBatchJob.status == "pending").order_by(LLMBatchJob.submitted_at)
+    ).all()
+
+
+def _finish_job(db: Session, job_id: int, status: str, written: int = 0, error: str | None = None) -> None:
+    db.execute(
+        update(LLMBatchJob).where(LLMBatchJob.id == job_id, LLMBatchJob.status == "pending")
+        .values(status=status, written=written, last_error=error, finished_at=datetime.utcnow())
+    )
+    db.commit()
+
+
+async def collect_batches(db, backend: BatchBackend | None = None, timeout: float | None = None) -> int:
+    """
+    Write the outputs of every pending job that has ended and mark it done;
+    jobs still running after `timeout` seconds are marked failed. Returns the
+    number of outputs written. Two pollers collecting the same job is
+    harmless: outputs are inserted with ON CONFLICT DO NOTHING.
+    """
+    backend = backend or get_batch_backend()
+    timeout = settings.llm_batch_timeout_seconds if timeout is None else timeout
+    total = 0
+    for job in await run_sync_db(db, _pending_jobs):
+        if not await backend.is_done(job.batch_id):
+            if datetime.utcnow() - job.submitted_at > timedelta(seconds=timeout):
+                logger.error("evening batch: %s did not end within %.0fs", job.batch_id, timeout)
+                await run_sync_db(db, _finish_job, job.id, "failed", error=f"not ended within {timeout:.0f}s")
+            continue
+        rows = []
+        for result in await backend.results(job.batch_id):
+            if not result.ok:
+                logger.warning("evening batch: %s failed: %s", result.custom_id, result.error)
+                continue
+            rows.append({
+                "user_id": int(result.custom_id.removeprefix("user-")),
+                "date": job.date,
+                "event_type": job.event_type,
+                "llm_text": result.text,
+                "model_used": result.model or job.model,
+            })
+        written = await run_sync_db(db, save_outputs, rows)
+        await run_sync_db(db, _finish_job, job.id, "done", written)
+        logger.info("evening batch: %s done, %d summaries written", job.batch_id, written)
+        total += written
+    return total
+
+
+async def poll_batches(session_factory, backend: BatchBackend | None = None, interval: float | None = None) -> None:
+    """Run collect_batches every llm_batch_poll_interval_seconds until cancelled."""
+    interval = settings.llm_batch_poll_interval_seconds if interval is None else interval
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as db:
+                await collect_batches(db, backend)
+        except Exception:
+            logger.exception("evening batch: collecting results failed")
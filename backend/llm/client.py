@@ -0,0 +1,321 @@
+"""
+Shared async client for the Anthropic Messages API.
+
+Agents call the model once per user, so the 06:00 fan-out is a burst of
+hundreds of requests. LLMClient keeps that burst inside the account limits:
+
+    - two token buckets: requests/minute and tokens/minute (prompt estimate
+      + max_tokens per request sent, corrected with the reported usage
+      afterwards, refunded when the API answers with an error)
+    - a semaphore bounding in-flight requests
+    - per-request timeout; 429 (honouring retry-after, in seconds or as an
+      HTTP date), 5xx, 529 and timeouts are retried with exponential backoff
+      and jitter
+    - optional hedging: if a request is still running after hedge_after
+      seconds and both buckets have room, a second copy is sent (and charged)
+      and the first answer wins
+    - one pooled httpx.AsyncClient (keep-alive connections) for all calls
+
+Usage:
+    client = get_llm_client()
+    response = await client.complete(prompt, system="You are a wellness coach.")
+    response.text, response.model
+
+LLM_BASE_URL can point at the local mock server (backend/llm/mock_server.py)
+for offline benchmarks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import httpx
+
+from backend.config import settings
+from backend.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+ANTHROPIC_VERSION = "2023-06-01"
+RETRY_STATUS = {429, 500, 502, 503, 504, 529}
+
+
+class LLMError(Exception):
+    """Request failed permanently (non-retryable status or retries exhausted)."""
+
+    def __init__(self, message: str, status_code: int | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _Retryable(Exception):
+    def __init__(self, message: str, status_code: int | None = None, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    model: str
+    input_tokens: int
+    output_tokens: int
+    latency_s: float
+    attempts: int = 1
+
+
+class TokenBucket:
+    """
+    Async token bucket: `capacity` tokens, refilled at capacity/period per second.
+
+    acquire(n) waits until n tokens are available; waiters are served in order.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        amount = min(float(amount), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+    def try_acquire(self, amount: float = 1.0) -> bool:
+        """Take n tokens only if available right now and nobody is waiting; never waits."""
+        amount = min(float(amount), self.capacity)
+        if self._lock.locked():
+            return False
+        self._refill()
+        if self._tokens < amount:
+            return False
+        self._tokens -= amount
+        return True
+
+    def adjust(self, delta: float) -> None:
+        """Give back (delta > 0) or charge (delta < 0) tokens after the fact."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + delta)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class LLMClient:
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        model: str | None = None,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        max_concurrency: int | None = None,
+        timeout: float | None = None,
+        max_retries: int | None = None,
+        retry_backoff: float | None = None,
+        hedge_after: float | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.model = model or settings.llm_model
+        self.max_retries = settings.llm_max_retries if max_retries is None else max_retries
+        self.retry_backoff = settings.llm_retry_backoff_seconds if retry_backoff is None else retry_backoff
+        # 0 disables hedging
+        self.hedge_after = settings.llm_hedge_after_seconds if hedge_after is None else hedge_after
+        self._requests = TokenBucket(requests_per_minute or settings.llm_requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute or settings.llm_tokens_per_minute)
+        concurrency = max_concurrency or settings.llm_max_concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._http = httpx.AsyncClient(
+            base_url=base_url or settings.llm_base_url,
+            headers={
+                "x-api-key": api_key if api_key is not None else settings.anthropic_api_key,
+                "anthropic-version": ANTHROPIC_VERSION,
+                "content-type": "application/json",
+            },
+            timeout=timeout or settings.llm_timeout_seconds,
+            # Room for a hedged duplicate of every in-flight request
+            limits=httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2),
+            transport=transport,
+        )
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "hedged": 0, "failed": 0}
+
+    async def __aenter__(self) -> "LLMClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def complete(
+        self,
+        prompt: str,
+        system: str | None = None,
+        max_tokens: int | None = None,
+        model: str | None = None,
+    ) -> LLMResponse:
+        max_tokens = max_tokens or settings.llm_max_tokens
+        body: dict[str, Any] = {
+            "model": model or self.model,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        if system:
+            body["system"] = system
+        estimate = estimate_tokens(prompt) + estimate_tokens(system or "") + max_tokens
+
+        started = time.perf_counter()
+        for attempt in range(1, self.max_retries + 2):
+            await self._requests.acquire()
+            await self._tokens.acquire(estimate)
+            try:
+                async with self._semaphore:
+                    data = await self._send_hedged(body, estimate)
+            except _Retryable as e:
+                if attempt > self.max_retries:
+                    self.stats["failed"] += 1
+                    raise LLMError(f"LLM request failed after {attempt} attempts: {e}", e.status_code) from e
+                self.stats["retries"] += 1
+                delay = e.retry_after if e.retry_after is not None else self._backoff(attempt)
+                logger.debug("LLM request retry %d in %.2fs: %s", attempt, delay, e)
+                await asyncio.sleep(delay)
+                continue
+
+            usage = data.get("usage", {})
+            input_tokens = usage.get("input_tokens", 0)
+            output_tokens = usage.get("output_tokens", 0)
+            if usage:
+                self._tokens.adjust(estimate - input_tokens - output_tokens)
+            text = "".join(block.get("text", "") for block in data.get("content", []) if block.get("type") == "text")
+            return LLMResponse(
+                text=text,
+                model=data.get("model", body["model"]),
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                latency_s=time.perf_counter() - started,
+                attempts=attempt,
+            )
+        raise AssertionError("unreachable")
+
+    def _backoff(self, attempt: int) -> float:
+        return self.retry_backoff * 2 ** (attempt - 1) * (0.5 + random.random())
+
+    def _try_acquire_hedge(self, estimate: int) -> bool:
+        """Charge a hedged copy like any request, but only if both buckets have room now."""
+        if not self._requests.try_acquire():
+            return False
+        if not self._tokens.try_acquire(estimate):
+            self._requests.adjust(1)
+            return False
+        return True
+
+    async def _send_hedged(self, body: dict[str, Any], estimate: int) -> dict[str, Any]:
+        if not self.hedge_after:
+            return await self._send(body, estimate)
+        first = asyncio.create_task(self._send(body, estimate))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+        if not self._try_acquire_hedge(estimate):
+            # At the rate limit a duplicate would only take the budget of queued requests
+            return await first
+        self.stats["hedged"] += 1
+        second = asyncio.create_task(self._send(body, estimate))
+        pending = {first, second}
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _send(self, body: dict[str, Any], estimate: int = 0) -> dict[str, Any]:
+        """One request; `estimate` tokens charged for it are refunded if the API answers with an error."""
+        self.stats["requests"] += 1
+        try:
+            response = await self._http.post("/v1/messages", json=body)
+        except httpx.TimeoutException as e:
+            raise _Retryable(f"timeout: {e!r}") from e
+        except httpx.TransportError as e:
+            raise _Retryable(f"transport error: {e!r}") from e
+
+        if response.status_code == 200:
+            return response.json()
+        # Rejected requests use no tokens; timeouts keep their charge (the API may have run them)
+        self._tokens.adjust(estimate)
+        if response.status_code == 429:
+            self.stats["rate_limited"] += 1
+        if response.status_code in RETRY_STATUS:
+            raise _Retryable(
+                f"HTTP {response.status_code}",
+                status_code=response.status_code,
+                retry_after=parse_retry_after(response.headers.get("retry-after")),
+            )
+        raise LLMError(f"HTTP {response.status_code}: {response.text[:500]}", response.status_code)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header: delay-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        logger.warning("Ignoring unparseable retry-after header: %r", value)
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+_client: LLMClient | None = None
+
+
+def get_llm_client() -> LLMClient:
+    """Process-wide client, so all agents share one rate limit and connection pool."""
+    global _client
+    if _client is None:
+        _client = LLMClient()
+    return _client
+
+
+async def close_llm_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,108 @@
+"""
+Local stand-in for the Anthropic Messages API, for offline benchmarks and tests.
+
+POST /v1/messages answers after a simulated latency and returns 429 with a
+retry-after header either at random (--rate-429) or when more than --rpm
+requests arrived in the last 60 seconds, like the real per-minute limit.
+
+Usage:
+    python -m backend.llm.mock_server --port 8089 --latency-ms 400 --rpm 600 --rate-429 0.02
+    LLM_BASE_URL=http://localhost:8089 python -m backend.benchmarks.llm_throughput
+
+In-process (no socket), as the tests and the benchmark do:
+    transport = httpx.ASGITransport(app=create_app(latency_ms=50))
+    LLMClient(transport=transport, base_url="http://mock")
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from collections import deque
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from backend.tokens import estimate_tokens
+
+
+def create_app(
+    latency_ms: float = 300.0,
+    jitter_ms: float = 100.0,
+    rate_429: float = 0.0,
+    rpm: int | None = None,
+    retry_after: float = 1.0,
+    seed: int | None = None,
+) -> FastAPI:
+    app = FastAPI(title="Mock Anthropic API")
+    rng = random.Random(seed)
+    recent: deque[float] = deque()
+    app.state.stats = {"requests": 0, "rate_limited": 0, "in_flight": 0, "peak_in_flight": 0}
+
+    def rate_limited() -> bool:
+        now = time.monotonic()
+        while recent and now - recent[0] > 60:
+            recent.popleft()
+        if rpm is not None and len(recent) >= rpm:
+            return True
+        recent.append(now)
+        return rng.random() < rate_429
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        stats = app.state.stats
+        stats["requests"] += 1
+        body = await request.json()
+        if rate_limited():
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": str(retry_after)},
+                content={"type": "error", "error": {"type": "rate_limit_error", "message": "mock rate limit"}},
+            )
+
+        stats["in_flight"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+        try:
+            delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+            await asyncio.sleep(delay)
+        finally:
+            stats["in_flight"] -= 1
+
+        prompt = "".join(
+            m["content"] if isinstance(m["content"], str) else str(m["content"]) for m in body.get("messages", [])
+        )
+        text = f"Mock recommendation ({len(prompt)} prompt chars)."
+        return {
+            "id": f"msg_mock_{stats['requests']}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "mock"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": estimate_tokens(prompt), "output_tokens": estimate_tokens(text)},
+        }
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="probability of a random 429")
+    parser.add_argument("--rpm", type=int, default=None, help="429 above this many requests per minute")
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.rate_429, args.rpm)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
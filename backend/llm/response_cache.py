@@ -0,0 +1,238 @@
+"""
+Persistent cache for LLM recommendations.
+
+A recommendation prompt is built from a small feature tuple (readiness
+bucket, intensity, 1–5 scales, retrieved guideline ids), so on a given day
+many users produce effectively the same prompt. The cache key is a hash of
+the canonical form of those inputs; entries live in llm_response_cache
+(migrations/add_llm_response_cache.sql), so they survive restarts and are
+shared by all workers.
+
+Every entry records the model that produced it (as reported in the API
+response) and is only served for that model, so changing LLM_MODEL starts
+from a cold cache. Set LLM_MODEL to a full model id: an alias the API
+resolves to another name would never match its stored entries. Entries expire after
+LLM_CACHE_TTL_SECONDS; the table is trimmed to LLM_CACHE_MAX_ENTRIES least
+recently used rows.
+
+A hit is a single SELECT: hit counts and last-used times are kept in memory
+and written every FLUSH_HITS_EVERY hits in one UPDATE. Cache writes run in
+their own transaction on the session's engine, so they never commit (or roll
+back) the caller's pending work.
+
+Usage:
+    features = recommendation_features("morning_recommendation", readiness_score=58.3,
+                                       intensity="moderate", sleep_quality=3, mood=4,
+                                       energy=3, stress=2, guideline_ids=[12, 4])
+    text, hit = await response_cache.get_or_generate(db, features, settings.llm_model, generate)
+    # generate() returns the LLMResponse, e.g. lambda: get_llm_client().complete(prompt)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterable, Mapping
+
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.config import settings
+from backend.database import on_conflict_insert, run_sync_db
+from backend.models.llm_cache import LLMCacheEntry
+
+if TYPE_CHECKING:
+    from backend.llm.client import LLMResponse
+
+logger = logging.getLogger(__name__)
+
+# Run eviction every N writes per process rather than on each one
+EVICT_EVERY = 100
+# Write the in-memory hit counts every N hits per process rather than on each one
+FLUSH_HITS_EVERY = 50
+
+_table = LLMCacheEntry.__table__
+_RECORD_HITS = (
+    update(_table)
+    .where(_table.c.id == bindparam("entry_id"))
+    .values(hits=_table.c.hits + bindparam("count"), last_used_at=bindparam("used_at"))
+)
+
+
+def readiness_bucket(score: float | None, width: int | None = None) -> int | None:
+    """Lower bound of the readiness band the score falls in (e.g. 58.3 → 55 for width 5)."""
+    if score is None:
+        return None
+    width = width or settings.llm_cache_readiness_bucket
+    return int(math.floor(score / width) * width)
+
+
+def recommendation_features(
+    event_type: str,
+    readiness_score: float | None = None,
+    intensity: str | None = None,
+    sleep_quality: int | None = None,
+    mood: int | None = None,
+    energy: int | None = None,
+    stress: int | None = None,
+    guideline_ids: Iterable[int] = (),
+    **extra: Any,
+) -> dict[str, Any]:
+    """
+    Prompt inputs that determine a recommendation. Pass anything else the
+    prompt depends on (e.g. prompt_version=2) as extra keyword arguments.
+    """
+    return {
+        "event_type": event_type,
+        "readiness": readiness_bucket(readiness_score),
+        "intensity": intensity,
+        "sleep_quality": sleep_quality,
+        "mood": mood,
+        "energy": energy,
+        "stress": stress,
+        "guidelines": sorted(set(guideline_ids)),
+        **extra,
+    }
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return sorted(_canonical(v) for v in value)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else round(value, 3)
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return value
+
+
+def cache_key(features: Mapping[str, Any]) -> str:
+    """sha256 of the canonical JSON form of the prompt inputs."""
+    canonical = json.dumps(_canonical(features), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(self, ttl_seconds: float | None = None, max_entries: int | None = None) -> None:
+        self.ttl_seconds = settings.llm_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.max_entries = settings.llm_cache_max_entries if max_entries is None else max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        # entry id → (hits not yet written, last hit time)
+        self._pending_hits: dict[int, tuple[int, datetime]] = {}
+        # (key, model) → generation in progress, so concurrent identical prompts call the model once
+        self._inflight: dict[tuple[str, str], asyncio.Task] = {}
+
+    def get(self, db: Session, key: str, model: str) -> str | None:
+        now = datetime.utcnow()
+        entry = db.execute(
+            select(LLMCacheEntry.id, LLMCacheEntry.response_text).where(
+                LLMCacheEntry.cache_key == key,
+                LLMCacheEntry.model_used == model,
+                LLMCacheEntry.expires_at > now,
+            )
+        ).first()
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        count, _ = self._pending_hits.get(entry.id, (0, now))
+        self._pending_hits[entry.id] = (count + 1, now)
+        if sum(count for count, _ in self._pending_hits.values()) >= FLUSH_HITS_EVERY:
+            self.flush_hits(db)
+        return entry.response_text
+
+    def flush_hits(self, db: Session) -> int:
+        """Write the pending hit counts and last-used times in one UPDATE. Returns the entries updated."""
+        pending, self._pending_hits = self._pending_hits, {}
+        if not pending:
+            return 0
+        with db.get_bind().begin() as conn:
+            conn.execute(_RECORD_HITS, [
+                {"entry_id": entry_id, "count": count, "used_at": used_at}
+                for entry_id, (count, used_at) in pending.items()
+            ])
+        return len(pending)
+
+    def put(self, db: Session, key: str, model: str, text: str) -> None:
+        now = datetime.utcnow()
+        values = {
+            "cache_key": key,
+            "model_used": model,
+            "response_text": text,
+            "hits": 0,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl_seconds),
+            "last_used_at": now,
+        }
+        bind = db.get_bind()
+        stmt = on_conflict_insert(bind, _table).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["cache_key", "model_used"],
+            set_={k: stmt.excluded[k] for k in ("response_text", "hits", "created_at", "expires_at", "last_used_at")},
+        )
+        with bind.begin() as conn:
+            conn.execute(stmt)
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            self.evict(db)
+
+    def evict(self, db: Session) -> int:
+        """Delete expired entries, then the least recently used beyond max_entries."""
+        # Recency must be up to date before choosing what to drop
+        self.flush_hits(db)
+        with db.get_bind().begin() as conn:
+            removed = conn.execute(delete(_table).where(_table.c.expires_at <= datetime.utcnow())).rowcount
+            excess = conn.execute(select(func.count()).select_from(_table)).scalar_one() - self.max_entries
+            if excess > 0:
+                oldest = select(_table.c.id).order_by(_table.c.last_used_at, _table.c.id).limit(excess)
+                removed += conn.execute(delete(_table).where(_table.c.id.in_(oldest))).rowcount
+        if removed:
+            logger.info("LLMResponseCache: evicted %d entries", removed)
+        return removed
+
+    async def get_or_generate(
+        self,
+        db: Session | AsyncSession,
+        features: Mapping[str, Any],
+        model: str,
+        generate: Callable[[], Awaitable[LLMResponse]],
+    ) -> tuple[str, bool]:
+        """
+        Cached text for (features, model), or generate() and store it under the
+        model the response reports. Returns (text, hit).
+        """
+        key = cache_key(features)
+        cached = await run_sync_db(db, self.get, key, model)
+        if cached is not None:
+            return cached, True
+
+        inflight = self._inflight.get((key, model))
+        if inflight is not None:
+            return (await asyncio.shield(inflight)).text, True
+
+        task = asyncio.ensure_future(generate())
+        self._inflight[(key, model)] = task
+        try:
+            response = await task
+        finally:
+            self._inflight.pop((key, model), None)
+        if response.model != model:
+            logger.warning("LLM cache: requested %s, response came from %s", model, response.model)
+        await run_sync_db(db, self.put, key, response.model, response.text)
+        return response.text, False
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+response_cache = LLMResponseCache()
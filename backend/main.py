@@ -1,9 +1,48 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from backend.config import settings
+from backend.database import AsyncSessionLocal, async_engine, engine
+from backend.events.consumer import EventConsumerPool
+from backend.events.gateway import EventGateway
+from backend.knowledge import retriever
+from backend.llm.batch import close_batch_backend, poll_batches
+from backend.llm.client import close_llm_client
+from backend.routers import exports, imports
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the embedding model in the background so the first request stays fast
+    if settings.rag_warm_up:
+        retriever.start_warm_up()
+
+    # Agents register their handlers on app.state.event_gateway
+    app.state.event_gateway = EventGateway()
+    # Handlers get an AsyncSession as db=; Session-based helpers go through database.run_sync_db
+    app.state.event_consumers = EventConsumerPool(app.state.event_gateway, db_factory=AsyncSessionLocal)
+    await app.state.event_consumers.start()
+    # Collects finished EVENING_SUMMARY batch jobs (the handler only submits them)
+    batch_poller = asyncio.create_task(poll_batches(AsyncSessionLocal), name="llm-batch-poller")
+
+    yield
 
-app = FastAPI(title="WellSync API", version="0.1.0")
+    batch_poller.cancel()
+    with suppress(asyncio.CancelledError):
+        await batch_poller
+    # Finish queued events (up to event_drain_timeout_seconds) before exiting
+    await app.state.event_consumers.stop(drain=True)
+    await close_llm_client()
+    await close_batch_backend()
+    await async_engine.dispose()
+    engine.dispose()
+
+
+app = FastAPI(title="WellSync API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,7 +52,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(imports.router)
+app.include_router(exports.router)
+
 
 @app.get("/health")
 async def health():
-    return {"status": "ok", "service": "wellsync-api"}
+    return {
+        "status": "ok",
+        "service": "wellsync-api",
+        "rag": "ready" if retriever.is_ready() else "warming",
+    }
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the RAG embedding model is loaded."""
+    if not retriever.is_ready():
+        return JSONResponse(status_code=503, content={"status": "warming", "rag": False})
+    return {"status": "ready", "rag": True}
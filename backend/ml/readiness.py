@@ -0,0 +1,85 @@
+"""
+Rule-based readiness score (0–100), docs/F3 section 4.1:
+
+    readiness = min(sleep_hours / 8, 1) × 30 + sleep_quality / 5 × 20
+              + mood / 5 × 20 + energy / 5 × 20 + (6 − stress) / 5 × 10
+
+with the personalized adjustment of section 4.2: +10% when the user's model
+predicts a workout RPE above their historical mean + 0.5, −10% below mean − 0.5.
+Score ≥ 75 → "high" intensity, ≥ 45 → "moderate", otherwise "low".
+
+There is one implementation, on NumPy arrays; a single check-in is scored as
+arrays of length one, so the write path and the batch jobs always agree.
+
+Usage:
+    compute_readiness_score(6, 3, 3, 2, 4)                         # one check-in → 58.5
+    scores = readiness_scores(sleep_hours, sleep_quality, mood, energy, stress,
+                              predicted_rpe=predicted, rpe_mean=means)  # whole arrays
+    intensities(scores)                                            # ["high", "moderate", ...]
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+HIGH_THRESHOLD = 75.0
+MODERATE_THRESHOLD = 45.0
+# Personalized adjustment: ±10% once the predicted RPE is this far from the user's mean
+RPE_ADJUSTMENT = 0.10
+RPE_MARGIN = 0.5
+
+
+def readiness_scores(
+    sleep_hours: ArrayLike,
+    sleep_quality: ArrayLike,
+    mood: ArrayLike,
+    energy: ArrayLike,
+    stress: ArrayLike,
+    predicted_rpe: ArrayLike | None = None,
+    rpe_mean: ArrayLike | None = None,
+) -> np.ndarray:
+    """
+    Readiness of every check-in in the arrays at once, rounded to one decimal.
+    With predicted_rpe and rpe_mean the ±10% adjustment is applied in the same
+    pass; NaN in either leaves that check-in unadjusted (no personal model yet).
+    """
+    sleep = np.minimum(np.asarray(sleep_hours, dtype=float) / 8.0, 1.0) * 30
+    scales = (np.asarray(sleep_quality, dtype=float) + np.asarray(mood, dtype=float)
+              + np.asarray(energy, dtype=float)) / 5 * 20
+    calm = (6 - np.asarray(stress, dtype=float)) / 5 * 10
+    scores = sleep + scales + calm
+
+    if predicted_rpe is not None and rpe_mean is not None:
+        delta = np.asarray(predicted_rpe, dtype=float) - np.asarray(rpe_mean, dtype=float)
+        # NaN compares False both ways, so those scores keep a factor of 1
+        factor = 1 + RPE_ADJUSTMENT * ((delta > RPE_MARGIN).astype(float) - (delta < -RPE_MARGIN))
+        scores = np.clip(scores * factor, 0, 100)
+    return np.round(scores, 1)
+
+
+def intensities(scores: ArrayLike) -> np.ndarray:
+    """Workout intensity per score: "high", "moderate" or "low"."""
+    scores = np.asarray(scores, dtype=float)
+    return np.where(scores >= HIGH_THRESHOLD, "high", np.where(scores >= MODERATE_THRESHOLD, "moderate", "low"))
+
+
+def compute_readiness_score(
+    sleep_hours: float,
+    sleep_quality: int,
+    mood: int,
+    energy: int,
+    stress: int,
+    predicted_rpe: float | None = None,
+    rpe_mean: float | None = None,
+) -> float:
+    """Readiness of a single check-in (same computation as readiness_scores)."""
+    return float(readiness_scores(
+        [sleep_hours], [sleep_quality], [mood], [energy], [stress],
+        None if predicted_rpe is None else [predicted_rpe],
+        None if rpe_mean is None else [rpe_mean],
+    )[0])
+
+
+def get_intensity(score: float) -> str:
+    return str(intensities([score])[0])
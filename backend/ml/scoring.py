@@ -0,0 +1,137 @@
+"""
+Batch readiness scoring: backfills and the morning run.
+
+Check-ins are read as columns, scored with one readiness_scores() call per
+batch (backend/ml/readiness.py) and written back with one executemany UPDATE,
+so scoring a whole day of users costs a few queries and one vectorized pass,
+not a Python loop over users. Single check-ins are scored on write by the
+CheckIn before_insert/before_update hook with the same function.
+
+Usage:
+    score_day(db, date.today(), predicted_rpe={user_id: rpe, ...})   # morning run
+    python -m backend.ml.scoring --since 2026-01-01                 # backfill missing scores
+    python -m backend.ml.scoring --all                              # recompute every score
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from datetime import date
+from typing import Mapping, Sequence
+
+import numpy as np
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from backend.ml.readiness import readiness_scores
+from backend.models.checkin import CheckIn
+from backend.models.workout import Workout
+from backend.rollups import refresh_range
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100_000
+
+_INPUTS = (CheckIn.sleep_hours, CheckIn.sleep_quality, CheckIn.mood, CheckIn.energy, CheckIn.stress)
+
+
+def historical_rpe_means(db: Session, day: date) -> dict[int, float]:
+    """Mean workout RPE before `day` of every user with a check-in on `day` — one GROUP BY query."""
+    rows = db.execute(
+        select(Workout.user_id, func.avg(Workout.rpe))
+        .where(Workout.user_id.in_(select(CheckIn.user_id).where(CheckIn.date == day)), Workout.date < day)
+        .group_by(Workout.user_id)
+    )
+    return {user_id: float(mean) for user_id, mean in rows}
+
+
+def _score_rows(
+    db: Session,
+    rows: Sequence,
+    predicted_rpe: Mapping[int, float] | None,
+    rpe_means: Mapping[int, float] | None,
+) -> int:
+    """Score fetched (id, user_id, inputs...) rows in one pass and write them back."""
+    if not rows:
+        return 0
+    columns = np.array([row[2:] for row in rows], dtype=float).T
+    user_ids = [row[1] for row in rows]
+    adjust = predicted_rpe is not None and rpe_means is not None
+    scores = readiness_scores(
+        *columns,
+        predicted_rpe=np.array([predicted_rpe.get(u, np.nan) for u in user_ids]) if adjust else None,
+        rpe_mean=np.array([rpe_means.get(u, np.nan) for u in user_ids]) if adjust else None,
+    )
+    # ORM bulk UPDATE by primary key: a single executemany
+    db.execute(update(CheckIn), [{"id": row[0], "readiness_score": s} for row, s in zip(rows, scores.tolist())])
+    return len(rows)
+
+
+def score_day(db: Session, day: date, predicted_rpe: Mapping[int, float] | None = None) -> int:
+    """
+    Rescore every check-in of `day` in one vectorized call, with the ±10%
+    adjustment for users that have a predicted RPE. Commits; returns the count.
+    """
+    rows = db.execute(
+        select(CheckIn.id, CheckIn.user_id, *_INPUTS).where(CheckIn.date == day).order_by(CheckIn.id)
+    ).all()
+    rpe_means = historical_rpe_means(db, day) if predicted_rpe else None
+    scored = _score_rows(db, rows, predicted_rpe, rpe_means)
+    if scored:
+        refresh_range(db.connection(), since=day, until=day)
+    db.commit()
+    return scored
+
+
+def backfill_scores(
+    db: Session,
+    since: date | None = None,
+    until: date | None = None,
+    recompute: bool = False,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """
+    Rule-based scores for check-ins in [since, until] that have none (every
+    one with recompute), batch_size rows per vectorized call and commit.
+    """
+    stmt = select(CheckIn.id, CheckIn.user_id, *_INPUTS).order_by(CheckIn.id)
+    if since is not None:
+        stmt = stmt.where(CheckIn.date >= since)
+    if until is not None:
+        stmt = stmt.where(CheckIn.date <= until)
+    if not recompute:
+        stmt = stmt.where(CheckIn.readiness_score.is_(None))
+
+    total, last_id = 0, 0
+    # Keyset over id: rows scored in a batch drop out of a "missing only" query, so no OFFSET
+    while rows := db.execute(stmt.where(CheckIn.id > last_id).limit(batch_size)).all():
+        total += _score_rows(db, rows, None, None)
+        last_id = rows[-1][0]
+        db.commit()
+    if total:
+        refresh_range(db.connection(), since, until)
+        db.commit()
+    return total
+
+
+def main() -> None:
+    from backend.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Backfill check-in readiness scores.")
+    parser.add_argument("--since", type=date.fromisoformat, default=None)
+    parser.add_argument("--until", type=date.fromisoformat, default=None)
+    parser.add_argument("--all", action="store_true", help="recompute scores that are already set")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        total = backfill_scores(db, args.since, args.until, args.all, args.batch_size)
+    logger.info("Scored %d check-ins in %.1fs", total, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
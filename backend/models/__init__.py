@@ -3,5 +3,13 @@ from backend.models.checkin import CheckIn
 from backend.models.workout import Workout
 from backend.models.meal import Meal
 from backend.models.agent_output import AgentOutput
+from backend.models.event_record import EventRecord
+from backend.models.llm_cache import LLMCacheEntry
+from backend.models.daily_rollup import DailyRollup
+from backend.models.llm_batch_job import LLMBatchJob
 
-__all__ = ["User", "CheckIn", "Workout", "Meal", "AgentOutput"]
+# Registers the after_flush hook that keeps daily_rollups in sync
+import backend.rollups  # noqa: E402,F401
+
+__all__ = ["User", "CheckIn", "Workout", "Meal", "AgentOutput", "EventRecord", "LLMCacheEntry", "DailyRollup",
+           "LLMBatchJob"]
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Float, Text, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Text, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from backend.database import Base
@@ -10,7 +10,8 @@ class AgentOutput(Base):
     __tablename__ = "agent_outputs"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Indexed by agent_outputs_user_date_event_key below
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     date = Column(Date, nullable=False)
     # e.g. "morning_recommendation", "evening_insights", "model_retraining"
     event_type = Column(String, nullable=False)
@@ -24,3 +25,8 @@ class AgentOutput(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="agent_outputs")
+
+    # One output per user, day and event; writers use ON CONFLICT DO NOTHING (backend/agents/idempotency.py)
+    __table_args__ = (
+        Index("agent_outputs_user_date_event_key", "user_id", "date", "event_type", unique=True),
+    )
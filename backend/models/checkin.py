@@ -1,16 +1,18 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey, Index, event, inspect
 from sqlalchemy.orm import relationship
 
 from backend.database import Base
+from backend.ml.readiness import compute_readiness_score
 
 
 class CheckIn(Base):
     __tablename__ = "checkins"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Indexed by checkins_user_date_key below
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     date = Column(Date, nullable=False)
     # Sleep hours: 0.0 – 12.0
     sleep_hours = Column(Float, nullable=False)
@@ -19,8 +21,30 @@ class CheckIn(Base):
     mood = Column(Integer, nullable=False)
     energy = Column(Integer, nullable=False)
     stress = Column(Integer, nullable=False)
-    # Computed by ML pipeline; null until first prediction run
+    # Rule-based score set on write (see _score_on_write); the morning run
+    # (backend/ml/scoring.py) applies the personalized adjustment
     readiness_score = Column(Float, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="checkins")
+
+    # One check-in per user and day. Covers the history queries (backend/history.py):
+    # per-user date ranges are index-only scans on Postgres.
+    __table_args__ = (
+        Index(
+            "checkins_user_date_key", "user_id", "date", unique=True,
+            postgresql_include=["id", "sleep_hours", "sleep_quality", "mood", "energy", "stress", "readiness_score"],
+        ),
+    )
+
+
+_SCORE_INPUTS = ("sleep_hours", "sleep_quality", "mood", "energy", "stress")
+
+
+@event.listens_for(CheckIn, "before_insert")
+@event.listens_for(CheckIn, "before_update")
+def _score_on_write(mapper, connection, target: CheckIn) -> None:
+    state = inspect(target)
+    changed = any(state.attrs[name].history.has_changes() for name in _SCORE_INPUTS)
+    if target.readiness_score is None or (changed and not state.attrs.readiness_score.history.has_changes()):
+        target.readiness_score = compute_readiness_score(*(getattr(target, name) for name in _SCORE_INPUTS))
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey
+
+from backend.database import Base
+
+
+class DailyRollup(Base):
+    """
+    One row per user and day, kept in sync with checkins/workouts/meals by
+    backend/rollups.py. Insights read at most 30 of these per user.
+    """
+
+    __tablename__ = "daily_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    # From the day's check-in; null when there is none
+    readiness_score = Column(Float, nullable=True)
+    sleep_hours = Column(Float, nullable=True)
+    sleep_quality = Column(Integer, nullable=True)
+    mood = Column(Integer, nullable=True)
+    energy = Column(Integer, nullable=True)
+    stress = Column(Integer, nullable=True)
+    # Sums rather than averages so they stay exact under incremental updates
+    workout_count = Column(Integer, nullable=False, default=0)
+    workout_minutes = Column(Integer, nullable=False, default=0)
+    workout_rpe_sum = Column(Integer, nullable=False, default=0)
+    meal_count = Column(Integer, nullable=False, default=0)
+    meal_quality_sum = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    @property
+    def workout_rpe_avg(self) -> float | None:
+        return self.workout_rpe_sum / self.workout_count if self.workout_count else None
+
+    @property
+    def meal_quality_avg(self) -> float | None:
+        return self.meal_quality_sum / self.meal_count if self.meal_count else None
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index
+
+from backend.database import Base
+
+
+class EventRecord(Base):
+    """A WellnessEvent persisted by the durable event queue (backend/events/durable_queue.py)."""
+
+    __tablename__ = "event_queue"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # WellnessEvent.type value
+    event_type = Column(String, nullable=False)
+    # Empty list = all users
+    user_ids = Column(JSON, nullable=False, default=list)
+    fired_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Lower is claimed first (settings.event_priorities)
+    priority = Column(Integer, nullable=False, default=0)
+    # "pending", "done" or "dead" (gave up after max attempts)
+    status = Column(String, nullable=False, default="pending")
+    # Claimable when pending and available_at <= now; a claim pushes it out by the visibility timeout
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Random token of the current claim; acks from an expired claim are ignored
+    claim_token = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    # Optional producer key, e.g. "morning_recommendation:2026-02-19" — one row per key
+    dedup_key = Column(String, nullable=True, unique=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("event_queue_claim_idx", "status", "priority", "available_at", "id"),
+    )
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, JSON, Index
+
+from backend.database import Base
+
+
+class LLMBatchJob(Base):
+    """A submitted offline batch job, collected later by backend/llm/batch.py:collect_batches."""
+
+    __tablename__ = "llm_batch_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Provider id, e.g. "msgbatch_..."
+    batch_id = Column(String, nullable=False, unique=True)
+    event_type = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    model = Column(String, nullable=False)
+    # Users in the job; a redelivered event skips them while the job is pending
+    user_ids = Column(JSON, nullable=False, default=list)
+    # "pending", "done" or "failed" (did not end within llm_batch_timeout_seconds)
+    status = Column(String, nullable=False, default="pending")
+    written = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    submitted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("llm_batch_jobs_status_idx", "status", "submitted_at"),
+    )
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+
+from backend.database import Base
+
+
+class LLMCacheEntry(Base):
+    """A cached LLM response (backend/llm/response_cache.py)."""
+
+    __tablename__ = "llm_response_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # sha256 of the canonical prompt inputs
+    cache_key = Column(String(64), nullable=False)
+    # Model that produced response_text; entries are never served to a different model
+    model_used = Column(String, nullable=False)
+    response_text = Column(Text, nullable=False)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    # Size-bounded eviction drops the least recently used entries
+    last_used_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("llm_response_cache_key_model_key", "cache_key", "model_used", unique=True),
+        Index("llm_response_cache_last_used_idx", "last_used_at"),
+    )
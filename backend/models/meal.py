@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from backend.database import Base
@@ -10,7 +10,8 @@ class Meal(Base):
     __tablename__ = "meals"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Indexed by meals_user_date_idx below
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     date = Column(Date, nullable=False)
     # e.g. "breakfast", "lunch", "dinner", "snack"
     meal_type = Column(String, nullable=False)
@@ -20,3 +21,9 @@ class Meal(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="meals")
+
+    # Per-user date ranges with (date, id) keyset pagination (backend/history.py)
+    __table_args__ = (
+        Index("meals_user_date_idx", "user_id", "date", "id",
+              postgresql_include=["meal_type", "quality"]),
+    )
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from backend.database import Base
@@ -10,7 +10,8 @@ class Workout(Base):
     __tablename__ = "workouts"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Indexed by workouts_user_date_idx below
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     date = Column(Date, nullable=False)
     type = Column(String, nullable=False)
     duration_min = Column(Integer, nullable=False)
@@ -19,3 +20,9 @@ class Workout(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="workouts")
+
+    # Per-user date ranges with (date, id) keyset pagination (backend/history.py)
+    __table_args__ = (
+        Index("workouts_user_date_idx", "user_id", "date", "id",
+              postgresql_include=["type", "duration_min", "rpe"]),
+    )
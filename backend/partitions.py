@@ -0,0 +1,161 @@
+"""
+Maintenance of the monthly date partitions (migrations/partition_*.sql).
+
+Run daily (cron or any scheduler). For every table in PARTITIONED_TABLES it:
+  - creates the partitions for the next partition_premake_months months, so
+    inserts never hit a missing range (there is no DEFAULT partition; older
+    months are created by ensure_partitions, e.g. from backend/bulk_import.py);
+  - applies the retention in partition_retention_months: each whole month
+    older than that is detached, written to
+    {partition_archive_dir}/{table}_{YYYY}_{MM}.csv.gz and dropped. Dropping a
+    partition is instant and leaves no dead rows behind, unlike DELETE.
+
+Usage:
+    python -m backend.partitions                 # create ahead + retention
+    python -m backend.partitions --dry-run       # print what would happen
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import logging
+import os
+import re
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month `months` after `month`'s month (negative goes back)."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month:%Y_%m}"
+
+
+def partition_ddl(table: str, month: date) -> str:
+    start = add_months(month, 0)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, start)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{add_months(start, 1).isoformat()}')"
+    )
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {"table": table}
+    ).scalar())
+
+
+def list_partitions(conn: Connection, table: str) -> dict[date, str]:
+    """Attached monthly partitions of `table` by month."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table)"
+    ), {"table": table}).scalars()
+    pattern = re.compile(rf"^{re.escape(table)}_(\d{{4}})_(\d{{2}})$")
+    return {date(int(m[1]), int(m[2]), 1): m[0] for m in map(pattern.match, names) if m}
+
+
+def expired_months(months: list[date], today: date, retention_months: int) -> list[date]:
+    """Months entirely older than the retention window; 0 keeps everything."""
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(today.replace(day=1), -retention_months)
+    return sorted(month for month in months if month < cutoff)
+
+
+def ensure_partitions(conn: Connection, table: str, since: date, until: date, dry_run: bool = False) -> list[str]:
+    """Partitions for every month from `since` to `until` (inclusive); returns the ones created."""
+    existing = list_partitions(conn, table)
+    created = []
+    month = since.replace(day=1)
+    while month <= until:
+        if month not in existing:
+            if not dry_run:
+                conn.execute(text(partition_ddl(table, month)))
+            created.append(partition_name(table, month))
+        month = add_months(month, 1)
+    return created
+
+
+def create_partitions(conn: Connection, table: str, today: date, ahead: int, dry_run: bool = False) -> list[str]:
+    """Partitions for the current month and `ahead` months after it; returns the ones created."""
+    return ensure_partitions(conn, table, today, add_months(today.replace(day=1), ahead), dry_run)
+
+
+def archive_partition(conn: Connection, table: str, partition: str, archive_dir: str) -> str:
+    """Detach `partition`, COPY it to a gzipped CSV in archive_dir, then drop it. Returns the file path."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{partition}.csv.gz")
+    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition}"))
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8", newline="") as archive:
+        with conn.connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {partition} TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+    # Only a complete archive gets the final name, and only then is the partition dropped
+    os.replace(path + ".tmp", path)
+    conn.execute(text(f"DROP TABLE {partition}"))
+    return path
+
+
+def apply_retention(
+    conn: Connection, table: str, today: date, retention_months: int, archive_dir: str, dry_run: bool = False
+) -> list[str]:
+    """Archive and drop the partitions past retention; returns their names."""
+    partitions = list_partitions(conn, table)
+    expired = [partitions[month] for month in expired_months(list(partitions), today, retention_months)]
+    if not dry_run:
+        for partition in expired:
+            path = archive_partition(conn, table, partition, archive_dir)
+            # Commit per partition: an interrupted run keeps what it already archived
+            conn.commit()
+            logger.info("Archived %s to %s", partition, path)
+    return expired
+
+
+def maintain(conn: Connection, today: date | None = None, dry_run: bool = False) -> dict[str, dict[str, list[str]]]:
+    """create_partitions + apply_retention for every partitioned table in PARTITIONED_TABLES."""
+    today = today or date.today()
+    report = {}
+    for table in settings.partitioned_tables:
+        if not is_partitioned(conn, table):
+            logger.warning("%s is not partitioned; run migrations/partition_%s.sql first", table, table)
+            continue
+        created = create_partitions(conn, table, today, settings.partition_premake_months, dry_run)
+        conn.commit()
+        archived = apply_retention(
+            conn, table, today, settings.partition_retention_months.get(table, 0),
+            settings.partition_archive_dir, dry_run,
+        )
+        report[table] = {"created": created, "archived": archived}
+    return report
+
+
+def main() -> None:
+    from backend.database import engine
+
+    parser = argparse.ArgumentParser(description="Create future monthly partitions and apply retention.")
+    parser.add_argument("--today", type=date.fromisoformat, default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with engine.connect() as conn:
+        for table, actions in maintain(conn, args.today, args.dry_run).items():
+            prefix = "would " if args.dry_run else ""
+            print(f"{table}: {prefix}create {actions['created'] or '-'}, {prefix}archive {actions['archived'] or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Incremental maintenance of daily_rollups (backend/models/daily_rollup.py).
+
+Whenever a Session flushes a CheckIn, Workout or Meal (insert, update or
+delete), the rollup row of each touched (user_id, date) is recomputed from
+the raw rows of that one day, inside the same transaction. Recomputing the
+day instead of applying deltas keeps updates and deletes exact, and the
+per-day raw rows are a handful of index lookups on the (user_id, date)
+indexes.
+
+Concurrent transactions writing the same (user_id, date) would each
+recompute from a snapshot without the other's rows, and the later upsert
+would drop the earlier one's. On PostgreSQL each refresh first takes a
+transaction-level advisory lock per (user_id, date), so the second waits for
+the first to commit and then recomputes from both; refresh_range() locks
+daily_rollups against other refreshes instead (one lock per key of a range
+could exhaust the lock table).
+
+Writes that bypass the ORM (bulk COPY / Core inserts) call refresh_range()
+for the rows they wrote; existing data is loaded with the backfill CLI:
+
+    python -m backend.rollups                       # everything
+    python -m backend.rollups --since 2026-01-01    # recent days only
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from datetime import date, datetime
+from itertools import chain
+from typing import Iterable
+
+from sqlalchemy import Date, DateTime, Integer, bindparam, event, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+SOURCE_TABLES = ("checkins", "workouts", "meals")
+
+# Typed binds so dates compare the same way the ORM stores them (SQLite keeps ISO strings)
+_PARAM_TYPES = {
+    "user_id": Integer(), "user_id_min": Integer(), "user_id_max": Integer(),
+    "date": Date(), "since": Date(), "until": Date(), "now": DateTime(),
+}
+
+_ROLLUP_COLUMNS = (
+    "readiness_score", "sleep_hours", "sleep_quality", "mood", "energy", "stress",
+    "workout_count", "workout_minutes", "workout_rpe_sum", "meal_count", "meal_quality_sum", "updated_at",
+)
+
+# {where} filters every source table (and the delete) on user_id / date; "WHERE true"
+# before ON CONFLICT keeps SQLite's parser from reading it as a join constraint.
+_REFRESH_SQL = """
+INSERT INTO daily_rollups (user_id, date, {columns})
+SELECT k.user_id, k.date,
+       c.readiness_score, c.sleep_hours, c.sleep_quality, c.mood, c.energy, c.stress,
+       COALESCE(w.n, 0), COALESCE(w.minutes, 0), COALESCE(w.rpe_sum, 0),
+       COALESCE(m.n, 0), COALESCE(m.quality_sum, 0),
+       :now
+FROM (
+    SELECT user_id, date FROM checkins WHERE {where}
+    UNION SELECT user_id, date FROM workouts WHERE {where}
+    UNION SELECT user_id, date FROM meals WHERE {where}
+) AS k
+LEFT JOIN (
+    SELECT user_id, date, readiness_score, sleep_hours, sleep_quality, mood, energy, stress
+    FROM checkins WHERE {where}
+) AS c ON c.user_id = k.user_id AND c.date = k.date
+LEFT JOIN (
+    SELECT user_id, date, COUNT(*) AS n, SUM(duration_min) AS minutes, SUM(rpe) AS rpe_sum
+    FROM workouts WHERE {where} GROUP BY user_id, date
+) AS w ON w.user_id = k.user_id AND w.date = k.date
+LEFT JOIN (
+    SELECT user_id, date, COUNT(*) AS n, SUM(quality) AS quality_sum
+    FROM meals WHERE {where} GROUP BY user_id, date
+) AS m ON m.user_id = k.user_id AND m.date = k.date
+WHERE true
+ON CONFLICT (user_id, date) DO UPDATE SET {updates}
+"""
+
+
+def _refresh(conn: Connection, where: str, params: dict) -> int:
+    """Delete and rebuild the rollups matching `where`; returns the rows written."""
+    def typed(sql: str, names) -> TextClause:
+        return text(sql).bindparams(*(bindparam(name, type_=_PARAM_TYPES[name]) for name in names))
+
+    conn.execute(typed(f"DELETE FROM daily_rollups WHERE {where}", params), params)
+    sql = _REFRESH_SQL.format(
+        columns=", ".join(_ROLLUP_COLUMNS),
+        where=where,
+        updates=", ".join(f"{c} = excluded.{c}" for c in _ROLLUP_COLUMNS),
+    )
+    params = {**params, "now": datetime.utcnow()}
+    return conn.execute(typed(sql, params), params).rowcount
+
+
+def _is_postgres(conn: Connection) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+def refresh_days(conn: Connection, pairs: Iterable[tuple[int, date]]) -> None:
+    """Recompute the rollups of the given (user_id, date) pairs."""
+    pairs = sorted(set(pairs))
+    if _is_postgres(conn):
+        # Sorted so two transactions touching the same days cannot deadlock
+        conn.execute(
+            text("SELECT pg_advisory_xact_lock(:user_id, :day)"),
+            [{"user_id": user_id, "day": day.toordinal()} for user_id, day in pairs],
+        )
+    for user_id, day in pairs:
+        _refresh(conn, "user_id = :user_id AND date = :date", {"user_id": user_id, "date": day})
+
+
+def refresh_range(
+    conn: Connection,
+    since: date | None = None,
+    until: date | None = None,
+    user_id_min: int | None = None,
+    user_id_max: int | None = None,
+) -> int:
+    """Recompute all rollups in a date and/or user_id range (bounds inclusive)."""
+    clauses, params = [], {}
+    for clause, name, value in (
+        ("date >= :since", "since", since),
+        ("date <= :until", "until", until),
+        ("user_id >= :user_id_min", "user_id_min", user_id_min),
+        ("user_id <= :user_id_max", "user_id_max", user_id_max),
+    ):
+        if value is not None:
+            clauses.append(clause)
+            params[name] = value
+    if _is_postgres(conn):
+        # Conflicts with the ROW EXCLUSIVE lock of every other refresh (and with itself)
+        conn.execute(text("LOCK TABLE daily_rollups IN SHARE ROW EXCLUSIVE MODE"))
+    return _refresh(conn, " AND ".join(clauses) or "true", params)
+
+
+def _touched_days(session: Session) -> set[tuple[int, date]]:
+    pairs = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if getattr(obj, "__tablename__", None) not in SOURCE_TABLES:
+            continue
+        pairs.add((obj.user_id, obj.date))
+        # A row moved to another user or day also changes the old day's rollup
+        state = inspect(obj)
+        old_user = state.attrs.user_id.history.deleted
+        old_date = state.attrs.date.history.deleted
+        if old_user or old_date:
+            pairs.add((old_user[0] if old_user else obj.user_id, old_date[0] if old_date else obj.date))
+    return {(u, d) for u, d in pairs if u is not None and d is not None}
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_after_flush(session: Session, flush_context) -> None:
+    pairs = _touched_days(session)
+    if pairs:
+        refresh_days(session.connection(), pairs)
+
+
+def main() -> None:
+    from backend.database import engine
+
+    parser = argparse.ArgumentParser(description="Backfill daily_rollups from checkins/workouts/meals.")
+    parser.add_argument("--since", type=date.fromisoformat, default=None)
+    parser.add_argument("--until", type=date.fromisoformat, default=None)
+    parser.add_argument("--batch-users", type=int, default=10_000, help="users per transaction")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        max_user = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM users")).scalar_one()
+    total = 0
+    for lo in range(1, max_user + 1, args.batch_users):
+        with engine.begin() as conn:
+            total += refresh_range(conn, args.since, args.until, lo, lo + args.batch_users - 1)
+    logger.info("daily_rollups: %d rows rebuilt in %.1fs", total, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+
+from backend.config import settings
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+
+
+def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    """User id from the bearer token's "sub" claim; 401 if the token is missing, invalid or expired."""
+    # Imported here so the app starts without python-jose until a token has to be checked
+    from jose import JWTError, jwt
+
+    unauthorized = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        return int(payload["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        raise unauthorized
@@ -0,0 +1,29 @@
+from typing import List, Literal
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from backend.export import KINDS, MEDIA_TYPES, stream_export
+from backend.routers.auth import get_current_user_id
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+
+@router.get("")
+async def export_history(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    kinds: List[Literal["checkins", "workouts", "meals", "outputs"]] = Query(list(KINDS), alias="kind"),
+    user_id: int = Depends(get_current_user_id),
+):
+    """
+    The caller's full history (all kinds unless ?kind= is repeated), streamed as it is read.
+
+    Does not take a session from get_async_db: FastAPI closes yield dependencies
+    before a streaming body is sent, so stream_export opens its own AsyncSession.
+    """
+    kinds = list(dict.fromkeys(kinds))
+    return StreamingResponse(
+        stream_export(user_id, kinds, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="wellsync-history-{user_id}.{fmt}"'},
+    )
@@ -0,0 +1,56 @@
+import io
+import tempfile
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from backend.bulk_import import import_records
+from backend.config import settings
+from backend.database import get_db
+from backend.routers.auth import get_current_user_id
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+# Uploads larger than this are spooled to a temporary file instead of memory
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+@router.post("/{kind}")
+async def import_history(
+    kind: Literal["checkins", "workouts", "meals"],
+    request: Request,
+    fmt: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id),
+):
+    """
+    Import the caller's history from a raw CSV/NDJSON request body. Every row
+    is stored for the caller, whatever its user_id column says. Bodies over
+    settings.import_max_upload_bytes are rejected with 413.
+
+    Takes a sync Session (get_db), not the async one: the rows are loaded with
+    psycopg2's COPY, which needs the sync driver's connection, and the whole
+    import runs in a worker thread.
+    """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Upload exceeds {settings.import_max_upload_bytes} bytes",
+    )
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > settings.import_max_upload_bytes:
+        raise too_large
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as upload:
+        size = 0
+        # Counted as it arrives too: chunked bodies have no Content-Length
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.import_max_upload_bytes:
+                raise too_large
+            upload.write(chunk)
+        upload.seek(0)
+        lines = io.TextIOWrapper(upload, encoding="utf-8", newline="")
+        # Parsing and COPY are CPU/IO-bound; keep them off the event loop
+        report = await run_in_threadpool(import_records, db, kind, lines, fmt, user_id=user_id)
+    return report.as_dict()
@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """Session on a fresh SQLite database with every table and users 1-5."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from backend.database import Base
+    from backend.models.user import User
+    import backend.models  # noqa: F401
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'wellsync.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all([User(id=i, email=f"u{i}@example.com", name=f"U{i}", password_hash="x") for i in range(1, 6)])
+        db.commit()
+    with Session() as db:
+        yield db
+    engine.dispose()
@@ -49,3 +49,295 @@ async def test_gateway_dispatch():
     event = WellnessEvent(type=EventType.EVENING_SUMMARY)
     await gateway.dispatch(event)
     assert results == [EventType.EVENING_SUMMARY]
+
+
+def test_save_outputs_ignores_existing_user_date_event(sqlite_db):
+    from datetime import date
+    from backend.agents.idempotency import existing_output_user_ids, save_output, save_outputs
+    from backend.models.agent_output import AgentOutput
+
+    day = date(2026, 2, 19)
+    rows = [dict(user_id=i, date=day, event_type="morning_recommendation", llm_text=f"text {i}") for i in (1, 2)]
+    assert save_outputs(sqlite_db, rows) == 2
+    assert save_outputs(sqlite_db, rows + [dict(rows[0], user_id=3)]) == 1
+    assert not save_output(sqlite_db, **rows[0])
+    # A different event type on the same day is a separate output
+    assert save_output(sqlite_db, **dict(rows[0], event_type="evening_summary"))
+
+    assert existing_output_user_ids(sqlite_db, [1, 2, 3, 4], day, "morning_recommendation") == {1, 2, 3}
+    assert sqlite_db.query(AgentOutput).count() == 4
+    assert sqlite_db.query(AgentOutput).first().model_used == "claude-haiku-4-5-20251001"
+
+
+@pytest.mark.asyncio
+async def test_rerunning_partial_batch_only_processes_missing_users(sqlite_db):
+    from datetime import datetime
+    from backend.agents.idempotency import save_output, skip_existing_outputs
+    from backend.events.fanout import fan_out_handler
+
+    calls = []
+    flaky = {4}
+
+    async def per_user(user_id, event, db, **kwargs):
+        calls.append(user_id)
+        if user_id in flaky:
+            flaky.discard(user_id)
+            raise RuntimeError("LLM timeout")
+        save_output(db, user_id=user_id, date=event.fired_at.date(),
+                    event_type=event.type.value, llm_text="rest today")
+
+    handler = fan_out_handler(per_user, filter_chunk=skip_existing_outputs, chunk_size=2)
+    event = WellnessEvent(type=EventType.MORNING_RECOMMENDATION, user_ids=[1, 2, 3, 4, 5],
+                          fired_at=datetime(2026, 2, 19, 7))
+
+    first = await handler(event, db=sqlite_db)
+    assert first.succeeded == 4 and list(first.failed) == [4]
+    calls.clear()
+    second = await handler(event, db=sqlite_db)
+    assert calls == [4]
+    assert second.skipped == 4 and second.succeeded == 1
+
+
+@pytest.mark.asyncio
+async def test_evening_batch_handler_submits_and_collector_bulk_writes(sqlite_db):
+    from datetime import date, datetime
+    from backend.agents.idempotency import save_output
+    from backend.llm.batch import LocalBatchBackend, collect_batches, evening_batch_handler
+    from backend.models.agent_output import AgentOutput
+    from backend.models.llm_batch_job import LLMBatchJob
+
+    save_output(sqlite_db, user_id=1, date=date(2026, 2, 19), event_type="evening_summary", llm_text="done")
+
+    def generate(request, model):
+        if request.custom_id == "user-3":
+            raise RuntimeError("overloaded")
+        return f"Evening summary {request.custom_id}"
+
+    backend = LocalBatchBackend(generate, polls_until_done=2)
+    handler = evening_batch_handler(
+        lambda db, user_id, day: None if user_id == 5 else f"summarise {user_id} {day}",
+        backend=backend, model="batch-model",
+    )
+    event = WellnessEvent(type=EventType.EVENING_SUMMARY, fired_at=datetime(2026, 2, 19, 21))
+
+    # The handler returns right after submitting; a redelivered event submits nothing new
+    assert await handler(event, db=sqlite_db) == 3
+    assert await handler(event, db=sqlite_db) == 0
+    assert backend.submitted == [3]
+    job = sqlite_db.query(LLMBatchJob).one()
+    assert (job.status, job.user_ids) == ("pending", [2, 3, 4])
+
+    assert await collect_batches(sqlite_db, backend) == 0  # still running
+    # User 1 already had a summary, user 5 had nothing to summarise, user 3 failed
+    assert await collect_batches(sqlite_db, backend) == 2
+    sqlite_db.refresh(job)
+    assert (job.status, job.written) == ("done", 2)
+    rows = sqlite_db.query(AgentOutput).filter_by(event_type="evening_summary").order_by(AgentOutput.user_id).all()
+    assert [(r.user_id, r.model_used) for r in rows][1:] == [(2, "batch-model"), (4, "batch-model")]
+    assert await collect_batches(sqlite_db, backend) == 0
+
+
+@pytest.mark.asyncio
+async def test_collect_batches_fails_jobs_past_the_timeout(sqlite_db):
+    from datetime import date, datetime, timedelta
+    from backend.llm.batch import LocalBatchBackend, collect_batches
+    from backend.models.llm_batch_job import LLMBatchJob
+
+    backend = LocalBatchBackend(polls_until_done=100)
+    batch_id = await backend.submit([], "m")
+    sqlite_db.add(LLMBatchJob(batch_id=batch_id, event_type="evening_summary", date=date(2026, 2, 19), model="m",
+                              user_ids=[1], submitted_at=datetime.utcnow() - timedelta(hours=2)))
+    sqlite_db.commit()
+
+    assert await collect_batches(sqlite_db, backend, timeout=3600) == 0
+    assert sqlite_db.query(LLMBatchJob.status).scalar() == "failed"
+
+
+def test_load_user_contexts_uses_fixed_number_of_queries(sqlite_db):
+    from datetime import date, timedelta
+    from sqlalchemy import event as sa_event
+    from backend.agents.context import load_user_contexts
+    from backend.models.agent_output import AgentOutput
+    from backend.models.checkin import CheckIn
+    from backend.models.meal import Meal
+    from backend.models.workout import Workout
+
+    day = date(2026, 2, 19)
+    for user_id in range(1, 6):
+        for offset in range(10):
+            d = day - timedelta(days=offset)
+            sqlite_db.add(CheckIn(user_id=user_id, date=d, sleep_hours=7, sleep_quality=3,
+                                  mood=offset % 5 + 1, energy=3, stress=2))
+            sqlite_db.add(Workout(user_id=user_id, date=d, type="run", duration_min=30, rpe=6))
+            sqlite_db.add(Meal(user_id=user_id, date=d, meal_type="lunch", quality=4))
+        for offset in (3, 1):
+            sqlite_db.add(AgentOutput(user_id=user_id, date=day - timedelta(days=offset),
+                                      event_type="morning_recommendation", llm_text=f"day -{offset}"))
+    sqlite_db.commit()
+
+    statements = []
+    engine = sqlite_db.get_bind()
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    sa_event.listen(engine, "before_cursor_execute", listener)
+    try:
+        few = load_user_contexts(sqlite_db, [1, 2], day)
+        count_few = len(statements)
+        statements.clear()
+        many = load_user_contexts(sqlite_db, [1, 2, 3, 4, 5, 99], day)
+        count_many = len(statements)
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", listener)
+
+    assert count_few == count_many == 5
+    assert set(few) == {1, 2} and set(many) == {1, 2, 3, 4, 5}
+    context = many[3]
+    assert context.name == "U3" and context.today_checkin["mood"] == 1
+    assert [c["date"] for c in context.recent_checkins] == [day - timedelta(days=i) for i in range(1, 8)]
+    assert len(context.workouts) == len(context.meals) == 8
+    assert context.latest_output["llm_text"] == "day -1"
+
+
+@pytest.mark.asyncio
+async def test_session_helpers_accept_async_sessions(sqlite_db):
+    from datetime import datetime
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from backend.agents.context import chunk_context_loader
+    from backend.agents.idempotency import save_output, skip_existing_outputs
+    from backend.database import async_database_url
+
+    event = WellnessEvent(type=EventType.MORNING_RECOMMENDATION, fired_at=datetime(2026, 2, 19, 7))
+    save_output(sqlite_db, user_id=2, date=event.fired_at.date(), event_type=event.type.value, llm_text="x")
+
+    url = async_database_url(str(sqlite_db.get_bind().url))
+    assert url.startswith("sqlite+aiosqlite://")
+    async_engine = create_async_engine(url)
+    async with async_sessionmaker(async_engine)() as db:
+        assert await skip_existing_outputs([1, 2, 3], event, db=db) == [1, 3]
+        contexts = await chunk_context_loader()([1, 3], event, db=db)
+        assert contexts[3].name == "U3" and contexts[3].today_checkin is None
+    await async_engine.dispose()
+
+
+def test_history_keyset_pagination_and_unique_checkin_per_day(sqlite_db):
+    from datetime import date, timedelta
+    from sqlalchemy.exc import IntegrityError
+    from backend.history import checkin_history, recent_checkins, workout_history
+    from backend.models.checkin import CheckIn
+    from backend.models.workout import Workout
+
+    day = date(2026, 2, 19)
+    for offset in range(10):
+        d = day - timedelta(days=offset)
+        sqlite_db.add(CheckIn(user_id=1, date=d, sleep_hours=7, sleep_quality=3, mood=3, energy=3,
+                              stress=offset % 5 + 1))
+        sqlite_db.add(CheckIn(user_id=2, date=d, sleep_hours=6, sleep_quality=2, mood=2, energy=2, stress=2))
+        for kind in ("run", "gym"):
+            sqlite_db.add(Workout(user_id=1, date=d, type=kind, duration_min=30, rpe=5))
+    sqlite_db.commit()
+
+    sqlite_db.add(CheckIn(user_id=1, date=day, sleep_hours=8, sleep_quality=4, mood=4, energy=4, stress=1))
+    with pytest.raises(IntegrityError):
+        sqlite_db.commit()
+    sqlite_db.rollback()
+
+    pages, cursor = [], None
+    while True:
+        page = checkin_history(sqlite_db, 1, since=day - timedelta(days=8), limit=4, cursor=cursor)
+        pages.append([row["date"] for row in page.items])
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert [len(p) for p in pages] == [4, 4, 1]
+    assert sum(pages, []) == [day - timedelta(days=i) for i in range(9)]
+
+    # Two workouts per day: the (date, id) cursor splits a day across pages without loss
+    first = workout_history(sqlite_db, 1, limit=3)
+    second = workout_history(sqlite_db, 1, limit=3, cursor=first.next_cursor)
+    ids = [w["id"] for w in first.items + second.items]
+    assert len(set(ids)) == 6 and [w["date"] for w in second.items][0] == day - timedelta(days=1)
+
+    assert [c["date"] for c in recent_checkins(sqlite_db, 1, day)] == [day - timedelta(days=i) for i in range(1, 8)]
+
+
+def test_daily_rollups_follow_inserts_updates_and_deletes(sqlite_db):
+    from datetime import date
+    from backend.models.checkin import CheckIn
+    from backend.models.daily_rollup import DailyRollup
+    from backend.models.meal import Meal
+    from backend.models.workout import Workout
+
+    day = date(2026, 3, 2)
+    checkin = CheckIn(user_id=1, date=day, sleep_hours=7.5, sleep_quality=4, mood=3, energy=4, stress=2,
+                      readiness_score=71.0)
+    run = Workout(user_id=1, date=day, type="run", duration_min=30, rpe=6)
+    sqlite_db.add_all([checkin, run, Workout(user_id=1, date=day, type="yoga", duration_min=20, rpe=2),
+                       Meal(user_id=1, date=day, meal_type="lunch", quality=4)])
+    sqlite_db.commit()
+
+    rollup = sqlite_db.get(DailyRollup, (1, day))
+    assert (rollup.readiness_score, rollup.sleep_hours, rollup.mood) == (71.0, 7.5, 3)
+    assert (rollup.workout_count, rollup.workout_minutes, rollup.workout_rpe_avg) == (2, 50, 4.0)
+    assert (rollup.meal_count, rollup.meal_quality_avg) == (1, 4.0)
+
+    # Moving a workout to another day updates both days
+    run.date = date(2026, 3, 3)
+    checkin.mood = 5
+    sqlite_db.commit()
+    sqlite_db.expire_all()
+    rollup = sqlite_db.get(DailyRollup, (1, day))
+    assert (rollup.mood, rollup.workout_count, rollup.workout_minutes) == (5, 1, 20)
+    assert sqlite_db.get(DailyRollup, (1, date(2026, 3, 3))).workout_minutes == 30
+
+    # A day with nothing left has no rollup
+    sqlite_db.delete(run)
+    sqlite_db.commit()
+    sqlite_db.expire_all()
+    assert sqlite_db.get(DailyRollup, (1, date(2026, 3, 3))) is None
+
+
+def test_rollup_backfill_and_weekly_insights(sqlite_db):
+    from datetime import date, timedelta
+    from sqlalchemy import delete, event, func, select
+    from backend.insights import weekly_insights
+    from backend.models.checkin import CheckIn
+    from backend.models.daily_rollup import DailyRollup
+    from backend.models.workout import Workout
+    from backend.rollups import refresh_range
+
+    last = date(2026, 3, 31)
+    for offset in range(40):
+        day = last - timedelta(days=offset)
+        sleep = 6 + offset % 3
+        sqlite_db.add(CheckIn(user_id=2, date=day, sleep_hours=sleep, sleep_quality=3, mood=1 + offset % 5,
+                              energy=1 + offset % 5, stress=1 + offset % 4))
+        sqlite_db.add(Workout(user_id=2, date=day, type="run", duration_min=10 * (1 + offset % 5), rpe=1 + offset % 4))
+    sqlite_db.commit()
+
+    # Rows written around the ORM (bulk loads) are picked up by the backfill
+    sqlite_db.execute(delete(DailyRollup))
+    assert refresh_range(sqlite_db.connection(), since=last - timedelta(days=29)) == 30
+    sqlite_db.commit()
+    assert sqlite_db.scalar(select(func.count()).select_from(DailyRollup)) == 30
+
+    statements = []
+    event.listen(sqlite_db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    trends = weekly_insights(sqlite_db, 2, last, days=90)
+    assert len(statements) == 1
+    assert trends["days_with_data"] == 30
+    assert trends["totals"]["workouts"] == 30
+    # mood and workout minutes move together in this data
+    assert trends["correlations"]["mood_workout_minutes"] == 1.0
+    assert trends["correlations"]["stress_workout_rpe"] == 1.0
+    assert trends["averages"]["sleep_hours"] == round(sum(6 + o % 3 for o in range(30)) / 30, 2)
+    assert weekly_insights(sqlite_db, 3, last)["averages"]["mood"] is None
+
+
+def test_statement_timeout_only_applies_to_the_async_engine():
+    from backend.database import engine_options
+
+    url = "postgresql://wellsync:x@localhost/wellsync"
+    assert "connect_args" not in engine_options(url)
+    assert engine_options("postgresql+asyncpg://wellsync:x@localhost/wellsync", is_async=True)["connect_args"] == {
+        "server_settings": {"statement_timeout": "30000"}
+    }
+    assert engine_options("sqlite:///x.db") == {}
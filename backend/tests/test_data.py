@@ -0,0 +1,268 @@
+import json
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+
+CHECKINS_CSV = """user_id,date,sleep_hours,sleep_quality,mood,energy,stress
+1,2026-03-01,8,5,5,5,1
+1,2026-03-02,6,3,3,2,4
+1,2026-03-03,13,3,3,3,3
+1,2026-03-04,7,3,6,3,3
+2,not-a-date,7,3,3,3,3
+2,2026-03-01,7,2.5,3,3,3
+1,2026-03-02,7,4,4,4,2
+"""
+
+
+def test_import_checkins_validates_scores_and_upserts(sqlite_db):
+    from backend.bulk_import import import_records
+    from backend.models.checkin import CheckIn
+    from backend.models.daily_rollup import DailyRollup
+
+    report = import_records(sqlite_db, "checkins", CHECKINS_CSV.splitlines(keepends=True), "csv", batch_size=3)
+
+    assert (report.rows_read, report.rows_loaded, report.rows_rejected) == (7, 3, 4)
+    assert report.errors == [
+        "row 3: sleep_hours must be a number in [0, 12]",
+        "row 4: mood must be an integer in [1, 5]",
+        "row 5: date must be an ISO date (YYYY-MM-DD)",
+        "row 6: sleep_quality must be an integer in [1, 5]",
+    ]
+    scores = dict(sqlite_db.execute(select(CheckIn.date, CheckIn.readiness_score).where(CheckIn.user_id == 1)).all())
+    # 2026-03-02 came twice (in different batches); the later row wins
+    assert scores == {date(2026, 3, 1): 100.0, date(2026, 3, 2): 82.2}
+    assert sqlite_db.get(DailyRollup, (1, date(2026, 3, 2))).mood == 4
+
+    # Duplicates inside one batch keep the last row as well
+    report = import_records(sqlite_db, "checkins", CHECKINS_CSV.splitlines(keepends=True), "csv", batch_size=100)
+    assert (report.rows_loaded, report.rows_superseded) == (2, 1)
+    assert sqlite_db.scalar(select(func.count()).select_from(CheckIn)) == 2
+
+
+def test_import_ndjson_workouts_appends_and_reports_bad_lines(sqlite_db):
+    from backend.bulk_import import import_records
+    from backend.models.daily_rollup import DailyRollup
+    from backend.models.workout import Workout
+
+    lines = [
+        json.dumps({"user_id": 2, "date": "2026-03-01", "type": "run", "duration_min": 30, "rpe": 7}),
+        "{not json",
+        json.dumps({"user_id": 2, "date": "2026-03-01", "type": "", "duration_min": 30, "rpe": 7}),
+        json.dumps({"user_id": 2, "date": "2026-03-01", "type": "bike", "duration_min": 45, "rpe": 11}),
+        "",
+        json.dumps({"user_id": 2, "date": "2026-03-01", "type": "yoga", "duration_min": "20", "rpe": "3"}),
+    ]
+    report = import_records(sqlite_db, "workouts", lines, "ndjson", max_errors=2)
+
+    assert (report.rows_read, report.rows_loaded, report.rows_rejected) == (5, 2, 3)
+    assert report.errors == ["row 2: not a JSON object", "row 3: type is required"]
+    assert sqlite_db.scalars(select(Workout.type).order_by(Workout.id)).all() == ["run", "yoga"]
+    rollup = sqlite_db.get(DailyRollup, (2, date(2026, 3, 1)))
+    assert (rollup.workout_count, rollup.workout_minutes, rollup.workout_rpe_sum) == (2, 50, 10)
+
+
+def test_import_endpoint_stores_rows_for_the_caller(sqlite_db):
+    from fastapi.testclient import TestClient
+    from backend.database import get_db
+    from backend.main import app
+    from backend.models.meal import Meal
+    from backend.routers.auth import get_current_user_id
+
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    app.dependency_overrides[get_current_user_id] = lambda: 3
+    try:
+        body = "user_id,date,meal_type,quality,notes\n1,2026-03-01,lunch,4,\n1,2026-03-01,dinner,0,late\n"
+        response = TestClient(app).post("/import/meals?format=csv", content=body)
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.json()["rows_loaded"] == 1
+    assert sqlite_db.execute(select(Meal.user_id, Meal.meal_type, Meal.notes)).all() == [(3, "lunch", None)]
+
+
+def test_import_endpoint_rejects_oversized_uploads(sqlite_db, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend.config import settings
+    from backend.database import get_db
+    from backend.main import app
+    from backend.models.meal import Meal
+    from backend.routers.auth import get_current_user_id
+
+    monkeypatch.setattr(settings, "import_max_upload_bytes", 64)
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    app.dependency_overrides[get_current_user_id] = lambda: 3
+    body = "user_id,date,meal_type,quality,notes\n" + "1,2026-03-01,lunch,4,\n" * 10
+    try:
+        client = TestClient(app)
+        declared = client.post("/import/meals?format=csv", content=body)
+        # A chunked body has no Content-Length and is cut off while spooling
+        chunked = client.post("/import/meals?format=csv", content=iter([body[:40].encode(), body[40:].encode()]))
+    finally:
+        app.dependency_overrides.clear()
+
+    assert declared.status_code == chunked.status_code == 413
+    assert sqlite_db.scalar(select(func.count()).select_from(Meal)) == 0
+
+
+@pytest.mark.asyncio
+async def test_export_streams_one_chunk_per_fetch(sqlite_db, tmp_path):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from backend.export import stream_export
+    from backend.models.meal import Meal
+    from backend.models.workout import Workout
+
+    sqlite_db.add_all([Workout(user_id=1, date=date(2026, 3, 1 + i % 28), type="run", duration_min=30, rpe=5)
+                       for i in range(25)])
+    sqlite_db.add_all([Meal(user_id=1, date=date(2026, 3, 1), meal_type="lunch", quality=4, notes='a "b", c'),
+                       Meal(user_id=2, date=date(2026, 3, 1), meal_type="lunch", quality=2)])
+    sqlite_db.commit()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'wellsync.db'}")
+    factory = async_sessionmaker(engine)
+    chunks = [c async for c in stream_export(1, ["workouts", "meals"], "ndjson", factory, yield_per=10)]
+    rows = [json.loads(line) for chunk in chunks for line in chunk.decode().splitlines()]
+    # 25 workouts in partitions of 10, 10, 5, then the one meal
+    assert len(chunks) == 4
+    assert [r["kind"] for r in rows] == ["workouts"] * 25 + ["meals"]
+    assert [r["date"] for r in rows[:25]] == sorted(r["date"] for r in rows[:25])
+    assert rows[-1]["notes"] == 'a "b", c'
+
+    chunks = [c async for c in stream_export(1, ["meals"], "csv", factory)]
+    assert b"".join(chunks).decode().splitlines() == [
+        "kind,id,date,meal_type,quality,notes,created_at",
+        f'meals,1,2026-03-01,lunch,4,"a ""b"", c",{rows[-1]["created_at"].replace("T", " ")}',
+    ]
+    await engine.dispose()
+
+
+def test_export_endpoint_streams_the_callers_history(sqlite_db, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    import backend.export
+    from backend.main import app
+    from backend.models.checkin import CheckIn
+    from backend.routers.auth import get_current_user_id
+
+    sqlite_db.add_all([CheckIn(user_id=u, date=date(2026, 3, 1), sleep_hours=7, sleep_quality=3, mood=3, energy=3,
+                               stress=3) for u in (1, 2)])
+    sqlite_db.commit()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'wellsync.db'}")
+    monkeypatch.setattr(backend.export, "AsyncSessionLocal", async_sessionmaker(engine))
+    app.dependency_overrides[get_current_user_id] = lambda: 2
+    try:
+        response = TestClient(app).get("/export?format=ndjson&kind=checkins")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(r["kind"], r["date"]) for r in rows] == [("checkins", "2026-03-01")]
+
+
+def test_partition_months_and_retention_window():
+    from backend.partitions import add_months, expired_months, partition_ddl, partition_name
+
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -13) == date(2024, 12, 1)
+    assert partition_name("agent_outputs", date(2026, 3, 1)) == "agent_outputs_2026_03"
+    assert partition_ddl("agent_outputs", date(2026, 12, 15)) == (
+        "CREATE TABLE IF NOT EXISTS agent_outputs_2026_12 PARTITION OF agent_outputs "
+        "FOR VALUES FROM ('2026-12-01') TO ('2027-01-01')"
+    )
+    months = [date(2025, m, 1) for m in range(1, 13)] + [date(2026, 1, 1)]
+    # Keeping 12 whole months on 2026-01-20: January 2025 is the first month kept
+    assert expired_months(months, date(2026, 1, 20), 12) == []
+    assert expired_months(months, date(2026, 2, 1), 12) == [date(2025, 1, 1)]
+    assert expired_months(months, date(2026, 2, 1), 0) == []
+
+
+PG_URL = os.environ.get("WELLSYNC_TEST_DATABASE_URL")
+
+
+@pytest.mark.skipif(PG_URL is None, reason="WELLSYNC_TEST_DATABASE_URL not set")
+def test_partition_maintenance_prunes_and_archives(tmp_path):
+    import gzip
+    from sqlalchemy import text
+    from backend.partitions import apply_retention, create_partitions, ensure_partitions, list_partitions
+
+    engine = create_engine(PG_URL)
+    with engine.connect() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS part_outputs"))
+        conn.execute(text("CREATE TABLE part_outputs (id serial, user_id int, date date NOT NULL, "
+                          "llm_text text, PRIMARY KEY (id, date)) PARTITION BY RANGE (date)"))
+        try:
+            today = date(2026, 3, 10)
+            created = create_partitions(conn, "part_outputs", date(2025, 12, 1), ahead=6)
+            assert created[0] == "part_outputs_2025_12" and created[-1] == "part_outputs_2026_06"
+            assert create_partitions(conn, "part_outputs", today, ahead=3) == []
+            conn.execute(text("INSERT INTO part_outputs (user_id, date, llm_text) "
+                              "VALUES (1, '2025-12-05', 'old'), (1, '2026-03-10', 'today')"))
+            plan = conn.execute(text("EXPLAIN (FORMAT JSON) SELECT * FROM part_outputs "
+                                     "WHERE user_id = 1 AND date = '2026-03-10'")).scalar()
+            assert "part_outputs_2026_03" in str(plan) and "part_outputs_2025_12" not in str(plan)
+
+            archived = apply_retention(conn, "part_outputs", today, 2, str(tmp_path))
+            assert archived == ["part_outputs_2025_12"]
+            assert date(2025, 12, 1) not in list_partitions(conn, "part_outputs")
+            with gzip.open(tmp_path / "part_outputs_2025_12.csv.gz", "rt") as f:
+                assert f.read().splitlines()[1].endswith(",old")
+
+            # No DEFAULT partition: an import of older months creates them first
+            assert ensure_partitions(conn, "part_outputs", date(2025, 10, 20), date(2026, 1, 5)) == [
+                "part_outputs_2025_10", "part_outputs_2025_11", "part_outputs_2025_12"]
+            conn.execute(text("INSERT INTO part_outputs (user_id, date, llm_text) VALUES (1, '2025-10-20', 'import')"))
+        finally:
+            conn.rollback()
+            conn.execute(text("DROP TABLE IF EXISTS part_outputs"))
+            conn.commit()
+
+
+@pytest.mark.skipif(PG_URL is None, reason="WELLSYNC_TEST_DATABASE_URL not set")
+def test_concurrent_writes_to_a_new_day_keep_both_in_the_rollup():
+    import threading
+    from backend.database import Base
+    from backend.models.checkin import CheckIn
+    from backend.models.daily_rollup import DailyRollup
+    from backend.models.meal import Meal
+    from backend.models.user import User
+
+    engine = create_engine(PG_URL)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    day = date(2026, 3, 4)
+    with Session() as db:
+        user = User(email="rollup-race@example.com", name="R", password_hash="x")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    try:
+        first, second = Session(), Session()
+        first.add(CheckIn(user_id=user_id, date=day, sleep_hours=7, sleep_quality=4, mood=3, energy=4, stress=2,
+                          readiness_score=70.0))
+        first.flush()
+        # The second flush waits on the first transaction's lock for (user_id, day)
+        second.add(Meal(user_id=user_id, date=day, meal_type="lunch", quality=4))
+        waiter = threading.Thread(target=second.commit)
+        waiter.start()
+        waiter.join(0.5)
+        assert waiter.is_alive()
+        first.commit()
+        waiter.join(10)
+        first.close()
+        second.close()
+        with Session() as db:
+            rollup = db.get(DailyRollup, (user_id, day))
+            assert (rollup.readiness_score, rollup.meal_count) == (70.0, 1)
+    finally:
+        with Session() as db:
+            for model in (DailyRollup, CheckIn, Meal):
+                db.query(model).filter(model.user_id == user_id).delete()
+            db.query(User).filter(User.id == user_id).delete()
+            db.commit()
+        engine.dispose()
@@ -0,0 +1,419 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.events.consumer import EventConsumerPool
+from backend.events.durable_queue import DurableEventQueue
+from backend.events.event_types import EventType, WellnessEvent
+from backend.events.fanout import fan_out, fan_out_handler
+from backend.events.gateway import EventGateway
+from backend.models.event_record import EventRecord
+from backend.events.queue import (
+    CoalescingPriorityQueue,
+    EventQueueFull,
+    QueueFullPolicy,
+    put_event,
+)
+
+
+@pytest.mark.asyncio
+async def test_put_event_drop_oldest_and_reject():
+    queue = asyncio.Queue(maxsize=1)
+    await put_event(WellnessEvent(type=EventType.MODEL_RETRAINING), queue, QueueFullPolicy.DROP_OLDEST)
+    await put_event(WellnessEvent(type=EventType.EVENING_SUMMARY), queue, QueueFullPolicy.DROP_OLDEST)
+    assert queue.qsize() == 1
+    assert queue.get_nowait().type == EventType.EVENING_SUMMARY
+
+    queue.put_nowait(WellnessEvent(type=EventType.MODEL_RETRAINING))
+    with pytest.raises(EventQueueFull):
+        await put_event(WellnessEvent(type=EventType.EVENING_SUMMARY), queue, QueueFullPolicy.REJECT)
+
+
+@pytest.mark.asyncio
+async def test_priority_queue_orders_by_type_and_coalesces_pending_events():
+    queue = CoalescingPriorityQueue()
+    await queue.put(WellnessEvent(type=EventType.MODEL_RETRAINING))
+    await queue.put(WellnessEvent(type=EventType.MORNING_RECOMMENDATION, user_ids=[1, 2]))
+    producer_event = WellnessEvent(type=EventType.MORNING_RECOMMENDATION, user_ids=[2, 3])
+    await queue.put(producer_event)
+    await queue.put(WellnessEvent(type=EventType.EVENING_SUMMARY, user_ids=[5]))
+    await queue.put(WellnessEvent(type=EventType.EVENING_SUMMARY))
+
+    assert queue.qsize() == 3 and queue.coalesced == 2
+    first, second, third = (queue.get_nowait() for _ in range(3))
+    assert first.type == EventType.MORNING_RECOMMENDATION and first.user_ids == [1, 2, 3]
+    assert producer_event.user_ids == [2, 3]
+    # An empty user_ids list means all users and absorbs the explicit list
+    assert second.type == EventType.EVENING_SUMMARY and second.user_ids == []
+    assert third.type == EventType.MODEL_RETRAINING
+
+    for _ in range(3):
+        queue.task_done()
+    await asyncio.wait_for(queue.join(), 1)
+
+
+@pytest.mark.asyncio
+async def test_priority_queue_drop_policy_evicts_lowest_priority():
+    queue = CoalescingPriorityQueue(maxsize=1)
+    await queue.put(WellnessEvent(type=EventType.MODEL_RETRAINING))
+    await put_event(WellnessEvent(type=EventType.MORNING_RECOMMENDATION), queue, QueueFullPolicy.DROP_OLDEST)
+    assert queue.qsize() == 1
+    assert queue.get_nowait().type == EventType.MORNING_RECOMMENDATION
+
+
+@pytest.mark.asyncio
+async def test_slow_event_type_does_not_block_other_types():
+    queue = asyncio.Queue()
+    gateway = EventGateway()
+    release_morning = asyncio.Event()
+    handled = []
+
+    async def morning(event, **kwargs):
+        await release_morning.wait()
+        handled.append(event.type)
+
+    async def evening(event, **kwargs):
+        handled.append(event.type)
+
+    gateway.register(EventType.MORNING_RECOMMENDATION, morning)
+    gateway.register(EventType.EVENING_SUMMARY, evening)
+    pool = EventConsumerPool(
+        gateway, queue, workers=2, type_limits={EventType.MORNING_RECOMMENDATION: 1}
+    )
+    await pool.start()
+
+    for event_type in (EventType.MORNING_RECOMMENDATION, EventType.MORNING_RECOMMENDATION,
+                       EventType.EVENING_SUMMARY):
+        await queue.put(WellnessEvent(type=event_type))
+    await asyncio.sleep(0.05)
+    # Second morning event is parked; the free worker handled evening meanwhile
+    assert handled == [EventType.EVENING_SUMMARY]
+
+    release_morning.set()
+    await pool.stop(drain=True, timeout=1)
+    assert handled.count(EventType.MORNING_RECOMMENDATION) == 2
+
+
+@pytest.mark.asyncio
+async def test_running_pool_coalesces_events_parked_behind_a_busy_type():
+    queue = CoalescingPriorityQueue()
+    gateway = EventGateway()
+    release = asyncio.Event()
+    handled = []
+
+    async def morning(event, **kwargs):
+        handled.append(event.user_ids)
+        await release.wait()
+
+    gateway.register(EventType.MORNING_RECOMMENDATION, morning)
+    pool = EventConsumerPool(gateway, queue, workers=3, type_limits={EventType.MORNING_RECOMMENDATION: 1})
+    await pool.start()
+    for user_ids in ([1], [2], [3, 2], [4]):
+        await queue.put(WellnessEvent(type=EventType.MORNING_RECOMMENDATION, user_ids=user_ids))
+        await asyncio.sleep(0.01)
+    # The first event runs; the others were taken off the queue while it ran and merged into one parked event
+    assert handled == [[1]] and queue.empty()
+
+    release.set()
+    await pool.stop(drain=True, timeout=1)
+    assert handled == [[1], [2, 3, 4]]
+    assert queue.coalesced == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_isolates_handler_failures_and_closes_sessions():
+    queue = asyncio.Queue()
+    gateway = EventGateway()
+    sessions = []
+
+    class FakeSession:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    def db_factory():
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    async def failing(event, db, **kwargs):
+        raise RuntimeError("boom")
+
+    gateway.register(EventType.MODEL_RETRAINING, failing)
+    pool = EventConsumerPool(gateway, queue, workers=1, type_limits={}, db_factory=db_factory)
+    await pool.start()
+    await queue.put(WellnessEvent(type=EventType.MODEL_RETRAINING))
+    await queue.put(WellnessEvent(type=EventType.MODEL_RETRAINING))
+    await pool.stop(drain=True, timeout=1)
+
+    assert queue.empty() and not pool.running
+    assert len(sessions) == 2 and all(s.closed for s in sessions)
+
+
+@pytest.mark.asyncio
+async def test_fan_out_chunks_bounds_concurrency_and_isolates_failures():
+    active = 0
+    peak = 0
+    processed = []
+    progress = []
+
+    async def per_user(user_id, event, **kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.001)
+        active -= 1
+        if user_id == 3:
+            raise ValueError("no check-in")
+        processed.append(user_id)
+
+    event = WellnessEvent(type=EventType.MORNING_RECOMMENDATION, user_ids=list(range(1, 11)))
+    report = await fan_out(event, per_user, event.user_ids, chunk_size=4, concurrency=2,
+                           on_progress=progress.append)
+
+    assert peak <= 2
+    assert sorted(processed) == [1, 2, 4, 5, 6, 7, 8, 9, 10]
+    assert report.total == 10 and report.succeeded == 9
+    assert report.failed == {3: "ValueError: no check-in"}
+    assert [(p.chunk_index, p.size, p.failed) for p in progress] == [(0, 4, 1), (1, 4, 0), (2, 2, 0)]
+
+
+@pytest.mark.asyncio
+async def test_fan_out_handler_resolves_all_users_and_passes_chunk_context():
+    seen = []
+
+    async def per_user(user_id, event, chunk_context, **kwargs):
+        seen.append((user_id, chunk_context))
+
+    handler = fan_out_handler(
+        per_user,
+        resolve_user_ids=lambda **kwargs: [1, 2, 3],
+        chunk_size=2,
+        prepare_chunk=lambda chunk, event, **kwargs: tuple(chunk),
+    )
+    gateway = EventGateway()
+    gateway.register(EventType.EVENING_SUMMARY, handler)
+    await gateway.dispatch(WellnessEvent(type=EventType.EVENING_SUMMARY))
+
+    assert sorted(seen) == [(1, (1, 2)), (2, (1, 2)), (3, (3,))]
+
+
+@pytest.mark.asyncio
+async def test_fan_out_gives_each_user_its_own_async_session(tmp_path):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'fanout.db'}")
+    factory = async_sessionmaker(engine)
+    sessions = []
+
+    async def per_user(user_id, event, db, **kwargs):
+        sessions.append(db)
+        await db.execute(text("SELECT :u"), {"u": user_id})
+        await asyncio.sleep(0.001)
+        await db.execute(text("SELECT :u"), {"u": user_id})
+
+    event = WellnessEvent(type=EventType.MORNING_RECOMMENDATION, user_ids=list(range(1, 21)))
+    async with factory() as shared:
+        # As dispatched by EventConsumerPool: one session per user
+        report = await fan_out(event, per_user, event.user_ids, concurrency=10, db=shared, db_factory=factory)
+        assert report.failed == {} and report.succeeded == 20
+        assert len(set(map(id, sessions))) == 20 and shared not in sessions
+
+        # Only a shared AsyncSession: users run one at a time instead of failing
+        report = await fan_out(event, per_user, event.user_ids, concurrency=10, db=shared)
+        assert report.failed == {} and report.succeeded == 20
+    await engine.dispose()
+
+
+@pytest.fixture
+def event_db(tmp_path):
+    # Real SKIP LOCKED claims against WELLSYNC_TEST_DATABASE_URL when set, else a SQLite stand-in
+    engine = create_engine(os.environ.get("WELLSYNC_TEST_DATABASE_URL") or f"sqlite:///{tmp_path / 'events.db'}")
+    EventRecord.__table__.drop(engine, checkfirst=True)
+    Base.metadata.create_all(engine, tables=[EventRecord.__table__])
+    yield sessionmaker(bind=engine)
+    EventRecord.__table__.drop(engine)
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_durable_queue_priority_dedup_and_retries(event_db):
+    queue = DurableEventQueue(event_db, visibility_timeout=60, max_attempts=2, retry_backoff=0, poll_interval=0.01)
+    assert await queue.put(WellnessEvent(type=EventType.MODEL_RETRAINING), dedup_key="retrain:1")
+    assert not await queue.put(WellnessEvent(type=EventType.MODEL_RETRAINING), dedup_key="retrain:1")
+    await queue.put(WellnessEvent(type=EventType.MORNING_RECOMMENDATION, user_ids=[4, 2]))
+    assert queue.qsize() == 2
+
+    morning = await queue.get()
+    assert morning.type == EventType.MORNING_RECOMMENDATION and morning.user_ids == [4, 2]
+    await queue.ack(morning)
+    queue.task_done()
+
+    retrain = await queue.get()
+    await queue.nack(retrain, RuntimeError("boom"))
+    queue.task_done()
+    retrain = await queue.get()
+    assert retrain.event_id is not None
+    await queue.nack(retrain, RuntimeError("boom again"))
+    queue.task_done()
+
+    assert queue.empty()
+    await asyncio.wait_for(queue.join(), 1)
+    with event_db() as db:
+        rows = {r.event_type: r for r in db.query(EventRecord).all()}
+    assert rows["morning_recommendation"].status == "done"
+    assert rows["model_retraining"].status == "dead"
+    assert rows["model_retraining"].attempts == 2
+    assert rows["model_retraining"].last_error == "RuntimeError: boom again"
+
+
+@pytest.mark.asyncio
+async def test_put_event_inserts_durable_events_off_the_loop_under_every_policy(event_db):
+    import threading
+
+    queue = DurableEventQueue(event_db)
+    insert_threads = []
+    put_nowait = queue.put_nowait
+
+    def recording_put_nowait(event, dedup_key=None):
+        insert_threads.append(threading.get_ident())
+        return put_nowait(event, dedup_key)
+
+    queue.put_nowait = recording_put_nowait
+    for policy in QueueFullPolicy:
+        await put_event(WellnessEvent(type=EventType.EVENING_SUMMARY), queue, policy)
+
+    assert queue.qsize() == len(QueueFullPolicy)
+    assert threading.get_ident() not in insert_threads
+
+
+@pytest.mark.asyncio
+async def test_durable_queue_reclaims_after_visibility_timeout(event_db):
+    crashed = DurableEventQueue(event_db, visibility_timeout=0, poll_interval=0.01)
+    other = DurableEventQueue(event_db, visibility_timeout=60, poll_interval=0.01)
+    await crashed.put(WellnessEvent(type=EventType.EVENING_SUMMARY))
+
+    stale = await crashed.get()
+    reclaimed = await asyncio.wait_for(other.get(), 1)
+    assert reclaimed.event_id == stale.event_id
+
+    # The expired claim can no longer settle the event
+    await crashed.ack(stale)
+    with event_db() as db:
+        assert db.get(EventRecord, stale.event_id).status == "pending"
+    await other.ack(reclaimed)
+    with event_db() as db:
+        assert db.get(EventRecord, stale.event_id).status == "done"
+
+
+@pytest.mark.asyncio
+async def test_slow_handler_keeps_its_claim_and_runs_once(event_db):
+    queues = [DurableEventQueue(event_db, visibility_timeout=0.2, max_attempts=3, poll_interval=0.01)
+              for _ in range(2)]
+    gateway = EventGateway()
+    calls = []
+
+    async def slow(event, **kwargs):
+        calls.append(event.event_id)
+        await asyncio.sleep(0.5)
+
+    gateway.register(EventType.MORNING_RECOMMENDATION, slow)
+    pools = [EventConsumerPool(gateway, q, workers=1, type_limits={}) for q in queues]
+    for pool in pools:
+        await pool.start()
+    await queues[0].put(WellnessEvent(type=EventType.MORNING_RECOMMENDATION))
+    await asyncio.sleep(1.0)
+    for pool in pools:
+        await pool.stop(drain=True, timeout=1)
+
+    assert len(calls) == 1
+    with event_db() as db:
+        record = db.get(EventRecord, calls[0])
+        assert (record.status, record.attempts) == ("done", 1)
+
+
+@pytest.mark.asyncio
+async def test_expired_claims_stop_after_max_attempts(event_db):
+    crashed = DurableEventQueue(event_db, visibility_timeout=0, max_attempts=2, poll_interval=0.01)
+    await crashed.put(WellnessEvent(type=EventType.EVENING_SUMMARY))
+    first = await crashed.get()
+    await crashed.get()
+    # Both attempts expired without an ack: the event is dead, not delivered a third time
+    with pytest.raises(asyncio.QueueEmpty):
+        crashed.get_nowait()
+    with event_db() as db:
+        record = db.get(EventRecord, first.event_id)
+        assert (record.status, record.attempts, record.claim_token) == ("dead", 2, None)
+
+
+@pytest.mark.asyncio
+async def test_consumer_pool_retries_failed_durable_events(event_db):
+    queue = DurableEventQueue(event_db, retry_backoff=0, poll_interval=0.01)
+    gateway = EventGateway()
+    calls = []
+
+    async def flaky(event, **kwargs):
+        calls.append(event.event_id)
+        if len(calls) == 1:
+            raise RuntimeError("transient")
+
+    gateway.register(EventType.EVENING_SUMMARY, flaky)
+    await queue.put(WellnessEvent(type=EventType.EVENING_SUMMARY))
+    pool = EventConsumerPool(gateway, queue, workers=1, type_limits={})
+    await pool.start()
+    for _ in range(100):
+        if len(calls) == 2:
+            break
+        await asyncio.sleep(0.01)
+    await pool.stop(drain=True, timeout=1)
+
+    assert len(calls) == 2 and calls[0] == calls[1]
+    with event_db() as db:
+        assert db.get(EventRecord, calls[0]).status == "done"
+
+
+@pytest.mark.asyncio
+async def test_consumer_pool_leaves_durable_events_of_busy_types_unclaimed(event_db):
+    queue = DurableEventQueue(event_db, poll_interval=0.01)
+    gateway = EventGateway()
+    release_morning = asyncio.Event()
+    handled = []
+
+    async def morning(event, **kwargs):
+        handled.append(event.event_id)
+        await release_morning.wait()
+
+    async def evening(event, **kwargs):
+        handled.append(event.event_id)
+
+    gateway.register(EventType.MORNING_RECOMMENDATION, morning)
+    gateway.register(EventType.EVENING_SUMMARY, evening)
+    pool = EventConsumerPool(gateway, queue, workers=3, type_limits={EventType.MORNING_RECOMMENDATION: 1})
+    await pool.start()
+    for event_type in (EventType.MORNING_RECOMMENDATION, EventType.MORNING_RECOMMENDATION,
+                       EventType.EVENING_SUMMARY):
+        await queue.put(WellnessEvent(type=event_type))
+    # The second morning event stays an unclaimed row, not a parked claim; a worker that
+    # claimed it in the race for the morning slot has released it (attempts back to 0)
+    for _ in range(100):
+        with event_db() as db:
+            second = db.query(EventRecord).filter_by(event_type="morning_recommendation").order_by(EventRecord.id)[1]
+        if len(handled) == 2 and second.claim_token is None:
+            break
+        await asyncio.sleep(0.01)
+    assert (second.status, second.claim_token, second.attempts) == ("pending", None, 0)
+    assert second.id not in handled
+
+    release_morning.set()
+    for _ in range(100):
+        if len(handled) == 3:
+            break
+        await asyncio.sleep(0.01)
+    await pool.stop(drain=True, timeout=1)
+    with event_db() as db:
+        assert [r.status for r in db.query(EventRecord)] == ["done"] * 3
@@ -0,0 +1,369 @@
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+
+from backend.knowledge.cache import LRUCache, canonical_query
+from backend.knowledge.ingest import load_corpus, plan_changes
+from backend.knowledge.memory_index import InMemoryVectorIndex, normalize_rows, parse_vector
+from backend.knowledge.packing import Candidate, pack_within_budget
+from backend.knowledge.quantize import (
+    binary_quantize,
+    binary_rerank_top_k,
+    exact_top_k,
+    halfvec_top_k,
+    recall_at_k,
+    to_halfvec,
+)
+from backend.knowledge.vector_ops import INDEX_TYPES, METRICS, distance_expr, index_ddl, operator_class
+from backend.tokens import estimate_tokens
+
+# Optional integration database with the pgvector extension, e.g. the docker-compose db
+PG_URL = os.environ.get("WELLSYNC_TEST_DATABASE_URL")
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def one(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return self._rows
+
+
+class _ChunkTable:
+    """Minimal stand-in for a Session over knowledge_chunks (version + load queries)."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.loads = 0
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if "count(*)" in sql:
+            digest = hash(tuple(self.rows))
+            return _Result([(len(self.rows), max((r[0] for r in self.rows), default=0), digest)])
+        self.loads += 1
+        return _Result(self.rows)
+
+
+def _random_corpus(n=30, dim=384, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def test_parse_vector_accepts_pgvector_text():
+    vec = parse_vector("[0.5,1,-2]")
+    assert vec.dtype == np.float32
+    assert vec.tolist() == [0.5, 1.0, -2.0]
+
+
+def test_memory_index_matches_l2_order_on_normalized_vectors():
+    embeddings = _random_corpus()
+    index = InMemoryVectorIndex()
+    index.load(list(range(30)), ["sleep"] * 30, [f"chunk {i}" for i in range(30)], embeddings)
+
+    query = np.random.default_rng(1).normal(size=384).astype(np.float32)
+    # What pgvector computes: ORDER BY embedding <-> query over unit vectors
+    distances = np.linalg.norm(normalize_rows(embeddings) - normalize_rows(query)[0], axis=1)
+    expected = [f"chunk {i}" for i in np.argsort(distances)[:5]]
+
+    assert index.search(query, k=5) == expected
+    assert index.search(query, k=100) == [f"chunk {i}" for i in np.argsort(distances)]
+
+
+def test_memory_index_empty_returns_nothing():
+    assert InMemoryVectorIndex().search(np.ones(384), k=2) == []
+
+
+def test_memory_index_reloads_only_when_table_changes():
+    embeddings = _random_corpus(n=3, dim=4)
+    table = _ChunkTable([(i + 1, "sleep", f"chunk {i}", str(embeddings[i].tolist())) for i in range(3)])
+    index = InMemoryVectorIndex(refresh_seconds=0)
+
+    assert index.maybe_refresh(table) is True
+    assert index.maybe_refresh(table) is False
+    assert table.loads == 1
+    assert len(index) == 3
+
+    table.rows = table.rows + [(4, "stress", "new chunk", "[1,0,0,0]")]
+    assert index.maybe_refresh(table) is True
+    assert index.search([1, 0, 0, 0], k=1) == ["new chunk"]
+
+    # In-place upsert: same ids and row count, different content
+    table.rows = table.rows[:-1] + [(4, "stress", "edited chunk", "[1,0,0,0]")]
+    assert index.maybe_refresh(table) is True
+    assert index.search([1, 0, 0, 0], k=1) == ["edited chunk"]
+
+
+def test_memory_index_search_many_matches_single_queries():
+    embeddings = _random_corpus()
+    index = InMemoryVectorIndex()
+    index.load(list(range(30)), ["sleep"] * 30, [f"chunk {i}" for i in range(30)], embeddings)
+
+    queries = np.random.default_rng(2).normal(size=(8, 384)).astype(np.float32)
+    assert index.search_many(queries, k=3) == [index.search(q, k=3) for q in queries]
+    assert index.search_many(queries, k=50) == [index.search(q, k=50) for q in queries]
+
+
+def test_operator_and_opclass_agree_for_every_metric():
+    assert distance_expr("cosine") == "embedding <=> CAST(:emb AS vector)"
+    assert operator_class("cosine") == "vector_cosine_ops"
+    assert operator_class("l2") == "vector_l2_ops"
+    assert operator_class("inner_product") == "vector_ip_ops"
+    assert "USING hnsw (embedding vector_cosine_ops) WITH (m = 16" in index_ddl("cosine", "hnsw")
+    with pytest.raises(ValueError):
+        distance_expr("manhattan")
+    with pytest.raises(ValueError):
+        index_ddl("cosine", "flat")
+
+
+@pytest.mark.skipif(PG_URL is None, reason="WELLSYNC_TEST_DATABASE_URL not set")
+@pytest.mark.parametrize("index_type", sorted(INDEX_TYPES))
+@pytest.mark.parametrize("metric", sorted(METRICS))
+def test_explain_uses_embedding_index(metric, index_type):
+    engine = create_engine(PG_URL)
+    rng = np.random.default_rng(0)
+    vectors = normalize_rows(rng.normal(size=(200, 384)))
+    with engine.connect() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(text("CREATE TEMP TABLE kc_explain (id serial PRIMARY KEY, embedding vector(384))"))
+        conn.execute(
+            text("INSERT INTO kc_explain (embedding) VALUES (CAST(:e AS vector))"),
+            [{"e": str(v.tolist())} for v in vectors],
+        )
+        conn.execute(text(index_ddl(metric, index_type, table="kc_explain", name="kc_explain_idx")))
+        conn.execute(text("ANALYZE kc_explain"))
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+
+        def plan(expr: str) -> str:
+            rows = conn.execute(
+                text(f"EXPLAIN SELECT id FROM kc_explain ORDER BY {expr} LIMIT 2"),
+                {"emb": str(vectors[0].tolist())},
+            ).fetchall()
+            return "\n".join(row[0] for row in rows)
+
+        assert "kc_explain_idx" in plan(distance_expr(metric))
+        # A mismatched operator (the old <-> against a cosine index) cannot use it
+        other = next(m for m in sorted(METRICS) if m != metric)
+        assert "kc_explain_idx" not in plan(distance_expr(other))
+        conn.rollback()
+
+
+def test_ingest_plans_only_changed_and_removed_files(tmp_path):
+    (tmp_path / "sleep_01.txt").write_text("Sleep 7-9 hours.\nSource: AASM", encoding="utf-8")
+    (tmp_path / "stress_01.txt").write_text("Breathe slowly.", encoding="utf-8")
+    (tmp_path / "misc_01.txt").write_text("Not a category.", encoding="utf-8")
+    (tmp_path / "sleep_02.txt").write_text("   ", encoding="utf-8")
+
+    chunks = load_corpus(tmp_path)
+    assert [c.source_file for c in chunks] == ["sleep_01.txt", "stress_01.txt"]
+    assert chunks[0].source == "AASM"
+    assert chunks[0].content == "Sleep 7-9 hours."
+
+    changed, removed = plan_changes(chunks, {})
+    assert changed == chunks and removed == []
+
+    stored = {c.source_file: c.content_hash for c in chunks}
+    stored["exercise_09.txt"] = "old"
+    assert plan_changes(chunks, stored) == ([], ["exercise_09.txt"])
+
+    (tmp_path / "stress_01.txt").write_text("Breathe slowly for 5 minutes.", encoding="utf-8")
+    changed, removed = plan_changes(load_corpus(tmp_path), stored)
+    assert [c.source_file for c in changed] == ["stress_01.txt"]
+    assert removed == ["exercise_09.txt"]
+
+
+def test_lru_cache_evicts_least_recently_used_and_counts():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 2, "misses": 1, "hit_rate": 0.6667}
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_lru_cache_ttl_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("backend.knowledge.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(maxsize=10, ttl_seconds=5)
+    cache.put("q", ("chunk",))
+    now[0] += 4
+    assert cache.get("q") == ("chunk",)
+    now[0] += 2
+    assert cache.get("q") is None
+    assert len(cache) == 0
+
+
+def test_canonical_query_ignores_case_and_spacing():
+    assert canonical_query("  Sleep 6h   quality 3/5\tSTRESS 4/5 ") == "sleep 6h quality 3/5 stress 4/5"
+
+
+def _candidate(content, vector, score, category="sleep"):
+    return Candidate(content, category, normalize_rows(vector)[0], score)
+
+
+def test_pack_within_budget_skips_oversized_and_near_duplicates():
+    long_chunk = "x" * 400                      # 100 tokens
+    candidates = [
+        _candidate("a" * 80, [1, 0, 0], 0.9),    # 20 tokens
+        _candidate("b" * 80, [1, 0.01, 0], 0.8), # near-duplicate of the first
+        _candidate(long_chunk, [0, 1, 0], 0.7),  # does not fit the remaining budget
+        _candidate("c" * 40, [0, 0, 1], 0.6),    # 10 tokens
+    ]
+    picked = pack_within_budget(candidates, token_budget=40)
+    assert [c.content[0] for c in picked] == ["a", "c"]
+    assert sum(estimate_tokens(c.content) for c in picked) <= 40
+    assert pack_within_budget(candidates, token_budget=5) == []
+
+
+def test_memory_index_candidates_filter_by_category():
+    index = InMemoryVectorIndex()
+    index.load(
+        [1, 2, 3],
+        ["sleep", "stress", "sleep"],
+        ["sleep a", "stress b", "sleep c"],
+        [[1, 0], [1, 0.1], [0, 1]],
+    )
+    assert [c.content for c in index.candidates([1, 0], n=5)] == ["sleep a", "stress b", "sleep c"]
+    picked = index.candidates([1, 0], n=5, category="sleep")
+    assert [c.content for c in picked] == ["sleep a", "sleep c"]
+    assert picked[0].score == pytest.approx(1.0)
+
+
+def test_compact_storage_recall_against_full_precision():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(32, 384))
+    corpus = normalize_rows(centers[rng.integers(0, 32, 2000)] + 0.6 * rng.normal(size=(2000, 384)))
+    queries = normalize_rows(corpus[rng.integers(0, 2000, 100)] + 0.03 * rng.normal(size=(100, 384)))
+    truth = [exact_top_k(corpus, q, 2) for q in queries]
+
+    half = to_halfvec(corpus)
+    assert half.nbytes * 2 == corpus.nbytes
+    assert recall_at_k([halfvec_top_k(half, q, 2) for q in queries], truth) >= 0.99
+
+    codes = binary_quantize(corpus)
+    assert codes.nbytes * 32 == corpus.nbytes
+    assert recall_at_k([binary_rerank_top_k(corpus, codes, q, 2, 100) for q in queries], truth) >= 0.95
+
+
+def test_compact_index_ddl_and_distance():
+    assert distance_expr("cosine", storage="halfvec") == (
+        "CAST(embedding AS halfvec(384)) <=> CAST(:emb AS halfvec(384))"
+    )
+    assert "halfvec_cosine_ops" in index_ddl("cosine", "hnsw", storage="halfvec")
+    assert "bit_hamming_ops" in index_ddl("cosine", "hnsw", storage="binary")
+    with pytest.raises(ValueError):
+        index_ddl("cosine", "hnsw", storage="int8")
+    # The compact indexes are HNSW only
+    with pytest.raises(ValueError):
+        index_ddl("cosine", "ivfflat", storage="halfvec")
+
+
+def test_binary_storage_raises_ef_search_to_the_candidate_count(monkeypatch):
+    import backend.knowledge.retriever as retriever
+
+    monkeypatch.setattr(retriever, "_get_model", lambda: None)
+    with pytest.raises(ValueError):
+        retriever.WellnessRetriever(None, backend="pgvector", index_type="ivfflat", storage="binary")
+
+    class _Session:
+        def __init__(self):
+            self.transaction = object()
+            self.settings = []
+
+        def get_transaction(self):
+            return self.transaction
+
+        def execute(self, statement, params):
+            self.settings.append((params["name"], params["value"]))
+
+    db = _Session()
+    r = retriever.WellnessRetriever(db, backend="pgvector", index_type="hnsw", storage="binary", ef_search=40)
+    r._tune_search(100)
+    r._tune_search(100)
+    r._tune_search(150)
+    db.transaction = object()
+    r._tune_search(10)
+    assert db.settings == [("hnsw.ef_search", "100"), ("hnsw.ef_search", "150"), ("hnsw.ef_search", "40")]
+
+
+def test_warm_up_retries_until_ready_and_requests_mark_ready(monkeypatch):
+    import backend.knowledge.retriever as retriever
+
+    class _Model:
+        def encode(self, texts, normalize_embeddings=False):
+            return normalize_rows(np.ones((len(texts), 4), dtype=np.float32))
+
+    attempts = []
+
+    def flaky_model():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError("model download failed")
+        return _Model()
+
+    sleeps = []
+    monkeypatch.setattr(retriever, "_ready", retriever.threading.Event())
+    monkeypatch.setattr(retriever, "_get_model", flaky_model)
+    monkeypatch.setattr(retriever.time, "sleep", sleeps.append)
+    monkeypatch.setattr(retriever.settings, "rag_backend", "pgvector")
+    retriever.warm_up()
+    assert retriever.is_ready() and sleeps == [5.0, 10.0]
+
+    # A request that gets through marks RAG ready even if the warm-up gave up
+    monkeypatch.setattr(retriever, "_ready", retriever.threading.Event())
+    monkeypatch.setattr(retriever, "_get_model", _Model)
+    monkeypatch.setattr(retriever, "_memory_index", InMemoryVectorIndex(refresh_seconds=3600))
+    table = _ChunkTable([(1, "sleep", "chunk", "[1,1,1,1]")])
+    assert retriever.WellnessRetriever(table, backend="memory").retrieve("slept badly", k=1) == ["chunk"]
+    assert retriever.is_ready()
+
+
+def test_pgvector_result_cache_is_keyed_on_corpus_version_and_search_settings(monkeypatch):
+    import backend.knowledge.retriever as retriever
+    from backend.knowledge.memory_index import CorpusVersion
+
+    class _Model:
+        def encode(self, texts, normalize_embeddings=False):
+            return normalize_rows(np.ones((len(texts), 4), dtype=np.float32))
+
+    class _Session:
+        """knowledge_chunks as seen by another process's ingest: only the digest changes."""
+
+        def __init__(self):
+            self.digest = "v1"
+            self.searches = 0
+
+        def get_transaction(self):
+            return None
+
+        def execute(self, statement, params=None):
+            sql = str(statement)
+            if "count(*)" in sql:
+                return _Result([(1, 1, self.digest)])
+            if "unnest" in sql:
+                self.searches += 1
+                return _Result([(1, f"chunk {self.digest}")])
+            return _Result([])
+
+    monkeypatch.setattr(retriever, "_get_model", _Model)
+    monkeypatch.setattr(retriever, "_corpus_version", CorpusVersion(refresh_seconds=0))
+    retriever.result_cache.clear()
+    db = _Session()
+    r = retriever.WellnessRetriever(db, backend="pgvector", index_type="hnsw", storage="vector")
+
+    assert r.retrieve("poor sleep", k=1) == ["chunk v1"]
+    assert r.retrieve("Poor  sleep", k=1) == ["chunk v1"] and db.searches == 1
+    db.digest = "v2"
+    assert r.retrieve("poor sleep", k=1) == ["chunk v2"] and db.searches == 2
+    wider = retriever.WellnessRetriever(db, backend="pgvector", index_type="hnsw", storage="vector", ef_search=200)
+    assert wider.retrieve("poor sleep", k=1) == ["chunk v2"] and db.searches == 3
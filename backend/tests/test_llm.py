@@ -0,0 +1,267 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend.llm.client import LLMClient, LLMError, LLMResponse, TokenBucket, parse_retry_after
+from backend.llm.mock_server import create_app
+from backend.llm.response_cache import LLMResponseCache, cache_key, recommendation_features
+
+
+def _ok(text="ok", model="mock-model"):
+    return httpx.Response(200, json={
+        "model": model,
+        "content": [{"type": "text", "text": text}],
+        "usage": {"input_tokens": 10, "output_tokens": 5},
+    })
+
+
+def _client(transport, **kwargs):
+    kwargs.setdefault("requests_per_minute", 10_000)
+    kwargs.setdefault("tokens_per_minute", 10_000_000)
+    kwargs.setdefault("retry_backoff", 0.001)
+    kwargs.setdefault("hedge_after", 0)
+    return LLMClient(api_key="test", base_url="http://mock", transport=transport, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_throttles_to_rate():
+    bucket = TokenBucket(capacity=2, period=0.2)  # 10 tokens/s after the initial burst of 2
+    start = time.perf_counter()
+    for _ in range(4):
+        await bucket.acquire()
+    assert time.perf_counter() - start >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_client_retries_429_and_honours_retry_after():
+    statuses = [429, 503]
+
+    def handler(request):
+        assert request.headers["x-api-key"] == "test"
+        if statuses:
+            return httpx.Response(statuses.pop(0), headers={"retry-after": "0.01"})
+        return _ok("Rest today.")
+
+    async with _client(httpx.MockTransport(handler)) as client:
+        response = await client.complete("prompt")
+    assert response.text == "Rest today." and response.attempts == 3
+    assert client.stats["retries"] == 2 and client.stats["rate_limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_does_not_retry_client_errors_and_gives_up_eventually():
+    async with _client(httpx.MockTransport(lambda r: httpx.Response(400, text="bad"))) as client:
+        with pytest.raises(LLMError) as info:
+            await client.complete("prompt")
+    assert info.value.status_code == 400 and client.stats["requests"] == 1
+
+    async with _client(httpx.MockTransport(lambda r: httpx.Response(529)), max_retries=2) as client:
+        with pytest.raises(LLMError):
+            await client.complete("prompt")
+    assert client.stats["requests"] == 3
+
+
+@pytest.mark.asyncio
+async def test_client_bounds_concurrency_against_mock_server():
+    app = create_app(latency_ms=20, jitter_ms=0, seed=0)
+    async with _client(httpx.ASGITransport(app=app), max_concurrency=3) as client:
+        responses = await asyncio.gather(*(client.complete(f"user {i}") for i in range(12)))
+    assert all(r.text.startswith("Mock recommendation") for r in responses)
+    assert app.state.stats["requests"] == 12
+    assert app.state.stats["peak_in_flight"] <= 3
+
+
+@pytest.mark.asyncio
+async def test_client_hedges_slow_requests():
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(1)
+        return _ok(f"call {calls}")
+
+    async with _client(httpx.MockTransport(handler), hedge_after=0.05) as client:
+        start = time.perf_counter()
+        response = await client.complete("prompt")
+    assert response.text == "call 2" and time.perf_counter() - start < 0.5
+    assert client.stats["hedged"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedges_are_charged_and_rejected_attempts_refunded():
+    calls = 0
+
+    async def slow_first(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(0.3)
+        return _ok()
+
+    async with _client(httpx.MockTransport(slow_first), hedge_after=0.05, requests_per_minute=100) as client:
+        await client.complete("prompt")
+    # Two requests were sent, so two were charged
+    assert client._requests.available < 98.5 and client.stats["hedged"] == 1
+
+    calls = 0
+    async with _client(httpx.MockTransport(slow_first), hedge_after=0.05, requests_per_minute=1) as client:
+        await client.complete("prompt")
+    # No room in the request bucket: no hedge
+    assert calls == 1 and client.stats["hedged"] == 0
+
+    statuses = [429, 529]
+
+    def flaky(request):
+        return httpx.Response(statuses.pop(0), headers={"retry-after": "0"}) if statuses else _ok()
+
+    async with _client(httpx.MockTransport(flaky), tokens_per_minute=10_000) as client:
+        response = await client.complete("prompt", max_tokens=400)
+    # Only the reported usage of the answered attempt stays charged
+    assert response.attempts == 3
+    assert client._tokens.available > 10_000 - 20
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    from datetime import datetime, timedelta, timezone
+    from email.utils import format_datetime
+
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after(None) is None and parse_retry_after("soon") is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after(later) <= 30
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+@pytest.fixture
+def cache_db(tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from backend.database import Base
+    from backend.models.llm_cache import LLMCacheEntry
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'llm_cache.db'}")
+    Base.metadata.create_all(engine, tables=[LLMCacheEntry.__table__])
+    with sessionmaker(bind=engine)() as db:
+        yield db
+    engine.dispose()
+
+
+def test_cache_key_is_canonical():
+    a = recommendation_features("morning_recommendation", readiness_score=58.3, intensity="Moderate",
+                                sleep_quality=3, mood=4, energy=3, stress=2, guideline_ids=[12, 4])
+    b = recommendation_features("morning_recommendation", readiness_score=56.0, intensity=" moderate",
+                                sleep_quality=3, mood=4, energy=3, stress=2, guideline_ids=(4, 12, 4))
+    c = dict(a, readiness=60)
+    assert a["readiness"] == 55
+    assert cache_key(a) == cache_key(b) != cache_key(c)
+
+
+@pytest.mark.asyncio
+async def test_response_cache_persists_per_model_and_coalesces(cache_db):
+    cache = LLMResponseCache(ttl_seconds=3600, max_entries=10)
+    features = recommendation_features("morning_recommendation", readiness_score=70, intensity="moderate")
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return LLMResponse("Moderate run today.", "model-a", 10, 5, 0.01)
+
+    results = await asyncio.gather(*(cache.get_or_generate(cache_db, features, "model-a", generate)
+                                     for _ in range(3)))
+    assert [text for text, _ in results] == ["Moderate run today."] * 3
+    assert len(calls) == 1
+
+    # A fresh cache object (e.g. after a restart) reads the stored row
+    assert await LLMResponseCache().get_or_generate(cache_db, features, "model-a", generate) == (
+        "Moderate run today.", True)
+    # Never served across model changes
+    _, hit = await cache.get_or_generate(cache_db, features, "model-b", generate)
+    assert not hit and len(calls) == 2
+    # Stored under the model the response came from, not the one asked for
+    assert cache.get(cache_db, cache_key(features), "model-b") is None
+
+
+def test_response_cache_ttl_and_lru_eviction(cache_db):
+    from backend.models.llm_cache import LLMCacheEntry
+
+    expired = LLMResponseCache(ttl_seconds=-1)
+    expired.put(cache_db, "stale", "m", "old")
+    assert expired.get(cache_db, "stale", "m") is None
+
+    cache = LLMResponseCache(ttl_seconds=3600, max_entries=2)
+    for key in ("k1", "k2", "k3"):
+        cache.put(cache_db, key, "m", key)
+        time.sleep(0.002)
+    cache.get(cache_db, "k1", "m")  # k1 is now the most recently used
+    assert cache.evict(cache_db) == 2
+    assert sorted(k for (k,) in cache_db.query(LLMCacheEntry.cache_key)) == ["k1", "k3"]
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_are_batched_and_work_on_an_async_session(tmp_path, monkeypatch):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    import backend.llm.response_cache as response_cache
+    from backend.database import Base
+    from backend.models.llm_cache import LLMCacheEntry
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'llm_cache.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[LLMCacheEntry.__table__])
+    monkeypatch.setattr(response_cache, "FLUSH_HITS_EVERY", 3)
+    cache = LLMResponseCache()
+    features = recommendation_features("morning_recommendation", readiness_score=70)
+
+    async def generate():
+        return LLMResponse("Easy ride.", "m", 10, 5, 0.01)
+
+    async def stored_hits():
+        async with async_sessionmaker(engine)() as other:
+            return (await other.execute(LLMCacheEntry.__table__.select())).one().hits
+
+    async with async_sessionmaker(engine)() as db:
+        assert await cache.get_or_generate(db, features, "m", generate) == ("Easy ride.", False)
+        for _ in range(2):
+            assert await cache.get_or_generate(db, features, "m", generate) == ("Easy ride.", True)
+        # Hits are only SELECTs until FLUSH_HITS_EVERY of them are written in one UPDATE
+        assert await stored_hits() == 0
+        assert await cache.get_or_generate(db, features, "m", generate) == ("Easy ride.", True)
+        assert await stored_hits() == 3
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_anthropic_batch_backend_round_trip():
+    import json
+    from backend.llm.batch import AnthropicBatchBackend, BatchRequest, run_batch
+
+    polls = []
+
+    def handler(request):
+        if request.method == "POST":
+            body = json.loads(request.content)
+            assert [r["custom_id"] for r in body["requests"]] == ["user-1", "user-2"]
+            assert body["requests"][0]["params"]["model"] == "m"
+            return httpx.Response(200, json={"id": "msgbatch_1", "processing_status": "in_progress"})
+        if request.url.path.endswith("/results"):
+            lines = [
+                {"custom_id": "user-1", "result": {"type": "succeeded", "message": {
+                    "model": "m", "content": [{"type": "text", "text": "Good day."}]}}},
+                {"custom_id": "user-2", "result": {"type": "errored", "error": {"message": "invalid"}}},
+            ]
+            return httpx.Response(200, text="\n".join(json.dumps(line) for line in lines))
+        polls.append(1)
+        status = "ended" if len(polls) > 1 else "in_progress"
+        return httpx.Response(200, json={"id": "msgbatch_1", "processing_status": status})
+
+    backend = AnthropicBatchBackend(api_key="test", base_url="http://mock", transport=httpx.MockTransport(handler))
+    results = await run_batch(backend, [BatchRequest("user-1", "a"), BatchRequest("user-2", "b")],
+                              model="m", poll_interval=0)
+    await backend.aclose()
+    assert [(r.custom_id, r.text, r.error) for r in results] == [
+        ("user-1", "Good day.", None), ("user-2", None, "invalid")]
+    assert len(polls) == 2
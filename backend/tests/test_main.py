@@ -0,0 +1,37 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from backend.knowledge import retriever
+from backend.main import app
+
+client = TestClient(app)
+
+
+def test_health_reports_rag_warming_then_ready(monkeypatch):
+    monkeypatch.setattr(retriever, "_ready", retriever.threading.Event())
+    assert client.get("/health").json()["rag"] == "warming"
+
+    retriever._ready.set()
+    assert client.get("/health").json() == {"status": "ok", "service": "wellsync-api", "rag": "ready"}
+
+
+def test_ready_is_503_until_warm(monkeypatch):
+    monkeypatch.setattr(retriever, "_ready", retriever.threading.Event())
+    response = client.get("/ready")
+    assert response.status_code == 503
+
+    retriever._ready.set()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready", "rag": True}
+
+
+def test_importing_retriever_does_not_load_sentence_transformers():
+    code = "import sys, backend.main; print('sentence_transformers' in sys.modules)"
+    # Run from the repo root so `backend` imports whichever directory pytest was started in
+    repo_root = Path(__file__).resolve().parents[2]
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=repo_root)
+    assert result.stdout.strip() == "False"
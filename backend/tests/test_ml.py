@@ -0,0 +1,77 @@
+from datetime import date
+
+import numpy as np
+from sqlalchemy import insert, select
+
+from backend.ml.readiness import compute_readiness_score, get_intensity, intensities, readiness_scores
+
+
+def test_single_and_batch_scores_agree_with_the_design_example():
+    # docs/F3 section 4.1: 22.5 + 12 + 12 + 8 + 4
+    assert compute_readiness_score(6, 3, 3, 2, 4) == 58.5
+    rng = np.random.default_rng(0)
+    n = 1000
+    inputs = (rng.uniform(0, 12, n), *(rng.integers(1, 6, n) for _ in range(4)))
+    scores = readiness_scores(*inputs)
+    assert scores.min() >= 0 and scores.max() <= 100
+    assert [compute_readiness_score(*row) for row in zip(*inputs)][:50] == scores[:50].tolist()
+
+
+def test_rpe_adjustment_and_intensity_thresholds():
+    base = [6, 6, 6, 6, 8], [3, 3, 3, 3, 5], [3, 3, 3, 3, 5], [2, 2, 2, 2, 5], [4, 4, 4, 4, 1]
+    scores = readiness_scores(*base, predicted_rpe=[8.0, 6.0, 7.3, np.nan, 9.0], rpe_mean=[7, 7, 7, 7, 7])
+    # +10%, −10%, within the ±0.5 margin, no prediction, and clipped at 100
+    assert scores.tolist() == [64.4, 52.6, 58.5, 58.5, 100.0]
+    assert compute_readiness_score(6, 3, 3, 2, 4, predicted_rpe=8.0, rpe_mean=7.0) == 64.4
+    assert intensities([75, 74.9, 45, 44.9]).tolist() == ["high", "moderate", "moderate", "low"]
+    assert get_intensity(58.5) == "moderate"
+
+
+def test_checkins_are_scored_on_write(sqlite_db):
+    from backend.models.checkin import CheckIn
+
+    checkin = CheckIn(user_id=1, date=date(2026, 3, 1), sleep_hours=6, sleep_quality=3, mood=3, energy=2, stress=4)
+    sqlite_db.add(checkin)
+    sqlite_db.commit()
+    assert checkin.readiness_score == 58.5
+
+    checkin.mood = 5
+    sqlite_db.commit()
+    assert checkin.readiness_score == 66.5
+
+    # An explicitly written score (e.g. the personalized one) is kept
+    checkin.readiness_score = 70.0
+    sqlite_db.commit()
+    assert checkin.readiness_score == 70.0
+
+
+def test_score_day_and_backfill_use_one_vectorized_pass(sqlite_db, monkeypatch):
+    import backend.ml.scoring as scoring
+    from backend.models.checkin import CheckIn
+    from backend.models.daily_rollup import DailyRollup
+    from backend.models.workout import Workout
+
+    day = date(2026, 3, 2)
+    # Core inserts skip the on-write hook, like rows loaded before scoring existed
+    sqlite_db.execute(insert(CheckIn), [
+        dict(user_id=u, date=d, sleep_hours=6, sleep_quality=3, mood=3, energy=2, stress=4)
+        for u in (1, 2, 3) for d in (date(2026, 3, 1), day)
+    ])
+    sqlite_db.add_all([Workout(user_id=u, date=date(2026, 3, 1), type="run", duration_min=30, rpe=7) for u in (1, 2)])
+    sqlite_db.commit()
+
+    calls = []
+    monkeypatch.setattr(scoring, "readiness_scores", lambda *a, **k: calls.append(1) or readiness_scores(*a, **k))
+
+    assert scoring.score_day(sqlite_db, day, predicted_rpe={1: 8.0, 2: 6.0}) == 3
+    assert len(calls) == 1
+    scores = dict(sqlite_db.execute(select(CheckIn.user_id, CheckIn.readiness_score).where(CheckIn.date == day)).all())
+    assert scores == {1: 64.4, 2: 52.6, 3: 58.5}
+    assert sqlite_db.get(DailyRollup, (1, day)).readiness_score == 64.4
+
+    calls.clear()
+    assert scoring.backfill_scores(sqlite_db, batch_size=2) == 3
+    assert len(calls) == 2
+    scores = sqlite_db.scalars(select(CheckIn.readiness_score).where(CheckIn.date == date(2026, 3, 1))).all()
+    assert scores == [58.5] * 3
+    assert scoring.backfill_scores(sqlite_db) == 0
@@ -0,0 +1,16 @@
+"""
+Token estimates shared by prompt packing (backend/knowledge/packing.py), the
+LLM client's tokens-per-minute bucket and the mock LLM server.
+
+Usage:
+    estimate_tokens("Sleep 6h, stress 4/5")   # → 5
+"""
+
+from __future__ import annotations
+
+import math
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English prose (~4 characters per token)."""
+    return max(1, math.ceil(len(text) / 4))
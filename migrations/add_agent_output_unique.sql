@@ -0,0 +1,17 @@
+-- Migration: one agent output per (user_id, date, event_type)
+-- Makes agent output generation idempotent: retried or duplicated events
+-- insert with ON CONFLICT DO NOTHING (backend/agents/idempotency.py).
+--
+-- Usage:
+--   psql $DATABASE_URL -f migrations/add_agent_output_unique.sql
+
+-- Remove existing duplicates, keeping the earliest output of each group
+DELETE FROM agent_outputs a
+    USING agent_outputs b
+    WHERE a.user_id = b.user_id
+      AND a.date = b.date
+      AND a.event_type = b.event_type
+      AND a.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS agent_outputs_user_date_event_key
+    ON agent_outputs (user_id, date, event_type);
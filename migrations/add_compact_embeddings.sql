@@ -0,0 +1,38 @@
+-- Migration: Compact embedding indexes for knowledge_chunks (optional)
+-- Requires pgvector >= 0.7 (halfvec, bit and binary_quantize); the
+-- pgvector/pgvector:pg16 image ships a recent enough version.
+--
+-- Usage:
+--   psql $DATABASE_URL -f migrations/add_compact_embeddings.sql
+--
+-- Then set RAG_STORAGE=halfvec or RAG_STORAGE=binary together with
+-- RAG_INDEX_TYPE=hnsw (both indexes are HNSW; the retriever rejects ivfflat).
+--
+-- The float32 embedding column stays the source of truth (ingest writes only
+-- that column); the indexes below are expression indexes over it, so nothing
+-- else changes and there is no second column to keep in sync. What shrinks is
+-- the index, not the table:
+--
+--   halfvec  float16 HNSW index, ~2x smaller than vector(384); queried with
+--            CAST(embedding AS halfvec(384)) <=> CAST(:emb AS halfvec(384))
+--   binary   1 bit per dimension HNSW index, ~32x smaller; a Hamming-distance
+--            pre-filter returns RAG_RERANK_CANDIDATES rows (hnsw.ef_search is
+--            raised to match) that are re-ranked exactly on the float32 column
+--
+-- Running this file adds both indexes next to the float32 one, so total size
+-- grows until the unused indexes are dropped. Once the mode is chosen:
+--   python -m backend.knowledge.vector_ops --storage binary --index-type hnsw --apply --drop-unused
+--
+-- The halfvec operator class must match RAG_DISTANCE_METRIC (cosine shown);
+-- python -m backend.knowledge.vector_ops --storage halfvec --apply rebuilds it
+-- from settings.
+
+CREATE INDEX IF NOT EXISTS knowledge_chunks_embedding_half_idx
+    ON knowledge_chunks
+    USING hnsw ((CAST(embedding AS halfvec(384))) halfvec_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX IF NOT EXISTS knowledge_chunks_embedding_bq_idx
+    ON knowledge_chunks
+    USING hnsw ((CAST(binary_quantize(embedding) AS bit(384))) bit_hamming_ops)
+    WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,24 @@
+-- Migration: per-user daily rollups for the insights dashboard
+-- Maintained on every ORM write to checkins/workouts/meals (backend/rollups.py).
+--
+-- Usage:
+--   psql $DATABASE_URL -f migrations/add_daily_rollups.sql
+--   python -m backend.rollups            # backfill from existing rows
+
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    user_id           INTEGER NOT NULL REFERENCES users (id),
+    date              DATE NOT NULL,
+    readiness_score   DOUBLE PRECISION,
+    sleep_hours       DOUBLE PRECISION,
+    sleep_quality     INTEGER,
+    mood              INTEGER,
+    energy            INTEGER,
+    stress            INTEGER,
+    workout_count     INTEGER NOT NULL DEFAULT 0,
+    workout_minutes   INTEGER NOT NULL DEFAULT 0,
+    workout_rpe_sum   INTEGER NOT NULL DEFAULT 0,   -- average = workout_rpe_sum / workout_count
+    meal_count        INTEGER NOT NULL DEFAULT 0,
+    meal_quality_sum  INTEGER NOT NULL DEFAULT 0,   -- average = meal_quality_sum / meal_count
+    updated_at        TIMESTAMP DEFAULT now(),
+    PRIMARY KEY (user_id, date)
+);
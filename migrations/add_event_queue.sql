@@ -0,0 +1,29 @@
+-- Migration: durable event queue (EVENT_QUEUE_MODE=durable)
+-- Shared by every API/worker process; consumers claim rows with
+-- SELECT ... FOR UPDATE SKIP LOCKED (backend/events/durable_queue.py).
+--
+-- Usage:
+--   psql $DATABASE_URL -f migrations/add_event_queue.sql
+-- (python -m backend.create_tables also creates it on a fresh database)
+
+CREATE TABLE IF NOT EXISTS event_queue (
+    id            SERIAL PRIMARY KEY,
+    event_type    VARCHAR NOT NULL,
+    user_ids      JSON NOT NULL DEFAULT '[]',           -- empty = all users
+    fired_at      TIMESTAMP NOT NULL DEFAULT now(),
+    priority      INTEGER NOT NULL DEFAULT 0,           -- lower is claimed first
+    status        VARCHAR NOT NULL DEFAULT 'pending',   -- pending | done | dead
+    available_at  TIMESTAMP NOT NULL DEFAULT now(),     -- claim pushes this out by the visibility timeout
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    claim_token   VARCHAR,
+    last_error    TEXT,
+    dedup_key     VARCHAR UNIQUE,                       -- one row per scheduled firing across processes
+    created_at    TIMESTAMP DEFAULT now(),
+    finished_at   TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_event_queue_id ON event_queue (id);
+
+-- Claim query: WHERE status = 'pending' AND available_at <= now ORDER BY priority, available_at, id
+CREATE INDEX IF NOT EXISTS event_queue_claim_idx
+    ON event_queue (status, priority, available_at, id);
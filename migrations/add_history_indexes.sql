@@ -0,0 +1,39 @@
+-- Migration: composite (user_id, date) indexes for per-user history queries
+-- "Last 7/30 days" queries (backend/history.py) become index range scans in
+-- date order; the INCLUDE columns make them index-only scans once the table
+-- has been vacuumed. The single-column user_id indexes are prefixes of the
+-- new ones and are dropped.
+--
+-- Usage:
+--   psql $DATABASE_URL -f migrations/add_history_indexes.sql
+-- Run migrations/add_agent_output_unique.sql first.
+
+-- One check-in per user and day: keep the most recent submission of any duplicates
+DELETE FROM checkins a
+    USING checkins b
+    WHERE a.user_id = b.user_id
+      AND a.date = b.date
+      AND a.id < b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS checkins_user_date_key
+    ON checkins (user_id, date)
+    INCLUDE (id, sleep_hours, sleep_quality, mood, energy, stress, readiness_score);
+
+-- id is part of the key so keyset pagination on (date, id) stays inside the index
+CREATE INDEX IF NOT EXISTS workouts_user_date_idx
+    ON workouts (user_id, date, id)
+    INCLUDE (type, duration_min, rpe);
+
+CREATE INDEX IF NOT EXISTS meals_user_date_idx
+    ON meals (user_id, date, id)
+    INCLUDE (meal_type, quality);
+
+-- agent_outputs is covered by agent_outputs_user_date_event_key (user_id, date, event_type)
+DROP INDEX IF EXISTS ix_checkins_user_id;
+DROP INDEX IF EXISTS ix_workouts_user_id;
+DROP INDEX IF EXISTS ix_meals_user_id;
+DROP INDEX IF EXISTS ix_agent_outputs_user_id;
+
+ANALYZE checkins;
+ANALYZE workouts;
+ANALYZE meals;
@@ -22,8 +22,18 @@ CREATE TABLE IF NOT EXISTS knowledge_chunks (
     source      TEXT            -- bibliographic reference (e.g. 'ACSM 2024')
 );
 
+-- Incremental ingestion: one row per corpus file, re-embedded only when its hash changes.
+-- Added with ALTER so re-running this file upgrades tables created before these columns.
+ALTER TABLE knowledge_chunks ADD COLUMN IF NOT EXISTS source_file  TEXT;   -- e.g. 'sleep_03.txt'
+ALTER TABLE knowledge_chunks ADD COLUMN IF NOT EXISTS content_hash TEXT;   -- sha256 of model + row content
+CREATE UNIQUE INDEX IF NOT EXISTS knowledge_chunks_source_file_key
+    ON knowledge_chunks (source_file);
+
 -- IVFFlat index for fast approximate cosine similarity search
 -- lists=10 is appropriate for a corpus of ~30 rows; increase to 100 for larger corpora.
+-- The operator class must match RAG_DISTANCE_METRIC (cosine → vector_cosine_ops,
+-- queried with <=>); otherwise Postgres falls back to a sequential scan.
+-- For an HNSW index instead, run migrations/add_knowledge_chunks_hnsw.sql.
 CREATE INDEX IF NOT EXISTS knowledge_chunks_embedding_idx
     ON knowledge_chunks
     USING ivfflat (embedding vector_cosine_ops)
@@ -0,0 +1,22 @@
+-- Migration: Replace the IVFFlat index on knowledge_chunks with HNSW
+-- Optional; run after add_knowledge_chunks.sql.
+--
+-- Usage:
+--   psql $DATABASE_URL -f migrations/add_knowledge_chunks_hnsw.sql
+--
+-- Then set RAG_INDEX_TYPE=hnsw (query-time recall is tuned with RAG_HNSW_EF_SEARCH).
+-- HNSW has better recall/latency than IVFFlat, needs no training data and does
+-- not degrade as rows are added, at the cost of a slower build.
+--
+-- The operator class must match RAG_DISTANCE_METRIC:
+--   cosine → vector_cosine_ops (<=>), l2 → vector_l2_ops (<->),
+--   inner_product → vector_ip_ops (<#>)
+-- To build an index for another metric/type from settings:
+--   python -m backend.knowledge.vector_ops --apply
+
+DROP INDEX IF EXISTS knowledge_chunks_embedding_idx;
+
+CREATE INDEX IF NOT EXISTS knowledge_chunks_embedding_idx
+    ON knowledge_chunks
+    USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
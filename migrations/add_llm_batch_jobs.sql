@@ -0,0 +1,24 @@
+-- Migration: submitted EVENING_SUMMARY batch jobs (backend/llm/batch.py)
+-- The event handler submits the jobs, records them here and returns; the
+-- batch poller collects finished jobs and writes their outputs.
+--
+-- Usage:
+--   psql $DATABASE_URL -f migrations/add_llm_batch_jobs.sql
+-- (python -m backend.create_tables also creates it on a fresh database)
+
+CREATE TABLE IF NOT EXISTS llm_batch_jobs (
+    id            SERIAL PRIMARY KEY,
+    batch_id      VARCHAR NOT NULL UNIQUE,              -- provider id, e.g. msgbatch_...
+    event_type    VARCHAR NOT NULL,
+    date          DATE NOT NULL,
+    model         VARCHAR NOT NULL,
+    user_ids      JSON NOT NULL DEFAULT '[]',
+    status        VARCHAR NOT NULL DEFAULT 'pending',   -- pending | done | failed
+    written       INTEGER NOT NULL DEFAULT 0,
+    last_error    TEXT,
+    submitted_at  TIMESTAMP NOT NULL DEFAULT now(),
+    finished_at   TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_llm_batch_jobs_id ON llm_batch_jobs (id);
+CREATE INDEX IF NOT EXISTS llm_batch_jobs_status_idx ON llm_batch_jobs (status, submitted_at);
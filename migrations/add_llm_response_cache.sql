@@ -0,0 +1,23 @@
+-- Migration: persistent LLM response cache (backend/llm/response_cache.py)
+-- Keyed on a hash of the canonical prompt inputs plus the model that produced the text.
+--
+-- Usage:
+--   psql $DATABASE_URL -f migrations/add_llm_response_cache.sql
+-- (python -m backend.create_tables also creates it on a fresh database)
+
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    id             SERIAL PRIMARY KEY,
+    cache_key      VARCHAR(64) NOT NULL,   -- sha256 of the canonical prompt inputs
+    model_used     VARCHAR NOT NULL,
+    response_text  TEXT NOT NULL,
+    hits           INTEGER NOT NULL DEFAULT 0,
+    created_at     TIMESTAMP NOT NULL DEFAULT now(),
+    expires_at     TIMESTAMP NOT NULL,
+    last_used_at   TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_llm_response_cache_id ON llm_response_cache (id);
+CREATE UNIQUE INDEX IF NOT EXISTS llm_response_cache_key_model_key
+    ON llm_response_cache (cache_key, model_used);
+CREATE INDEX IF NOT EXISTS llm_response_cache_last_used_idx
+    ON llm_response_cache (last_used_at);
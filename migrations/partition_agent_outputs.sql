@@ -0,0 +1,67 @@
+-- Migration: monthly range partitions on agent_outputs.date
+-- agent_outputs is the largest table (two full LLM texts per user per day).
+-- Partitioned by month, "today's output" lookups (WHERE date = ...) touch one
+-- partition, autovacuum works on the current month only, and old months are
+-- archived and dropped whole by the retention job instead of row DELETEs.
+--
+-- Usage (Postgres 12+; takes an exclusive lock while rows are copied):
+--   psql $DATABASE_URL -f migrations/partition_agent_outputs.sql
+--   python -m backend.partitions        # daily: future partitions + retention
+-- Run migrations/add_agent_output_unique.sql first.
+--
+-- There is no DEFAULT partition. Partitions exist from the oldest month in the
+-- table to three months ahead; python -m backend.partitions keeps creating
+-- future months, and backend/bulk_import.py creates the months of imported
+-- rows. Any other insert outside those months fails with "no partition of
+-- relation ... found for row": run backend.partitions.ensure_partitions for
+-- the range first. (A DEFAULT partition would take such rows silently, but
+-- then creating that month's partition has to scan and re-check it.)
+
+BEGIN;
+
+ALTER TABLE agent_outputs RENAME TO agent_outputs_unpartitioned;
+ALTER INDEX agent_outputs_user_date_event_key RENAME TO agent_outputs_unpartitioned_user_date_event_key;
+ALTER INDEX IF EXISTS agent_outputs_pkey RENAME TO agent_outputs_unpartitioned_pkey;
+ALTER INDEX IF EXISTS ix_agent_outputs_id RENAME TO ix_agent_outputs_unpartitioned_id;
+
+-- The partition key has to be part of every unique constraint, so the primary key becomes (id, date);
+-- ids still come from the one sequence and stay unique
+CREATE TABLE agent_outputs (
+    id              INTEGER NOT NULL DEFAULT nextval('agent_outputs_id_seq'),
+    user_id         INTEGER NOT NULL REFERENCES users (id),
+    date            DATE NOT NULL,
+    event_type      VARCHAR NOT NULL,
+    readiness_score DOUBLE PRECISION,
+    intensity       VARCHAR,
+    llm_text        TEXT NOT NULL,
+    model_used      VARCHAR NOT NULL,
+    created_at      TIMESTAMP,
+    PRIMARY KEY (id, date)
+) PARTITION BY RANGE (date);
+
+CREATE UNIQUE INDEX agent_outputs_user_date_event_key ON agent_outputs (user_id, date, event_type);
+
+-- One partition per month from the oldest row up to three months ahead
+DO $$
+DECLARE
+    month DATE := date_trunc('month', COALESCE((SELECT min(date) FROM agent_outputs_unpartitioned), current_date));
+BEGIN
+    WHILE month <= date_trunc('month', current_date) + interval '3 months' LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF agent_outputs FOR VALUES FROM (%L) TO (%L)',
+            'agent_outputs_' || to_char(month, 'YYYY_MM'), month, (month + interval '1 month')::date
+        );
+        month := (month + interval '1 month')::date;
+    END LOOP;
+END $$;
+
+INSERT INTO agent_outputs
+    SELECT id, user_id, date, event_type, readiness_score, intensity, llm_text, model_used, created_at
+    FROM agent_outputs_unpartitioned;
+
+ALTER SEQUENCE agent_outputs_id_seq OWNED BY agent_outputs.id;
+DROP TABLE agent_outputs_unpartitioned;
+
+COMMIT;
+
+ANALYZE agent_outputs;
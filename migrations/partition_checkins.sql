@@ -0,0 +1,64 @@
+-- Migration (optional): monthly range partitions on checkins.date
+-- Same scheme as migrations/partition_agent_outputs.sql. Check-ins are small
+-- rows, so this only pays off at large user counts; add "checkins" to
+-- PARTITIONED_TABLES afterwards so backend/partitions.py maintains it.
+--
+-- Usage (Postgres 12+; takes an exclusive lock while rows are copied):
+--   psql $DATABASE_URL -f migrations/partition_checkins.sql
+-- Run migrations/add_history_indexes.sql first.
+--
+-- There is no DEFAULT partition. Partitions exist from the oldest month in the
+-- table to three months ahead; python -m backend.partitions keeps creating
+-- future months, and backend/bulk_import.py creates the months of imported
+-- rows. Any other insert outside those months fails with "no partition of
+-- relation ... found for row": run backend.partitions.ensure_partitions for
+-- the range first. (A DEFAULT partition would take such rows silently, but
+-- then creating that month's partition has to scan and re-check it.)
+
+BEGIN;
+
+ALTER TABLE checkins RENAME TO checkins_unpartitioned;
+ALTER INDEX checkins_user_date_key RENAME TO checkins_unpartitioned_user_date_key;
+ALTER INDEX IF EXISTS checkins_pkey RENAME TO checkins_unpartitioned_pkey;
+ALTER INDEX IF EXISTS ix_checkins_id RENAME TO ix_checkins_unpartitioned_id;
+
+CREATE TABLE checkins (
+    id              INTEGER NOT NULL DEFAULT nextval('checkins_id_seq'),
+    user_id         INTEGER NOT NULL REFERENCES users (id),
+    date            DATE NOT NULL,
+    sleep_hours     DOUBLE PRECISION NOT NULL,
+    sleep_quality   INTEGER NOT NULL,
+    mood            INTEGER NOT NULL,
+    energy          INTEGER NOT NULL,
+    stress          INTEGER NOT NULL,
+    readiness_score DOUBLE PRECISION,
+    created_at      TIMESTAMP,
+    PRIMARY KEY (id, date)
+) PARTITION BY RANGE (date);
+
+CREATE UNIQUE INDEX checkins_user_date_key ON checkins (user_id, date)
+    INCLUDE (id, sleep_hours, sleep_quality, mood, energy, stress, readiness_score);
+
+DO $$
+DECLARE
+    month DATE := date_trunc('month', COALESCE((SELECT min(date) FROM checkins_unpartitioned), current_date));
+BEGIN
+    WHILE month <= date_trunc('month', current_date) + interval '3 months' LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF checkins FOR VALUES FROM (%L) TO (%L)',
+            'checkins_' || to_char(month, 'YYYY_MM'), month, (month + interval '1 month')::date
+        );
+        month := (month + interval '1 month')::date;
+    END LOOP;
+END $$;
+
+INSERT INTO checkins
+    SELECT id, user_id, date, sleep_hours, sleep_quality, mood, energy, stress, readiness_score, created_at
+    FROM checkins_unpartitioned;
+
+ALTER SEQUENCE checkins_id_seq OWNED BY checkins.id;
+DROP TABLE checkins_unpartitioned;
+
+COMMIT;
+
+ANALYZE checkins;